@@ -18,13 +18,12 @@ Example usage:
 
 Note:
     1) This module requires two key simulation engine systems: Builder and which must be imported from vivarium.framework
-    2) This modules requires external serialized survival regression models (compute transition probabilities) to be imported, loaded with pickle and used in base_healthy_rate
+    2) This modules requires external serialized survival regression models (compute transition probabilities) loaded lazily through model_registry.registry and used in base_healthy_rate
         
 """
 
 import os
 import sys
-import pickle
 import pandas as pd
 
 from vivarium.framework.engine import Builder
@@ -32,13 +31,11 @@ from vivarium.framework.event import Event
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-######## GET BINARY FILES ###########
+from simulation_package.model_registry import registry
+from simulation_package.bookkeeping import transition_update
+from simulation_package.state_index import get_state_index
 
-# dysglycemic to type1_diabetes
-with open(
-    "transition_probabilities/binary_files/sAB2Healthy.bin", "rb"
-) as binary_ab1_to_healthy:
-    ab1_to_healthy_model = pickle.load(binary_ab1_to_healthy)
+# survival regression models are loaded lazily (on first use) by the registry, see model_registry.py
 
 
 class Ab1ToHealthy:
@@ -50,9 +47,11 @@ class Ab1ToHealthy:
             builder (Builder): The builder object to set up the model.
             event (Event): Triggering event (time step)."""
     
-    def __init__(self):
+    def __init__(self, engine="lifelines"):
         self.name = "single_to_healthy"
         self.completed_cycles = 0
+        # "lifelines" (fitted models), "numpy" (closed-form hazard_engine) or "lookup" (precomputed lookup_tables)
+        self.engine = engine
 
     def setup(self, builder: Builder):
         """
@@ -74,6 +73,8 @@ class Ab1ToHealthy:
             "healthy_rate", source=self.base_ab1_to_healthy_rate
         )
         self.randomness = builder.randomness.get_stream("ab1_to_healthy_model")
+        # Ab1 simulants are read from the shared per-state index, see state_index.py
+        self.state_index = get_state_index(builder)
 
         builder.event.register_listener("time_step", self.determine_healthy)
 
@@ -88,7 +89,7 @@ class Ab1ToHealthy:
         # Get the population data for the given index
         population_df = self.ab1_population_view.get(index)
         # Predict the survival probability using the external model
-        survival_prob = ab1_to_healthy_model.predict_survival_function(
+        survival_prob = registry.transition_model("sAB2Healthy", self.engine).predict_survival_function(
             population_df, times=1, conditional_after=population_df["time_in_state"]
         )
         # Calculate the transition rate from AB1 to healthy
@@ -108,8 +109,7 @@ class Ab1ToHealthy:
             return
 
         # Get the current AB1 population
-        ab1_population = self.ab1_population_view.get(event.index)
-        ab1_index = ab1_population.index
+        ab1_index = self.state_index.get("Ab1")
 
         # Calculate the effective transition rate from AB1 to healthy
         effective_ab1_to_healthy = self.ab1_to_healthy_rate(ab1_index)
@@ -121,6 +121,6 @@ class Ab1ToHealthy:
         affected_ab1_to_healthy = draw_ab1_to_healthy < effective_ab1_to_healthy
 
         # Update the state of individuals who transition to healthy
-        self.population_view.update(
-            pd.Series("healthy", index=ab1_index[affected_ab1_to_healthy], name="state")
-        )
+        moved = ab1_index[affected_ab1_to_healthy]
+        self.population_view.update(transition_update("healthy", index=moved))
+        self.state_index.move(moved, "healthy")
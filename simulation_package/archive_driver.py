@@ -0,0 +1,129 @@
+"""
+This module contains the ArchiveDriver class, which runs a pymoo algorithm on the noisy screening problem with an
+UncertainObjectivesArchiver and spends part of every generation re-evaluating the elite solutions.
+
+A single NoisyProblem evaluation is one Monte Carlo draw of the objectives, so NSGA2 alone keeps candidates that were
+evaluated on one lucky cohort. The driver runs the algorithm through its ask / tell interface and, every generation:
+
+    1) asks the algorithm for its offspring
+    2) picks the reevaluation_share of the generation's evaluations among the elite solutions of the archive, the least
+       evaluated first (get_indices_of_most_uncertain_elites, see uncertain_archiver.py)
+    3) evaluates the offspring and the re-evaluated elites in one call of the evaluator, so that both go through the
+       elementwise runner (worker pool) of the problem together and run in parallel
+    4) adds every re-evaluation to its solution (update_many) and inserts the offspring into the archive in one batch
+       (insert_many), which updates the mean objective vectors and the elite set
+    5) replaces the objectives of the archived members of the population by their archived means, and tells the
+       algorithm the offspring, so that survival compares mean rather than single-draw objectives
+
+The reported Pareto set is the elite set of the archive (get_elite_solutions), i.e. the non-dominated set of the mean
+objective vectors of every solution evaluated during the run.
+
+Methods:
+    ArchiveDriver.run: runs the algorithm with re-evaluations and returns the archive
+
+    ArchiveDriver.elite_front: decision and mean objective vectors of the elite solutions
+
+
+Example usage:
+    >>> driver = ArchiveDriver(NoisyProblem(elementwise_runner=runner), NSGA2(pop_size=100), reevaluation_share=0.2)
+    >>> archiver = driver.run(n_gen=50)
+    >>> X, F = driver.elite_front()
+
+Note:
+    Re-evaluations only refine the estimates if they draw new cohorts: use NoisyProblem with fresh seeds (the default)
+    or common_random_numbers with seed_rotation=1, not a seed set kept for the whole run.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pymoo.core.population import Population
+
+from simulation_package.uncertain_archiver import UncertainObjectivesArchiver
+
+
+class ArchiveDriver:
+    """
+    Ask / tell loop of a pymoo algorithm that archives every evaluation and re-evaluates the most uncertain elites.
+    """
+
+    def __init__(self, problem, algorithm, reevaluation_share=0.2, archiver=None):
+        """
+        Args:
+            problem (Problem): noisy problem (e.g. NoisyProblem)
+            algorithm (Algorithm): pymoo algorithm (e.g. NSGA2), not set up yet
+            reevaluation_share (float): share of the evaluations of every generation spent on re-evaluating elites
+            archiver (UncertainObjectivesArchiver): archive of the evaluations, a new one if None
+        """
+        if not 0 <= reevaluation_share < 1:
+            raise ValueError(f"reevaluation_share must be in [0, 1), got {reevaluation_share}")
+        self.problem = problem
+        self.algorithm = algorithm
+        self.reevaluation_share = reevaluation_share
+        self.archiver = UncertainObjectivesArchiver() if archiver is None else archiver
+        # new and re-evaluated solutions of every generation
+        self.evaluations = []
+
+    def number_of_reevaluations(self, n_offsprings):
+        """
+        Args:
+            n_offsprings (int): new candidates of the generation
+        Returns:
+            int: re-evaluations, so that they make up reevaluation_share of the generation's evaluations
+        """
+        n_reevaluations = int(round(self.reevaluation_share * n_offsprings / (1 - self.reevaluation_share)))
+        return min(n_reevaluations, self.archiver.get_number_of_elite())
+
+    def run(self, n_gen, seed=None, **kwargs):
+        """
+        Args:
+            n_gen (int): number of generations
+            seed (int): random seed of the algorithm
+            kwargs: other options of algorithm.setup
+        Returns:
+            UncertainObjectivesArchiver: archive of every evaluation of the run
+        """
+        self.algorithm.setup(self.problem, termination=("n_gen", n_gen), seed=seed, **kwargs)
+        while self.algorithm.has_next():
+            self.step()
+        return self.archiver
+
+    def step(self):
+        """Runs one generation: offspring and elite re-evaluations, archive updates, survival."""
+        off = self.algorithm.ask()
+        n_reevaluations = self.number_of_reevaluations(len(off))
+        reevaluated = self.archiver.get_indices_of_most_uncertain_elites(n_reevaluations) if n_reevaluations else []
+        reevaluations = Population.new(
+            "X", np.array([self.archiver.get_decision_vector_at_index(index) for index in reevaluated]).reshape(-1, self.problem.n_var)
+        )
+
+        # one evaluator call, so that the elementwise runner dispatches offspring and re-evaluations together
+        self.algorithm.evaluator.eval(self.problem, Population.merge(off, reevaluations), algorithm=self.algorithm)
+
+        self.archiver.update_many(reevaluated, [list(individual.F) for individual in reevaluations])
+        indices = self.archiver.insert_many([list(individual.F) for individual in off], [list(individual.X) for individual in off])
+        for individual, index in zip(off, indices):
+            individual.set("archive_index", index)
+        self.evaluations.append((len(off), len(reevaluated)))
+
+        # survival compares the archived means of the population, not their first draw
+        if self.algorithm.pop is not None:
+            for individual in self.algorithm.pop:
+                index = individual.get("archive_index")
+                if index is not None:
+                    individual.set("F", np.array(self.archiver.get_estimated_objective_vector_at_index(index)))
+        self.algorithm.tell(infills=off)
+
+    def elite_front(self):
+        """
+        Returns:
+            tuple: (elites, variables) decision vectors and (elites, objectives) mean objective vectors of the elite set
+        """
+        elites = self.archiver.get_elite_solutions()
+        X = np.array([elite.get_decision_vector() for elite in elites])
+        F = np.array([elite.get_estimated_objective_vector() for elite in elites])
+        return X, F
@@ -0,0 +1,282 @@
+"""
+This module contains the crash-safe persistence of an UncertainObjectivesArchiver: an append-only binary log of its
+operations and periodic snapshots of its full state, from which restore_archiver rebuilds the exact archive.
+
+The archive of a reevaluation-heavy run (see archive_driver.py) holds evaluations that each cost a 100k-simulant
+simulation, and lives in memory only. With an ArchivePersistence, the archiver writes every insert_new_solution,
+insert_many, update_solution and random draw to the log of the archive directory once it is checked and before applying
+it (an operation the archiver rejects, e.g. an update of an index it does not hold, is not logged):
+
+    archive.log:            one record per operation, appended and flushed (and fsync-ed) as it happens:
+
+                                sequence (uint64) | operation (uint8) | payload length (uint32) | payload | crc32 (uint32)
+
+                            the payload holds the float64 objective and decision vectors of the operation. A record
+                            cut short or corrupted by a crash fails its length or crc32 check, and it and anything
+                            after it are dropped
+    archive_snapshot.npz:   the state of the archive (UncertainObjectivesArchiver.get_state: solutions, guarded lists,
+                            elite set order and entries, random number generator) after a number of operations, written
+                            every snapshot_every operations to a temporary file that then replaces the previous snapshot
+
+restore_archiver loads the snapshot and replays the records of the log with a larger sequence number, which gives the
+archive exactly as it was after its last logged operation (guard relationships and random number generator included),
+then carries on logging to the same directory.
+
+Methods:
+    ArchivePersistence: log and snapshots of an archive directory
+
+    restore_archiver: the archive of a directory (a new one if the directory is empty), logging to it
+
+
+Example usage:
+    >>> archiver = restore_archiver("runs/archive", snapshot_every=1000)
+    >>> driver = ArchiveDriver(NoisyProblem(elementwise_runner=runner), NSGA2(pop_size=100), archiver=archiver)
+    >>> driver.run(n_gen=50)
+
+Note:
+    Decision and objective vectors are logged as float64. fsync=True makes every operation durable before it is applied,
+    which costs a few milliseconds per operation, negligible next to a simulation; fsync=False only flushes to the
+    operating system, which survives a crash of the process but not of the machine.
+"""
+
+import os
+import struct
+import sys
+import warnings
+import zlib
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from simulation_package.uncertain_archiver import UncertainObjectivesArchiver
+
+
+LOG_NAME = "archive.log"
+SNAPSHOT_NAME = "archive_snapshot.npz"
+
+# operation codes of the log records
+INSERT = 1
+INSERT_MANY = 2
+UPDATE = 3
+RANDOM_ELITE = 4
+RANDOM_SOLUTION = 5
+
+HEADER = struct.Struct("<QBI") # sequence, operation, payload length
+CHECKSUM = struct.Struct("<I")
+
+
+def encode_vectors(vectors):
+    """
+    Args:
+        vectors (list): vectors of floats of the same length
+    Returns:
+        bytes: number of vectors, their length, then their float64 values (an empty batch is 0 vectors of length 0)
+    """
+    values = np.asarray(vectors, dtype="<f8").reshape(len(vectors), -1) if len(vectors) else np.empty((0, 0), dtype="<f8")
+    return struct.pack("<II", *values.shape) + values.tobytes()
+
+
+def decode_vectors(payload, offset=0):
+    """
+    Args:
+        payload (bytes): record payload
+        offset (int): position of the vectors in the payload
+    Returns:
+        list: the vectors encoded by encode_vectors at the offset
+    """
+    rows, columns = struct.unpack_from("<II", payload, offset)
+    return np.frombuffer(payload, dtype="<f8", count=rows * columns, offset=offset + 8).reshape(rows, columns).tolist()
+
+
+class ArchivePersistence:
+    """
+    Operation log and snapshots of an UncertainObjectivesArchiver in a directory.
+    """
+
+    def __init__(self, directory, snapshot_every=1000, fsync=True):
+        """
+        Args:
+            directory (str): directory of the log and snapshot, created if needed
+            snapshot_every (int): operations between snapshots
+            fsync (bool): whether every record is forced to disk before its operation is applied
+        """
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self.log_path = os.path.join(directory, LOG_NAME)
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_NAME)
+        # operations logged so far, i.e. sequence number of the next record
+        self.operations = 0
+        self.snapshot_operations = 0
+        self.log = None
+
+    def read(self):
+        """
+        Returns:
+            tuple: (state of the snapshot or None, operations of the snapshot, list of (sequence, operation, payload) of
+            the valid log records, in order, and the length in bytes of the valid part of the log)
+        """
+        state, snapshot_operations = None, 0
+        if os.path.exists(self.snapshot_path):
+            with np.load(self.snapshot_path) as arrays:
+                state = {name: arrays[name] for name in arrays.files}
+            snapshot_operations = int(state.pop("operations"))
+
+        records, valid_length = [], 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as file:
+                data = file.read()
+            while valid_length + HEADER.size <= len(data):
+                sequence, operation, length = HEADER.unpack_from(data, valid_length)
+                end = valid_length + HEADER.size + length
+                if end + CHECKSUM.size > len(data):
+                    break # cut short by a crash
+                (checksum,) = CHECKSUM.unpack_from(data, end)
+                if checksum != zlib.crc32(data[valid_length:end]):
+                    break
+                records.append((sequence, operation, data[valid_length + HEADER.size:end]))
+                valid_length = end + CHECKSUM.size
+        return state, snapshot_operations, records, valid_length
+
+    def open(self, operations, valid_length):
+        """
+        Opens the log for appending after its valid records (anything after them is cut off).
+        Args:
+            operations (int): operations of the archive, i.e. sequence number of the next record
+            valid_length (int): length in bytes of the valid part of the log
+        """
+        with open(self.log_path, "ab") as file:
+            file.truncate(valid_length)
+        self.log = open(self.log_path, "ab")
+        self.operations = operations
+
+    def close(self):
+        """Closes the log"""
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    def _append(self, operation, payload):
+        record = HEADER.pack(self.operations, operation, len(payload)) + payload
+        self.log.write(record + CHECKSUM.pack(zlib.crc32(record)))
+        self.log.flush()
+        if self.fsync:
+            os.fsync(self.log.fileno())
+        self.operations += 1
+
+    def record_insert(self, objective_vector, decision_vector):
+        """Logs an insert_new_solution"""
+        self._append(INSERT, encode_vectors([objective_vector]) + encode_vectors([decision_vector]))
+
+    def record_insert_many(self, objective_vectors, decision_vectors):
+        """Logs an insert_many"""
+        self._append(INSERT_MANY, encode_vectors(objective_vectors) + encode_vectors(decision_vectors))
+
+    def record_update(self, index, reevaluation):
+        """Logs an update_solution"""
+        self._append(UPDATE, struct.pack("<Q", index) + encode_vectors([reevaluation]))
+
+    def record_random_elite(self):
+        """Logs a get_index_of_random_elite draw"""
+        self._append(RANDOM_ELITE, b"")
+
+    def record_random_solution(self):
+        """Logs a get_index_of_random_solution draw"""
+        self._append(RANDOM_SOLUTION, b"")
+
+    def completed(self, archiver):
+        """
+        Called by the archiver once a logged operation is applied, snapshots the archive every snapshot_every operations.
+        Args:
+            archiver (UncertainObjectivesArchiver): the archive logging to this persistence
+        """
+        if self.operations - self.snapshot_operations >= self.snapshot_every:
+            self.snapshot(archiver)
+
+    def snapshot(self, archiver):
+        """
+        Writes the state of the archive, then empties the log, whose records the snapshot includes. A crash in between
+        leaves a snapshot and records it includes, which restore_archiver skips by their sequence numbers.
+        Args:
+            archiver (UncertainObjectivesArchiver): the archive logging to this persistence
+        """
+        temporary_path = self.snapshot_path + ".tmp"
+        with open(temporary_path, "wb") as file:
+            np.savez(file, operations=np.int64(self.operations), **archiver.get_state())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.snapshot_path)
+        if hasattr(os, "O_DIRECTORY"): # makes the replacement durable
+            directory = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+        self.snapshot_operations = self.operations
+        self.log.truncate(0)
+        self.log.flush()
+
+
+def replay(archiver, operation, payload):
+    """
+    Applies a log record to an archive that is not logging.
+    Args:
+        archiver (UncertainObjectivesArchiver): archive
+        operation (int): operation code of the record
+        payload (bytes): payload of the record
+    """
+    if operation == INSERT:
+        objective_vector = decode_vectors(payload)[0]
+        archiver.insert_new_solution(objective_vector, decode_vectors(payload, 8 + 8 * len(objective_vector))[0])
+    elif operation == INSERT_MANY:
+        objective_vectors = decode_vectors(payload)
+        offset = 8 + 8 * sum(len(vector) for vector in objective_vectors)
+        archiver.insert_many(objective_vectors, decode_vectors(payload, offset))
+    elif operation == UPDATE:
+        (index,) = struct.unpack_from("<Q", payload)
+        archiver.update_solution(index, decode_vectors(payload, 8)[0])
+    elif operation == RANDOM_ELITE:
+        archiver.get_index_of_random_elite()
+    elif operation == RANDOM_SOLUTION:
+        archiver.get_index_of_random_solution()
+    else:
+        raise ValueError(f"Unknown archive log operation {operation}")
+
+
+def restore_archiver(directory, snapshot_every=1000, fsync=True):
+    """
+    Args:
+        directory (str): archive directory (see ArchivePersistence)
+        snapshot_every (int): operations between snapshots
+        fsync (bool): whether every record is forced to disk before its operation is applied
+    Returns:
+        UncertainObjectivesArchiver: the archive of the directory after its last logged operation (a new archive if the
+        directory is empty), logging its next operations to the directory
+    """
+    persistence = ArchivePersistence(directory, snapshot_every=snapshot_every, fsync=fsync)
+    state, snapshot_operations, records, valid_length = persistence.read()
+    archiver = UncertainObjectivesArchiver() if state is None else UncertainObjectivesArchiver.from_state(state)
+
+    operations = snapshot_operations
+    for sequence, operation, payload in records:
+        if sequence < snapshot_operations: # already in the snapshot
+            continue
+        if sequence != operations:
+            raise ValueError(f"Archive log of {directory} jumps from operation {operations} to {sequence}")
+        try:
+            replay(archiver, operation, payload)
+        except (IndexError, ValueError) as error:
+            # an operation that failed when it was first applied is skipped, as it was by the archive that logged it
+            # (only logs written before the archiver checked its operations ahead of logging them hold such records)
+            warnings.warn(f"Archive log of {directory}: operation {sequence} failed and is skipped ({error})")
+        operations += 1
+
+    persistence.snapshot_operations = snapshot_operations
+    persistence.open(operations, valid_length)
+    if state is None:
+        # a new archive is snapshotted before its first operation, so that its random number generator state is kept
+        persistence.snapshot(archiver)
+    archiver.set_persistence(persistence)
+    return archiver
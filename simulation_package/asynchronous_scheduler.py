@@ -0,0 +1,284 @@
+"""
+This module contains the AsynchronousScheduler class, which runs a steady-state version of a pymoo algorithm (e.g. NSGA2)
+on a worker pool without generation barriers, so that every worker is kept busy for the whole optimisation.
+
+minimize with StarmapParallelization evaluates a generation at a time: the workers that finish their 100k-simulant
+simulations early wait for the slowest one of the generation, so cores sit idle at the end of every generation (and for
+good when the population is not a multiple of the number of workers). The scheduler instead keeps max_in_flight
+single-candidate tasks in the pool (Pool.apply_async) and, as soon as a task completes:
+
+    1) tells the algorithm the evaluated candidate: with n_offsprings=1, every tell is a (pop_size + 1) survival of
+       NSGA2, i.e. the steady-state NSGA2 of the candidates evaluated so far
+    2) hands the freed slot a new task: the most uncertain elite of the UncertainObjectivesArchiver not being evaluated
+       already, while re-evaluations make up less than reevaluation_share of the tasks (see archive_driver.py), or a new
+       candidate asked from the algorithm, mated from the current population
+
+With an archiver, every candidate is inserted into the archive and every re-evaluation added to its solution, and the
+archived members of the population compete on their archived means, as with ArchiveDriver. The initial population is
+the only barrier: the algorithm is told the whole of it at once.
+
+Seeds are drawn in the parent process and sent with every task: a new seed set of the common random numbers schedule of
+the problem every pop_size candidates (a generation's worth), otherwise fresh seeds per task (forked workers share the
+random state of the parent, so seeds drawn in the workers would repeat across workers).
+
+Every task records the worker process that ran it and when it was submitted, started and finished, from which metrics
+gives the utilisation of the pool: busy worker-seconds over (workers * wall-clock seconds) of the run.
+
+Methods:
+    AsynchronousScheduler.run: runs the algorithm until n_evals evaluations and returns its result
+
+    AsynchronousScheduler.metrics: utilisation, idle time, throughput and dispatch latency of the pool
+
+    evaluate_task: evaluates one candidate in a worker process
+
+
+Example usage:
+    >>> pool = multiprocessing.Pool(32)
+    >>> scheduler = AsynchronousScheduler(NoisyProblem(), NSGA2(pop_size=100), pool, n_workers=32, reevaluation_share=0.2)
+    >>> results = scheduler.run(n_evals=25_000)
+    >>> scheduler.metrics()["utilisation"]
+
+Note:
+    Only elementwise problems (NoisyProblem) can be scheduled a candidate at a time; the problem is sent with every task,
+    its own elementwise_runner is not used. The algorithm counts one generation per tell, so n_gen-based callbacks and
+    terminations see one generation per evaluation.
+"""
+
+import os
+import queue
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pymoo.core.population import Population
+
+from simulation_package.uncertain_archiver import UncertainObjectivesArchiver
+
+# task kinds
+CANDIDATE = "candidate"
+REEVALUATION = "reevaluation"
+
+
+def evaluate_task(problem, x, seed_set):
+    """
+    Args:
+        problem (ElementwiseProblem): problem of the candidate
+        x (np.ndarray): decision vector of the candidate
+        seed_set (list): seeds of the simulations of the candidate, None if the problem draws its own
+    Returns:
+        tuple: (out dictionary of the problem's _evaluate, worker process id, start time, end time)
+    """
+    start = time.time()
+    if seed_set is not None:
+        problem.seed_set = seed_set
+    out = problem.elementwise_func(problem, [], {})(x)
+    return out, os.getpid(), start, time.time()
+
+
+class AsynchronousScheduler:
+    """
+    Steady-state loop of a pymoo algorithm that keeps every worker of a pool evaluating candidates or re-evaluations.
+    """
+
+    def __init__(self, problem, algorithm, pool, n_workers, max_in_flight=None, reevaluation_share=0.0, archiver=None):
+        """
+        Args:
+            problem (ElementwiseProblem): noisy problem (e.g. NoisyProblem)
+            algorithm (GeneticAlgorithm): pymoo algorithm (e.g. NSGA2), not set up yet, run with n_offsprings=1
+            pool (multiprocessing.pool.Pool): worker pool the candidates are evaluated in
+            n_workers (int): worker processes of the pool
+            max_in_flight (int): tasks kept in the pool, n_workers if None
+            reevaluation_share (float): share of the tasks spent on re-evaluating elites of the archiver
+            archiver (UncertainObjectivesArchiver): archive of the evaluations, a new one if reevaluation_share > 0, None
+                keeps no archive
+        """
+        if not problem.elementwise:
+            raise ValueError("The asynchronous scheduler evaluates one candidate at a time, the problem must be elementwise")
+        if not 0 <= reevaluation_share < 1:
+            raise ValueError(f"reevaluation_share must be in [0, 1), got {reevaluation_share}")
+        self.problem = problem
+        self.algorithm = algorithm
+        # one offspring per tell: steady-state survival
+        self.algorithm.n_offsprings = 1
+        self.pool = pool
+        self.n_workers = n_workers
+        self.max_in_flight = n_workers if max_in_flight is None else max_in_flight
+        self.reevaluation_share = reevaluation_share
+        if archiver is None and reevaluation_share > 0:
+            archiver = UncertainObjectivesArchiver()
+        self.archiver = archiver
+
+        # completed tasks: (kind, worker process id, submitted, started, finished)
+        self.tasks = []
+        self.started = None
+        self.finished = None
+        self._results = queue.Queue()
+        # submitted and unfinished tasks: {task number: (kind, individual or archive index, submitted)}
+        self._in_flight = {}
+        self._task_number = 0
+        self._submitted = {CANDIDATE: 0, REEVALUATION: 0}
+
+    def _seed_set(self, kind):
+        schedule = getattr(self.problem, "seed_schedule", None)
+        if schedule is not None:
+            # a new seed set every pop_size candidates, as every generation of NoisyProblem.do; re-evaluations get the
+            # current one
+            if kind == CANDIDATE and (self.problem.seed_set is None or self._submitted[CANDIDATE] % self.algorithm.pop_size == 0):
+                self.problem.seed_set = schedule.next_seed_set()
+            return self.problem.seed_set
+        if hasattr(self.problem, "n_replications"):
+            return [np.random.randint(1, 2**32 - 1) for _ in range(self.problem.n_replications)]
+        return None
+
+    def _submit(self, kind, payload, x):
+        number = self._task_number
+        self._task_number += 1
+        seed_set = self._seed_set(kind)
+        self._in_flight[number] = (kind, payload, time.time())
+        self._submitted[kind] += 1
+        self.pool.apply_async(
+            evaluate_task, (self.problem, np.asarray(x), seed_set),
+            callback=lambda result: self._results.put((number, result)),
+            error_callback=lambda error: self._results.put((number, error)),
+        )
+
+    def _next_reevaluation(self):
+        """
+        Returns:
+            int: archive index of the most uncertain elite not being re-evaluated, None if no re-evaluation is due
+        """
+        if self.archiver is None or self.reevaluation_share == 0 or not self.archiver.get_number_of_elite():
+            return None
+        total = sum(self._submitted.values())
+        if self._submitted[REEVALUATION] >= self.reevaluation_share * (total + 1):
+            return None
+        being_reevaluated = {payload for kind, payload, _ in self._in_flight.values() if kind == REEVALUATION}
+        number = min(len(being_reevaluated) + 1, self.archiver.get_number_of_elite())
+        for index in self.archiver.get_indices_of_most_uncertain_elites(number):
+            if index not in being_reevaluated:
+                return index
+        return None
+
+    def _fill(self, n_evals):
+        """Submits tasks until max_in_flight are in the pool or the evaluation budget is handed out"""
+        while len(self._in_flight) < self.max_in_flight and sum(self._submitted.values()) < n_evals:
+            index = self._next_reevaluation()
+            if index is not None:
+                self._submit(REEVALUATION, index, self.archiver.get_decision_vector_at_index(index))
+                continue
+            if not self.algorithm.has_next():
+                return
+            off = self.algorithm.ask()
+            if off is None or len(off) == 0:
+                return
+            for individual in off:
+                self._submit(CANDIDATE, individual, individual.X)
+
+    def _receive(self):
+        """
+        Waits for the next completed task.
+        Returns:
+            tuple: (kind, individual or archive index, out dictionary of the problem)
+        """
+        number, result = self._results.get()
+        kind, payload, submitted = self._in_flight.pop(number)
+        if isinstance(result, Exception):
+            raise result
+        out, pid, started, finished = result
+        self.tasks.append((kind, pid, submitted, started, finished))
+        self.algorithm.evaluator.n_eval += 1
+        return kind, payload, out
+
+    def _set_evaluation(self, individual, out):
+        for key, value in out.items():
+            value = np.asarray(value)
+            individual.set(key, value.reshape(self.problem.n_obj) if key == "F" else value)
+        individual.evaluated.update(out.keys())
+
+    def _archive(self, kind, payload, out):
+        F = list(np.asarray(out["F"], dtype=float).reshape(self.problem.n_obj))
+        if kind == REEVALUATION:
+            self.archiver.update_solution(payload, F)
+        else:
+            payload.set("archive_index", self.archiver.insert_new_solution(F, list(payload.X)))
+
+    def _use_archived_means(self):
+        # survival compares the archived means of the population, not their first draw
+        for individual in self.algorithm.pop:
+            index = individual.get("archive_index")
+            if index is not None:
+                individual.set("F", np.array(self.archiver.get_estimated_objective_vector_at_index(index)))
+
+    def run(self, n_evals, seed=None, **kwargs):
+        """
+        Args:
+            n_evals (int): evaluations (candidates and re-evaluations) of the run
+            seed (int): random seed of the algorithm
+            kwargs: other options of algorithm.setup
+        Returns:
+            Result: result of the algorithm (its final population and optimum)
+        """
+        self.algorithm.setup(self.problem, termination=("n_evals", n_evals), seed=seed, **kwargs)
+        self.started = time.time()
+
+        # the initial population is told at once
+        initial = self.algorithm.ask()
+        for individual in initial:
+            self._submit(CANDIDATE, individual, individual.X)
+        for _ in range(len(initial)):
+            kind, individual, out = self._receive()
+            self._set_evaluation(individual, out)
+            if self.archiver is not None:
+                self._archive(kind, individual, out)
+        self.algorithm.tell(infills=initial)
+
+        # steady state: every completed task is told and its slot handed a new one
+        self._fill(n_evals)
+        while self._in_flight:
+            kind, payload, out = self._receive()
+            if kind == CANDIDATE:
+                self._set_evaluation(payload, out)
+            if self.archiver is not None:
+                self._archive(kind, payload, out)
+            if kind == CANDIDATE:
+                if self.archiver is not None:
+                    self._use_archived_means()
+                self.algorithm.tell(infills=Population.create(payload))
+            self._fill(n_evals)
+
+        self.finished = time.time()
+        if self.archiver is not None:
+            # re-evaluations completed after the last tell
+            self._use_archived_means()
+        return self.algorithm.result()
+
+    def metrics(self):
+        """
+        Returns:
+            dict: workers, evaluations and re-evaluations completed, wall-clock and busy worker seconds, utilisation
+            (busy over workers * wall-clock seconds), idle worker seconds, evaluations per second, mean seconds from the
+            submission of a task to its start, and utilisation of every worker process
+        """
+        end = self.finished if self.finished is not None else time.time()
+        wall_time = end - self.started if self.started is not None else 0.0
+        busy = {}
+        for _, pid, _, started, finished in self.tasks:
+            busy[pid] = busy.get(pid, 0.0) + finished - started
+        busy_time = sum(busy.values())
+        capacity = self.n_workers * wall_time
+        latencies = [started - submitted for _, _, submitted, started, _ in self.tasks]
+        return {
+            "workers": self.n_workers,
+            "evaluations": sum(1 for task in self.tasks if task[0] == CANDIDATE),
+            "reevaluations": sum(1 for task in self.tasks if task[0] == REEVALUATION),
+            "wall_time": wall_time,
+            "busy_time": busy_time,
+            "utilisation": busy_time / capacity if capacity > 0 else 0.0,
+            "idle_time": capacity - busy_time,
+            "evaluations_per_second": len(self.tasks) / wall_time if wall_time > 0 else 0.0,
+            "dispatch_latency": float(np.mean(latencies)) if latencies else 0.0,
+            "worker_utilisation": {pid: seconds / wall_time for pid, seconds in busy.items()} if wall_time > 0 else {},
+        }
@@ -19,7 +19,7 @@ Example usage:
 
 Note:
     1) This module requires three key simulation engine systems: Builder, Event, SimulantData which must be imported from vivarium.framework
-    2) This modules requires external serialized survival regression models (compute transition probabilities) to be imported, loaded with pickle and used in 
+    2) This modules requires external serialized survival regression models (compute transition probabilities) loaded lazily through model_registry.registry and used in 
         base_ab1_transition_rate and mbase_ab1_transition_rate. 
 """
 
@@ -30,25 +30,35 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import json
-import pickle
 
 from vivarium.framework.engine import Builder
 from vivarium.framework.event import Event
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-######## GET BINARY FILES ###########
+from simulation_package.competing_risks import CompetingRisksEvaluator
+from simulation_package.diagnostics import make_diagnostics
+from simulation_package.model_registry import registry
+from simulation_package.bookkeeping import transition_update
+from simulation_package.population_schema import column_series
+from simulation_package.state_index import get_state_index
 
-# healthy to ab1
-with open(
-    "transition_probabilities/binary_files/healthy2sAB.bin", "rb") as binary_healthy_to_ab1:
-    healthy_to_ab1_model = pickle.load(binary_healthy_to_ab1)
+# survival regression models are loaded lazily (on first use) by the registry, see model_registry.py
 
 
-# healthy to mab1
-with open(
-    "transition_probabilities/binary_files/healthy2mAB.bin", "rb") as binary_healthy_to_mab1:
-    healthy_to_mab1_model = pickle.load(binary_healthy_to_mab1)
+def grs_divisor(grs):
+    """
+    Returns the divisor applied to healthy -> Ab1/mAb1 transition probabilities for each GRS2 value.
+    """
+    conditions = [
+    grs < 8.2,
+    grs < 9.7,
+    grs < 11,
+    grs < 12.4]
+
+    divisors = [2.6, 3.2, 3.4, 3.89]
+
+    return np.select(conditions, divisors, default=1.0) #default 1 means no division if none of the conditions are met
 
 
 class AutoAntibody:
@@ -56,11 +66,19 @@ class AutoAntibody:
     Component handles transitions from healthy to Ab1 and mAb1 states.
     """
     
-    def __init__(self):
+    def __init__(self, engine="lifelines", diagnostics=None):
         self.name = "first_intermediate"
         self.completed_cycles = 0
-        self.survival_probs_ab1 = []
-        self.survival_probs_mab1 = []
+        # "lifelines" (fitted models), "numpy" (closed-form hazard_engine) or "lookup" (precomputed lookup_tables)
+        self.engine = engine
+        # survival frames are only captured when diagnostics is set ("ring", "summary", "spill"), see diagnostics.py
+        self.survival_probs_ab1 = make_diagnostics("ab1", diagnostics)
+        self.survival_probs_mab1 = make_diagnostics("mab1", diagnostics)
+        # both exits out of healthy are evaluated in one pass per time step, see competing_risks.py
+        self.competing_risks = CompetingRisksEvaluator(
+            ["Ab1", "mAb1"], ["healthy2sAB", "healthy2mAB"], engine=engine,
+            modifier=lambda population_df, probabilities: probabilities / grs_divisor(population_df["GRS2"].to_numpy())[:, np.newaxis],
+        )
 
     def setup(self, builder: Builder):
         
@@ -81,10 +99,8 @@ class AutoAntibody:
         self.grs_view = builder.population.get_view(["GRS2"])
         # get family history
         self.family_history_view = builder.population.get_view(["fdr"])
-        # get healthy simulants
-        self.healthy_population_view = builder.population.get_view(
-            ["state"], query="state == 'healthy'"
-        )
+        # healthy, Ab1 and mAb1 simulants are read from the shared per-state index, see state_index.py
+        self.state_index = get_state_index(builder)
 
         #### register value producers ####
         self.ab1_rate = builder.value.register_rate_producer(
@@ -95,28 +111,23 @@ class AutoAntibody:
         )
         self.randomness = builder.randomness.get_stream("autoantibody")
 
-        # register these 3 public methods within Vivarium's Event system so that they fire at each time step
+        # register these 2 public methods within Vivarium's Event system so that they fire at each time step
         builder.event.register_listener("time_step", self.determine_autoantibody)
         builder.event.register_listener("time_step", self.determine_ever_antibody)
-        builder.event.register_listener("time_step", self.determine_time_in_state)
 
     def base_ab1_transition_rate(self, index: pd.Index) -> pd.Series:
+        # rates computed by determine_autoantibody for this step
+        rate = self.competing_risks.rate("Ab1", index)
+        if rate is not None:
+            if self.survival_probs_ab1.enabled:
+                self.survival_probs_ab1.append(self.competing_risks.survival_function("Ab1"))
+            return rate
         population_df = self.population_view.get(index)
-        survival_prob = healthy_to_ab1_model.predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
+        survival_prob = registry.transition_model("healthy2sAB", self.engine).predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
         # Store the surv probs for each cycle
         self.survival_probs_ab1.append(survival_prob)
         rate = 1 - survival_prob.iloc[0]
-        grs = population_df['GRS2']
-        conditions = [
-        grs < 8.2,
-        grs < 9.7,
-        grs < 11,
-        grs < 12.4]
-
-        divisors = [2.6, 3.2, 3.4, 3.89]
-
-        divisor = np.select(conditions, divisors, default=1.0) #default 1 means no division if none of the conditions are met
-        rate = rate / divisor
+        rate = rate / grs_divisor(population_df['GRS2'])
 
         return rate
     # def base_ab1_transition_rate(self, index: pd.Index) -> pd.Series:
@@ -145,74 +156,38 @@ class AutoAntibody:
     #     return rate
 
     def base_mab1_transition_rate(self, index: pd.Index) -> pd.Series:
+        # rates computed by determine_autoantibody for this step
+        rate = self.competing_risks.rate("mAb1", index)
+        if rate is not None:
+            if self.survival_probs_mab1.enabled:
+                self.survival_probs_mab1.append(self.competing_risks.survival_function("mAb1"))
+            return rate
         population_df = self.population_view.get(index)
-        survival_prob = healthy_to_mab1_model.predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
+        survival_prob = registry.transition_model("healthy2mAB", self.engine).predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
         self.survival_probs_mab1.append(survival_prob)
         rate = 1 - survival_prob.iloc[0]
-        grs = population_df['GRS2']
-        conditions = [
-        grs < 8.2,
-        grs < 9.7,
-        grs < 11,
-        grs < 12.4]
-
-        divisors = [2.6, 3.2, 3.4, 3.89]
-
-        divisor = np.select(conditions, divisors, default=1.0) #default 1 means no division if none of the conditions are met
-        rate = rate / divisor
+        rate = rate / grs_divisor(population_df['GRS2'])
 
         return rate
 
-    def _get_healthy_population(self, full_population):
-        """
-        Helper function to filter and return the indices of healthy simulants.
-        Parameters:
-        full_population (pd.DataFrame): The DataFrame containing the full population data.
-        Returns:
-        pd.Index: The index of healthy simulants.
-        """
-        # Filter the population to get only healthy simulants
-        healthy_population = full_population[full_population["state"] == "healthy"]
-        # Extract and return the index of healthy simulants
-        healthy_index = healthy_population.index
-        return healthy_index
-
     def _compute_future_state(self, effective_ab1_rate, effective_mab1_rate, healthy_index):
         """
-        Helper function that computes future states and puts ab1 and mab1 into a pd.Series needed to update back to Vivarium.
+        Helper function that picks the future state of healthy simulants with a single draw.
         Parameters:
         effective_ab1_rate (pd.Series): The computed transition rates for simulants from healthy to Ab1 state.
         effective_mab1_rate (pd.Series): The computed transition rates for simulants from healthy to mAb1 state.
         healthy_index (pd.Index): The index of healthy simulants.
 
         Returns:
-        ab1_series (pd.Series): Series indicating simulants transitioning to Ab1 state.
-        mab1_series (pd.Series): Series indicating simulants transitioning to mAb1 state.
+        np.ndarray: destination code of each healthy simulant, 0 = Ab1, 1 = mAb1, 2 = stays healthy
         """
-        # Merge transition rates into a single DataFrame
-        merged_df = pd.concat([effective_ab1_rate.rename("ab1_rate"),effective_mab1_rate.rename("mab1_rate"),],axis=1,)
+        rates = np.column_stack([effective_ab1_rate.to_numpy(), effective_mab1_rate.to_numpy()])
 
         # Get a random draw from randomness system for each simulant
         draw = self.randomness.get_draw(healthy_index)
 
-        # Align draw with the merged DF
-        draw, merged_df = draw.align(merged_df)
-
-        # Add draw to merged DF
-        merged_df = pd.concat([merged_df, draw.rename("draw")], axis=1)
-
-        # Initialize future_state column
-        merged_df["future_state"] = ""
-
-        # Determine future state based on the draw and transition rates
-        merged_df.loc[merged_df["draw"] < merged_df["ab1_rate"], "future_state"] = "Ab1"
-        merged_df.loc[(merged_df["draw"] >= merged_df["ab1_rate"]) & (merged_df["draw"] < (merged_df["ab1_rate"] + merged_df["mab1_rate"])),"future_state"] = "mAb1"
-
-        # Extract the series for simulants transitioning to Ab1 and mAb1 states
-        ab1_series = merged_df.loc[merged_df["future_state"] == "Ab1", "future_state"]
-        mab1_series = merged_df.loc[merged_df["future_state"] == "mAb1", "future_state"]
-
-        return ab1_series, mab1_series
+        # draw < ab1_rate -> Ab1, ab1_rate <= draw < ab1_rate + mab1_rate -> mAb1, otherwise stays healthy
+        return CompetingRisksEvaluator.choose_destinations(rates, draw.to_numpy())
 
     def determine_autoantibody(self, event: Event):
         """
@@ -226,17 +201,20 @@ class AutoAntibody:
 
         if self.completed_cycles < 2:
             return
-        # get population
-        full_population = self.population_view.get(event.index)
-        healthy_index = self._get_healthy_population(full_population)
-        # call ab1_rate and mab1rate methods to compute transition probabilities
+        # get healthy population
+        healthy_index = self.state_index.get("healthy")
+        # compute both transition probabilities in one pass; ab1_rate and mab1_rate read them through the value system
+        self.competing_risks.evaluate(self.population_view.get(healthy_index))
         effective_ab1_rate = self.ab1_rate(healthy_index)
         effective_mab1_rate = self.mab1_rate(healthy_index)
         # compute future state
-        ab1_series, mab1_series = self._compute_future_state(effective_ab1_rate, effective_mab1_rate, healthy_index)
+        destinations = self._compute_future_state(effective_ab1_rate, effective_mab1_rate, healthy_index)
+        self.competing_risks.clear()
         # update
-        self.population_view.update(ab1_series.rename("state"))
-        self.population_view.update(mab1_series.rename("state"))
+        for code, state in enumerate(self.competing_risks.destinations):
+            moved = healthy_index[destinations == code]
+            self.population_view.update(transition_update(state, index=moved))
+            self.state_index.move(moved, state)
 
     def determine_ever_antibody(self, event: Event):
         """
@@ -246,24 +224,4 @@ class AutoAntibody:
         Returns:
             None
         """
-        population = self.population_view.get(event.index)
-        ab1_mab1_population = population[(population["state"] == "Ab1") | (population["state"] == "mAb1")]
-        self.population_view.update(pd.Series(1, index=ab1_mab1_population.index, name="ever_antibody"))
-
-    def determine_time_in_state(self, event: Event):
-        """
-        Updates the 'time_in_state' and 'previous_state' for individuals in the population.
-        Args:
-            event (Event): The event containing the index of the population to be evaluated.
-        Returns:
-            None
-        """
-        # get population
-        population = self.population_view.get(event.index)
-        # get all rows in the population where state != previous state
-        # these individuals just changed state in this cycle, so reset their time_in_state to 0
-        population.loc[population["state"] != population["previous_state"], "time_in_state"] = 0
-        # update previous_state to the current state for those who changed state
-        population.loc[population["state"] != population["previous_state"], "previous_state"] = population.loc[population["state"] != population["previous_state"], "state"]
-        # update the population view with the modified data
-        self.population_view.update(population)
+        self.population_view.update(column_series(1, index=self.state_index.get("Ab1", "mAb1"), name="ever_antibody"))
@@ -0,0 +1,206 @@
+"""
+This module contains the stacked batch evaluator, which simulates many screening vectors (or replicates) in one simulation.
+
+Every NoisyProblem evaluation builds and steps its own InteractiveContext, so the framework setup, the model calls and
+the fixed cost of every time step (event dispatch, pipelines, one random stream per decision point) are paid again for
+every candidate and every replicate. run_batch instead stacks B copies of the cohort, one per (screening vector,
+replicate), into a single state table: copy k holds the simulants k * N .. (k + 1) * N - 1 and a batch_id column k. The
+transition components run once per step over the B * N simulants, BatchScreening applies the threshold of each copy to
+its own simulants, and the additive outcome tallies are split by batch_id (outcomes.batch_tallies).
+
+Randomness:
+    Vivarium draws the random number of a simulant at its position in the stream of each decision point (see
+    sharding.py). stack_simulant_ids maps copy k of vector v and replicate r to the positions
+
+        common_draws=True:      r * N .. (r + 1) * N - 1    every vector sees the same cohort and the same draws, and copy
+                                                            (v, 0) gets exactly the outcomes of an unbatched run of v with
+                                                            the same seed (common random numbers, see
+                                                            common_random_numbers.py)
+        common_draws=False:     k * N .. (k + 1) * N - 1    every copy gets its own draws, as with a fresh seed per
+                                                            candidate
+
+    and the streams are only generated up to the last position used (Vivarium generates 10 * B * N draws by default).
+
+Methods:
+    CohortBatch: component creating the batch_id column
+
+    BatchScreening: Screening with one screening vector per copy of the cohort
+
+    batch_components: components of a stacked simulation (without observers and objective functions)
+
+    stack_simulant_ids: maps the simulants of the copies to their random draw positions
+
+    run_batch: simulates the copies in one simulation and returns the outcome tallies of every copy
+
+
+Example usage:
+    >>> tallies = run_batch(screening_vectors, population_size=100_000, seed=3, engine="numpy")
+    >>> costs = [ObjectiveFunctionCosts().costs_from_tallies(vector_tallies[0]) for vector_tallies in tallies]
+
+Note:
+    A batch holds B * N simulants in one process (about 56 bytes each, see population_schema.py): split large
+    generations with BatchedNoisyProblem(max_batch_size=...).
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from vivarium.framework.engine import Builder
+from vivarium.framework.population import SimulantData
+from vivarium.interface import InteractiveContext
+
+from simulation_package.make_population import Population
+from simulation_package.outcomes import batch_tallies
+from simulation_package.screening import Screening
+from simulation_package.screening_intervention import ScreeningIntervention
+from simulation_package.transition_kernel import transition_components
+from simulation_package.type1_diabetes_dka_splitting import Type1DiabetesDkaSplitting
+
+
+# only stacked simulations have a batch_id column, so it is not part of the schema of population_schema.py
+BATCH_ID_DTYPE = np.int32
+
+
+class CohortBatch:
+    """
+    Component assigning every simulant to its copy of the cohort (batch_id column).
+    """
+
+    def __init__(self, cohort_size):
+        self.name = "cohort_batch"
+        self.cohort_size = cohort_size
+
+    def setup(self, builder: Builder):
+        builder.population.initializes_simulants(self.on_initialize_simulants, creates_columns=["batch_id"])
+        self.population_view = builder.population.get_view(["batch_id"])
+
+    def on_initialize_simulants(self, pop_data: SimulantData):
+        batch_id = np.asarray(pop_data.index, dtype=np.int64) // self.cohort_size
+        self.population_view.update(pd.Series(batch_id, index=pop_data.index, name="batch_id", dtype=BATCH_ID_DTYPE))
+
+
+class BatchScreening(Screening):
+    """
+    Screening of a stacked simulation, with the screening vector of each copy of the cohort applied to its simulants.
+    """
+
+    def __init__(self, screening_vectors, grs_distribution="normal"):
+        """
+        Args:
+            screening_vectors (array-like): (copies, cycles) screening percentile of every copy and cycle
+            grs_distribution (str): "normal" or "empirical"
+        """
+        screening_vectors = np.atleast_2d(np.asarray(screening_vectors, dtype=float))
+        super().__init__(continuous_vector=screening_vectors.ravel(), grs_distribution=grs_distribution)
+        # (copies, cycles) thresholds, inf: nobody screened, -inf: everybody screened
+        self.threshold_matrix = np.asarray(self.threshold_vector).reshape(screening_vectors.shape)
+
+    def setup(self, builder: Builder):
+        super().setup(builder)
+        self.population_view = builder.population.get_view(
+            ["age", "number_of_screens", "GRS2", "screen_status", "screened_in_past", "screening_cost", "batch_id"]
+        )
+
+    def select_eligible(self, index):
+        """
+        Args:
+            index (pd.Index): simulants of the simulation
+        Returns:
+            pd.DataFrame: simulants whose GRS2 is above the threshold of their copy in the current cycle, None if
+            nobody is screened
+        """
+        thresholds = self.threshold_matrix[:, self.completed_cycles - 1]
+        if np.all(thresholds == np.inf):
+            return None
+
+        population = self.population_view.get(index)
+        return population.loc[population["GRS2"].to_numpy() > thresholds[population["batch_id"].to_numpy()]]
+
+
+def batch_components(screening_vectors, cohort_size, layout="components", engine="lifelines", grs_distribution="normal"):
+    """
+    Args:
+        screening_vectors (array-like): (copies, cycles) screening percentile of every copy and cycle
+        cohort_size (int): simulants per copy
+        layout (str): "components" or "fused", see transition_kernel.py
+        engine (str): "lifelines", "numpy" or "lookup", see model_registry.py
+        grs_distribution (str): "normal" or "empirical", see screening.py
+    Returns:
+        list: components of the natural history, batch assignment, screening and DKA splitting
+    """
+    return [
+        Population(),
+        CohortBatch(cohort_size),
+        *transition_components(layout, engine),
+        BatchScreening(screening_vectors, grs_distribution=grs_distribution),
+        ScreeningIntervention("screening_intervention", "further_t1d_splitting_rate"),
+        Type1DiabetesDkaSplitting(dka_ratio=0.58),
+    ]
+
+
+def stack_simulant_ids(sim, n_vectors, replicates, cohort_size, common_draws=True):
+    """
+    Maps the simulants of the copies of a simulation that is not set up yet to their random draw positions.
+    Args:
+        sim (InteractiveContext): simulation created with setup=False
+        n_vectors (int): screening vectors
+        replicates (int): copies per screening vector
+        cohort_size (int): simulants per copy
+        common_draws (bool): whether every vector shares the draws of each replicate
+    Returns:
+        int: number of draw positions used
+    """
+    copy = np.arange(n_vectors * replicates, dtype=np.int64)
+    # copy k is replicate k % replicates of vector k // replicates
+    first_position = (copy % replicates if common_draws else copy) * cohort_size
+    positions = (first_position[:, np.newaxis] + np.arange(cohort_size, dtype=np.int64)).ravel()
+    # the IndexMap of Vivarium 1.0 looks the draw position of each simulant up in _map, see sharding.offset_simulant_ids
+    sim._randomness._key_mapping._map = pd.Series(positions)
+    return int(positions.max()) + 1
+
+
+def run_batch(screening_vectors, population_size, seed, replicates=1, common_draws=True, layout="components",
+              engine="lifelines", prune_absorbing=False, grs_distribution="normal"):
+    """
+    Args:
+        screening_vectors (array-like): (vectors, cycles) screening percentile of every vector and cycle
+        population_size (int): simulants per copy of the cohort
+        seed (int): random seed
+        replicates (int): copies of the cohort per screening vector
+        common_draws (bool): whether every vector shares the draws of each replicate (see the module docstring)
+        layout (str): "components" or "fused"
+        engine (str): "lifelines", "numpy" or "lookup"
+        prune_absorbing (bool): drop simulants in absorbing states from per-step processing
+        grs_distribution (str): "normal" or "empirical"
+    Returns:
+        list: for every screening vector, the outcome tallies of each of its replicates (see outcomes.py)
+    """
+    screening_vectors = np.atleast_2d(np.asarray(screening_vectors, dtype=float))
+    n_vectors, n_cycles = screening_vectors.shape
+    n_copies = n_vectors * replicates
+    config = {
+        "randomness": {"key_columns": ["entrance_time", "GRS2", "fdr"], "random_seed": seed},
+        "population": {"population_size": n_copies * population_size, "prune_absorbing": prune_absorbing},
+        "time": {"step_size": 365},
+    }
+    components = batch_components(
+        np.repeat(screening_vectors, replicates, axis=0), population_size, layout=layout, engine=engine,
+        grs_distribution=grs_distribution,
+    )
+    sim = InteractiveContext(components=components, configuration=config, setup=False)
+    n_positions = stack_simulant_ids(sim, n_vectors, replicates, population_size, common_draws=common_draws)
+    sim.setup()
+    # the draws of the positions used are the first of every stream, so the time steps only generate those (setup sets
+    # the map size to 10 * B * N, which the initialisation draws still pay once)
+    sim._randomness._key_mapping.map_size = n_positions
+    sim.take_steps(n_cycles)
+    sim.finalize()
+
+    population = sim.get_component("population")
+    tallies = batch_tallies(sim.get_population(), population.state_index, n_copies)
+    return [tallies[vector * replicates:(vector + 1) * replicates] for vector in range(n_vectors)]
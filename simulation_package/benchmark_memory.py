@@ -0,0 +1,117 @@
+"""
+This module contains the memory benchmark of the Population state table (compact schema of population_schema.py).
+
+For every cohort size it initialises a simulation (Population, plus the numpy-engine transitions, Screening and the DKA
+splitting when --steps is given), measures the state table returned by sim.get_population() and reports the bytes per
+simulant, next to the same table stored with the dtypes used before the compact schema (int64 counters and flags, int64
+costs, Python strings for the state columns). The peak resident memory of the process is reported as well, since
+Vivarium's randomness key index and the per-step temporaries come on top of the table itself.
+
+Methods:
+    legacy_state_table: the state table cast back to the pre-schema dtypes
+
+    measure: bytes per simulant of a cohort after its initialisation (and steps)
+
+    main: runs the benchmark for the sizes given on the command line
+
+
+Example usage:
+    >>> python simulation_package/benchmark_memory.py                      # 100k, 1M and 10M simulants
+    >>> python simulation_package/benchmark_memory.py 100000 1000000 --steps 3
+
+Note:
+    The state table has fixed-width columns only, so bytes per simulant do not depend on the cohort size; the larger
+    sizes mainly check the peak memory. Sizes run one after the other in the same process, so the peak RSS of a size
+    includes the earlier ones only if they were larger.
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from vivarium.interface import InteractiveContext
+
+from simulation_package.make_population import Population
+from simulation_package.population_schema import COLUMN_DTYPES, bytes_per_simulant
+from simulation_package.screening import Screening
+from simulation_package.screening_intervention import ScreeningIntervention
+from simulation_package.states import CATEGORICAL_COLUMNS
+from simulation_package.transition_kernel import transition_components
+from simulation_package.type1_diabetes_dka_splitting import Type1DiabetesDkaSplitting
+
+
+SIZES = [100_000, 1_000_000, 10_000_000]
+
+
+def legacy_state_table(state_table):
+    """
+    Args:
+        state_table (pd.DataFrame): state table with the compact schema
+    Returns:
+        pd.DataFrame: copy with the dtypes used before the compact schema
+    """
+    legacy_dtypes = {column: object if column in CATEGORICAL_COLUMNS else np.int64 for column in COLUMN_DTYPES}
+    legacy_dtypes["GRS2"] = np.float64
+    return state_table.astype(legacy_dtypes)
+
+
+def measure(population_size, steps=0):
+    """
+    Args:
+        population_size (int): number of simulants
+        steps (int): time steps to run after the initialisation
+    Returns:
+        dict: bytes per simulant of the compact and legacy tables, table size, initialisation time and peak memory
+    """
+    start = time.time()
+    components = [Population()]
+    if steps:
+        components += [
+            *transition_components("fused", engine="numpy"),
+            Screening(continuous_vector=np.ones(steps)),
+            ScreeningIntervention("screening_intervention", "further_t1d_splitting_rate"),
+            Type1DiabetesDkaSplitting(dka_ratio=0.58),
+        ]
+    sim = InteractiveContext(
+        components=components,
+        configuration={
+            "randomness": {"key_columns": ["entrance_time", "GRS2", "fdr"]},
+            "population": {"population_size": population_size},
+            "time": {"step_size": 365},
+        },
+    )
+    sim.take_steps(steps)
+    state_table = sim.get_population()
+    compact = bytes_per_simulant(state_table)
+    return {
+        "simulants": population_size,
+        "bytes_per_simulant": compact,
+        "legacy_bytes_per_simulant": bytes_per_simulant(legacy_state_table(state_table)),
+        "table_mb": compact * population_size / 2**20,
+        "seconds": time.time() - start,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10,
+    }
+
+
+def main(sizes, steps=0):
+    print(f"{'simulants':>12} {'bytes/simulant':>15} {'legacy':>8} {'table MB':>10} {'run s':>8} {'peak RSS MB':>12}")
+    for population_size in sizes:
+        result = measure(population_size, steps)
+        print(
+            f"{result['simulants']:>12,} {result['bytes_per_simulant']:>15.1f} {result['legacy_bytes_per_simulant']:>8.1f} "
+            f"{result['table_mb']:>10.1f} {result['seconds']:>8.1f} {result['peak_rss_mb']:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bytes per simulant of the Population state table")
+    parser.add_argument("sizes", nargs="*", type=int, default=SIZES, help="cohort sizes")
+    parser.add_argument("--steps", type=int, default=0, help="time steps to run after the initialisation")
+    arguments = parser.parse_args()
+    main(arguments.sizes, arguments.steps)
@@ -0,0 +1,98 @@
+"""
+This module contains the StateBookkeeping component, the single place where previous_state and time_in_state are
+brought up to date after the transitions of a time step.
+
+It replaces the determine_time_in_state copies that AutoAntibody, AutoToMultiInsideAutoantibody,
+MultiToAutoInsideAutoantibody, Dysglycemia and FromDysglycemia each ran on the full state table. The work is split as follows:
+
+    transition components: write the new state together with time_in_state = 0 for the simulants that move
+                           (transition_update), so later transitions of the same step see the restarted clock
+    StateBookkeeping:      once per step, sets previous_state = state (and time_in_state = 0) on the rows where the two
+                           differ, and only on those rows
+
+Ordering guarantee:
+    StateBookkeeping runs once per time step, right after the last natural-history transition (FromDysglycemia or
+    TransitionKernel) and before Screening and Type1DiabetesDkaSplitting; transition_components places it there.
+    State changes made after it in a step (the DKA splitting) are booked by the next step's phase, after
+    Population.age_simulants, exactly as the first determine_time_in_state copy (AutoAntibody's) used to book them.
+    The time_in_state trajectories are therefore unchanged (tests/simulation_tests/test_bookkeeping.py).
+
+Methods:
+    transition_update: population_view.update payload moving simulants to a new state
+
+    book_state_changes: bookkeeping update of the rows whose state differs from previous_state
+
+    StateBookkeeping.book_time_in_state: time_step listener applying book_state_changes
+
+
+Example usage:
+    >>> self.population_view.update(transition_update("mAb1", index=affected_index))
+"""
+
+import os
+import sys
+
+import pandas as pd
+from vivarium.framework.engine import Builder
+from vivarium.framework.event import Event
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from simulation_package.population_schema import column_series
+from simulation_package.state_index import get_state_index
+from simulation_package.states import state_series
+
+
+def transition_update(state, index):
+    """
+    Args:
+        state (str or array-like): destination state of the moving simulants
+        index (pd.Index): moving simulants
+    Returns:
+        pd.DataFrame: new state and time_in_state = 0 for every simulant in index
+    """
+    return pd.DataFrame({"state": state_series(state, index=index), "time_in_state": column_series(0, index=index, name="time_in_state")}, index=index)
+
+
+def book_state_changes(population):
+    """
+    Args:
+        population (pd.DataFrame): state, previous_state and time_in_state columns
+    Returns:
+        pd.DataFrame: previous_state = state and time_in_state = 0 for the rows whose state changed
+    """
+    changed = population["state"] != population["previous_state"]
+    changed_index = population.index[changed.to_numpy()]
+    return pd.DataFrame(
+        {
+            "previous_state": state_series(population.loc[changed_index, "state"], index=changed_index, name="previous_state"),
+            "time_in_state": column_series(0, index=changed_index, name="time_in_state"),
+        },
+        index=changed_index,
+    )
+
+
+class StateBookkeeping:
+    """
+    Component books previous_state and time_in_state once per step, after the natural-history transitions.
+    """
+
+    def __init__(self):
+        self.name = "state_bookkeeping"
+
+    def setup(self, builder: Builder):
+        self.population_view = builder.population.get_view(["state", "previous_state", "time_in_state"])
+        # simulants pruned from the active set are booked by Population.settle_pruned_simulants, see state_index.py
+        self.state_index = get_state_index(builder)
+        builder.event.register_listener("time_step", self.book_time_in_state)
+
+    def book_time_in_state(self, event: Event):
+        """
+        Updates previous_state and time_in_state of the simulants whose state changed since the last bookkeeping.
+        Args:
+            event (Event): time step event
+        """
+        population = self.population_view.get(self.state_index.active())
+        update = book_state_changes(population)
+        if not update.empty:
+            self.population_view.update(update)
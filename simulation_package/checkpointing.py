@@ -0,0 +1,246 @@
+"""
+This module contains the generation checkpoints of an optimisation run and its streamed population history, so that a
+run can be resumed after a crash and its history does not have to be kept in memory.
+
+minimize(..., save_history=True) keeps a deep copy of the algorithm for every generation and the results are only
+pickled once the run is over. GenerationCheckpoint is a pymoo callback that, after every generation:
+
+    1) appends the population of the generation to a GenerationHistory, an append-only columnar store with one raw
+       binary file per column:
+
+            generation:     generation of the row
+            X:              (n_var) screening vector
+            F:              (n_obj) objectives
+            seeds:          (n_replications) seeds the objectives were simulated with (out["seeds"] of NoisyProblem and
+                            BatchedNoisyProblem), if the problem sets them
+            wall_time:      wall-clock seconds of the generation
+
+    2) pickles the algorithm (population, random generator, termination, mating and this callback with the number of
+       history rows written) and the numpy and random global random states to a temporary file, which then atomically
+       replaces the previous checkpoint
+
+resume loads the last checkpoint, cuts off any history rows written after it, and returns the algorithm, which
+minimize(..., copy_algorithm=False) runs on from the next generation. Memory stays flat whatever the number of
+generations, and load_history reads the history back (during or after the run).
+
+Methods:
+    GenerationHistory: append-only columnar store of the populations
+
+    GenerationCheckpoint: callback writing the history and the checkpoint of every generation
+
+    resume: algorithm of the last checkpoint, ready to run on
+
+    load_history: columns of the history of a checkpoint directory
+
+
+Example usage:
+    >>> results = minimize(problem, NSGA2(pop_size=100), ("n_gen", 250), callback=GenerationCheckpoint("checkpoints"))
+    >>> # after a crash
+    >>> algorithm = resume("checkpoints", problem)
+    >>> results = minimize(algorithm.problem, algorithm, copy_algorithm=False)
+    >>> history = load_history("checkpoints")
+
+Note:
+    The worker pool of an elementwise runner cannot be pickled: resume puts the runner of the problem it is passed back
+    into the problem of the checkpoint, which keeps the state of the problem (e.g. its common random numbers seed
+    schedule). The global random states of worker processes are not checkpointed.
+"""
+
+import json
+import os
+import pickle
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pymoo.core.callback import Callback
+
+
+CHECKPOINT_NAME = "checkpoint.pkl"
+HISTORY_NAME = "history"
+COLUMNS_NAME = "columns.json"
+
+
+def write_atomically(path, write, fsync=True):
+    """
+    Writes a file through a temporary file that then replaces it, so that a crash leaves the previous or the new file.
+    Args:
+        path (str): file
+        write (callable): function writing the content to an open binary file
+        fsync (bool): whether the content is forced to disk before the replacement
+    """
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        write(file)
+        file.flush()
+        if fsync:
+            os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+class GenerationHistory:
+    """
+    Append-only columnar store of rows, one raw binary file per column.
+    """
+
+    def __init__(self, directory, fsync=True):
+        """
+        Args:
+            directory (str): directory of the column files, created if needed
+            fsync (bool): whether appended rows are forced to disk
+        """
+        self.directory = directory
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self.columns_path = os.path.join(directory, COLUMNS_NAME)
+
+    def _column_path(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def columns(self):
+        """
+        Returns:
+            dict: dtype and width (values per row) of every column, empty before the first append
+        """
+        if not os.path.exists(self.columns_path):
+            return {}
+        with open(self.columns_path) as file:
+            return json.load(file)
+
+    def append(self, rows):
+        """
+        Args:
+            rows (dict): (rows, width) or (rows,) array of every column, the same columns on every call
+        """
+        arrays = {name: np.asarray(values) for name, values in rows.items()}
+        arrays = {name: values.reshape(len(values), -1) for name, values in arrays.items()}
+        columns = self.columns()
+        if not columns:
+            columns = {name: {"dtype": values.dtype.newbyteorder("<").str, "width": values.shape[1]} for name, values in arrays.items()}
+            write_atomically(self.columns_path, lambda file: file.write(json.dumps(columns).encode()), self.fsync)
+        elif set(columns) != set(arrays):
+            raise ValueError(f"History columns {sorted(columns)}, got {sorted(arrays)}")
+
+        for name, column in columns.items():
+            with open(self._column_path(name), "ab") as file:
+                file.write(np.ascontiguousarray(arrays[name], dtype=column["dtype"]).tobytes())
+                file.flush()
+                if self.fsync:
+                    os.fsync(file.fileno())
+
+    def clear(self):
+        """Removes every column and the schema"""
+        for name in self.columns():
+            if os.path.exists(self._column_path(name)):
+                os.remove(self._column_path(name))
+        if os.path.exists(self.columns_path):
+            os.remove(self.columns_path)
+
+    def truncate(self, rows):
+        """Cuts every column off after its first rows"""
+        for name, column in self.columns().items():
+            path = self._column_path(name)
+            if os.path.exists(path):
+                with open(path, "ab") as file:
+                    file.truncate(min(os.path.getsize(path), rows * column["width"] * np.dtype(column["dtype"]).itemsize))
+
+    def load(self):
+        """
+        Returns:
+            dict: (rows, width) array of every column (memory-mapped), cut to the rows written to every column
+        """
+        arrays = {}
+        for name, column in self.columns().items():
+            path = self._column_path(name)
+            if os.path.exists(path) and os.path.getsize(path):
+                arrays[name] = np.memmap(path, dtype=column["dtype"], mode="r").reshape(-1, column["width"])
+            else:
+                arrays[name] = np.zeros((0, column["width"]), dtype=column["dtype"])
+        rows = min((len(values) for values in arrays.values()), default=0)
+        return {name: values[:rows] for name, values in arrays.items()}
+
+
+class GenerationCheckpoint(Callback):
+    """
+    Callback streaming the population of every generation to a GenerationHistory and checkpointing the algorithm.
+    """
+
+    def __init__(self, directory, fsync=True):
+        """
+        Args:
+            directory (str): checkpoint directory, created if needed
+            fsync (bool): whether the history and checkpoints are forced to disk
+        """
+        super().__init__()
+        self.directory = directory
+        self.fsync = fsync
+        self.history = GenerationHistory(os.path.join(directory, HISTORY_NAME), fsync=fsync)
+        # rows of the history the checkpoint includes
+        self.history_rows = 0
+        self.last_time = time.time()
+
+    def initialize(self, algorithm):
+        # a new run replaces the history of a previous run in the directory (a resumed run is initialized already)
+        self.history.clear()
+
+    def notify(self, algorithm):
+        now = time.time()
+        pop = algorithm.pop
+        rows = {
+            "generation": np.full(len(pop), algorithm.n_gen, dtype=np.int32),
+            "X": pop.get("X"),
+            "F": pop.get("F"),
+            "wall_time": np.full(len(pop), now - self.last_time),
+        }
+        seeds = pop.get("seeds")
+        if all(s is not None for s in seeds):
+            rows["seeds"] = np.array([np.atleast_1d(s) for s in seeds], dtype=np.int64)
+        self.history.append(rows)
+        self.history_rows += len(pop)
+        self.last_time = now
+        self.save(algorithm)
+
+    def save(self, algorithm):
+        """Writes the checkpoint of the algorithm (this callback included) and the global random states"""
+        checkpoint = {"algorithm": algorithm, "numpy_random_state": np.random.get_state(), "random_state": random.getstate()}
+        write_atomically(
+            os.path.join(self.directory, CHECKPOINT_NAME), lambda file: pickle.dump(checkpoint, file), self.fsync
+        )
+
+
+def resume(directory, problem=None):
+    """
+    Args:
+        directory (str): checkpoint directory of a GenerationCheckpoint
+        problem (Problem): problem of the run, whose elementwise runner (worker pool) the checkpointed problem gets
+    Returns:
+        Algorithm: algorithm of the last checkpoint, to run on with minimize(algorithm.problem, algorithm, copy_algorithm=False)
+    """
+    with open(os.path.join(directory, CHECKPOINT_NAME), "rb") as file:
+        checkpoint = pickle.load(file)
+    np.random.set_state(checkpoint["numpy_random_state"])
+    random.setstate(checkpoint["random_state"])
+
+    algorithm = checkpoint["algorithm"]
+    # the checkpoint is written by the callback, before pymoo moves on to the next generation
+    algorithm.n_iter += 1
+    callback = algorithm.callback
+    callback.history.truncate(callback.history_rows)
+    callback.last_time = time.time()
+    if problem is not None and hasattr(problem, "elementwise_runner"):
+        algorithm.problem.elementwise_runner = problem.elementwise_runner
+    return algorithm
+
+
+def load_history(directory):
+    """
+    Args:
+        directory (str): checkpoint directory of a GenerationCheckpoint
+    Returns:
+        dict: (rows, width) array of every history column, one row per individual of every generation's population
+    """
+    return GenerationHistory(os.path.join(directory, HISTORY_NAME), fsync=False).load()
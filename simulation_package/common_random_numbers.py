@@ -0,0 +1,65 @@
+"""
+This module contains the SeedSchedule class, the seed sets shared by NoisyProblem evaluations in common random numbers mode.
+
+Without it every candidate is simulated with a fresh random seed, so the difference between two screening vectors is
+swamped by the Monte Carlo noise of two independent cohorts. Vivarium keys every random draw on the stream name, the
+simulation clock, the simulant id and the seed, so two simulations run with the same seed give every simulant the same
+natural-history draws (autoantibody, ab1_dysglycemia, further_t1d_splitting, screening_randomness, ...) whatever the
+screening vector: the objectives of two candidates then only differ by the effect of their screening.
+
+A seed set is the tuple of seeds (one per replication) every candidate of an evaluation is simulated with. NoisyProblem
+takes one seed set per call of evaluate, i.e. per generation of the algorithm, and the schedule only draws a new one every
+`rotation` generations (never with rotation=None), so that the optimiser does not overfit the noise of a single cohort.
+
+Methods:
+    SeedSchedule.seed_set: seed set of a generation (reproducible from base_seed)
+
+    SeedSchedule.next_seed_set: seed set of the next generation
+
+
+Example usage:
+    >>> schedule = SeedSchedule(n_replications=2, rotation=5, base_seed=42)
+    >>> seeds = schedule.next_seed_set()      # generations 0-4 share these seeds, generation 5 gets new ones
+"""
+
+import numpy as np
+
+
+class SeedSchedule:
+    """
+    Seed sets of consecutive generations, rotated every `rotation` generations.
+    """
+
+    def __init__(self, n_replications=1, rotation=1, base_seed=None):
+        """
+        Args:
+            n_replications (int): seeds per set, i.e. simulations per candidate
+            rotation (int): generations that share a seed set, None to use one seed set for the whole run
+            base_seed (int): seed the seed sets are derived from, drawn at random if None
+        """
+        if rotation is not None and rotation < 1:
+            raise ValueError(f"rotation must be a positive number of generations or None, got {rotation}")
+        self.n_replications = n_replications
+        self.rotation = rotation
+        self.base_seed = int(np.random.randint(0, 2**31 - 1)) if base_seed is None else base_seed
+        self.generation = 0
+
+    def seed_set(self, generation):
+        """
+        Args:
+            generation (int): number of the evaluate call
+        Returns:
+            tuple: seeds of the generation, one per replication
+        """
+        block = 0 if self.rotation is None else generation // self.rotation
+        rng = np.random.default_rng([self.base_seed, block])
+        return tuple(int(seed) for seed in rng.integers(1, 2**32 - 1, size=self.n_replications))
+
+    def next_seed_set(self):
+        """
+        Returns:
+            tuple: seeds of the next generation
+        """
+        seeds = self.seed_set(self.generation)
+        self.generation += 1
+        return seeds
@@ -0,0 +1,138 @@
+"""
+This module contains the CompetingRisksEvaluator class, used by components with several exits out of the same state
+(AutoAntibody: healthy -> Ab1 / mAb1, FromDysglycemia: dysglycemic -> Ab1 / mAb1 / type1_diabetes).
+
+Instead of every rate producer reading the population again and running its own model prediction on the same rows,
+the evaluator takes the covariates of the at-risk simulants once, computes all exit probabilities in one pass and caches
+them. The rate producers registered in Vivarium's value system read from that cache, so value modifiers registered by
+other components still apply. Destinations are then picked with a single uniform draw per simulant against the cumulative
+sum of the effective rates, and returned as integer codes (index into ``destinations``, ``len(destinations)`` = stay).
+
+Methods:
+    exit_probabilities: (n, K) array with the one-step probability of each of the K exits
+
+    evaluate: computes and caches the exit probabilities (and the rates, after the optional modifier) of the at-risk population
+
+    rate: cached rate of one destination as a pd.Series, or None if the cache does not hold that index
+
+    survival_function: cached one-step survival of one destination, laid out as lifelines' predict_survival_function
+
+    choose_destinations: integer destination codes from an (n, K) rate matrix and one uniform draw per simulant
+
+Example usage:
+    >>> evaluator = CompetingRisksEvaluator(["Ab1", "mAb1"], ["healthy2sAB", "healthy2mAB"], engine="numpy")
+    >>> evaluator.evaluate(healthy_population)
+    >>> codes = CompetingRisksEvaluator.choose_destinations(np.column_stack([ab1_rate, mab1_rate]), draw)
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from simulation_package.model_registry import registry
+
+
+class CompetingRisksEvaluator:
+    """
+    Computes every exit probability out of one state in a single pass over one covariate matrix.
+    """
+
+    def __init__(self, destinations, models, engine="lifelines", modifier=None):
+        """
+        Args:
+            destinations (list): destination state of each exit, in the order used to resolve the draw
+            models (list): registry stem of the survival model of each exit
+            engine (str): "lifelines", "numpy" or "lookup", see model_registry.TransitionModelRegistry.transition_model
+            modifier (callable): optional f(population_df, probabilities) -> rates applied to the (n, K) probabilities
+        """
+        if len(destinations) != len(models):
+            raise ValueError("destinations and models must have the same length")
+        self.destinations = list(destinations)
+        self.models = list(models)
+        self.engine = engine
+        self.modifier = modifier
+        self.clear()
+
+    def exit_probabilities(self, population_df):
+        """
+        Args:
+            population_df (pd.DataFrame): at-risk simulants with time_in_state and the model covariates
+        Returns:
+            np.ndarray: (n, K) one-step exit probabilities, one column per destination
+        """
+        models = [registry.transition_model(stem, self.engine) for stem in self.models]
+        time_in_state = np.asarray(population_df["time_in_state"], dtype=float)
+
+        # covariate matrix shared by all closed-form and lookup models, extracted once
+        covariates = {}
+        for model in models:
+            if hasattr(model, "transition_probability"):
+                for covariate in model.covariates:
+                    if covariate not in covariates:
+                        covariates[covariate] = np.asarray(population_df[covariate], dtype=float)
+
+        probabilities = np.empty((len(population_df), len(models)))
+        for k, model in enumerate(models):
+            if hasattr(model, "transition_probability"):
+                probabilities[:, k] = model.transition_probability(covariates, time_in_state)
+            else:
+                survival_prob = model.predict_survival_function(population_df, times=1, conditional_after=time_in_state)
+                probabilities[:, k] = 1 - survival_prob.to_numpy()[0]
+        return probabilities
+
+    def evaluate(self, population_df):
+        """
+        Computes and caches the exit probabilities and rates of the simulants in population_df.
+        Returns:
+            np.ndarray: (n, K) rates (exit probabilities after the modifier, if any)
+        """
+        self._index = population_df.index
+        self._probabilities = self.exit_probabilities(population_df)
+        if self.modifier is None:
+            self._rates = self._probabilities
+        else:
+            self._rates = self.modifier(population_df, self._probabilities)
+        return self._rates
+
+    def rate(self, destination, index):
+        """
+        Args:
+            destination (str): destination state
+            index (pd.Index): simulants the rate is requested for
+        Returns:
+            pd.Series or None: cached rate if evaluate() was called for exactly this index, otherwise None
+        """
+        if self._index is None or not self._index.equals(index):
+            return None
+        return pd.Series(self._rates[:, self.destinations.index(destination)], index=self._index)
+
+    def survival_function(self, destination):
+        """Cached one-step survival of one exit (before modifier), laid out as lifelines' predict_survival_function"""
+        survival = 1 - self._probabilities[:, self.destinations.index(destination)]
+        return pd.DataFrame(survival[np.newaxis, :], index=[1.0], columns=self._index)
+
+    def clear(self):
+        """Drops the cached evaluation (call at the end of each time step)"""
+        self._index = None
+        self._probabilities = None
+        self._rates = None
+
+    @staticmethod
+    def choose_destinations(rates, draw):
+        """
+        Resolves competing exits with one uniform draw per simulant.
+        Simulant i goes to destination k if cumsum(rates[i])[k-1] <= draw[i] < cumsum(rates[i])[k], which is a row-wise
+        searchsorted(side="right") of the draw in the cumulative rates.
+        Args:
+            rates (np.ndarray): (n, K) effective rates
+            draw (array-like): (n,) uniform draws
+        Returns:
+            np.ndarray: integer codes in [0, K], K meaning the simulant stays in its state
+        """
+        cumulative_rates = np.cumsum(np.asarray(rates, dtype=float), axis=1)
+        draw = np.asarray(draw, dtype=float)
+        return (draw[:, np.newaxis] >= cumulative_rates).sum(axis=1)
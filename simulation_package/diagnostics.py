@@ -0,0 +1,180 @@
+"""
+This module contains the SurvivalDiagnostics class, a bounded and opt-in replacement of the survival_probs lists that
+AutoAntibody, FromDysglycemia and MultiToAutoInsideAutoantibody used to append every predicted survival frame to.
+
+Those lists were never released, so memory grew with population size x number of steps, and again with every evaluation
+run inside a pool worker. Capture is now off by default and, when enabled, runs in one of these modes:
+
+    "off":     nothing is kept (default)
+    "ring":    the last ``capacity`` survival frames are kept in a ring buffer
+    "summary": only streaming statistics are kept, one row per record (n, mean, min, max, quantiles and a histogram)
+    "spill":   every frame is written to ``spill_dir`` as a .npz file and only its path is kept in memory
+
+Each record corresponds to one call of the rate producer, i.e. one time step in a normal simulation.
+
+Methods:
+    append: records one survival frame (laid out as lifelines' predict_survival_function), a no-op when off
+
+    summary: pd.DataFrame with one row of statistics per record
+
+    frames: survival frames retained in the ring buffer or spilled to disk
+
+    make_diagnostics: builds a SurvivalDiagnostics from the ``diagnostics`` argument of a component
+
+    clear: drops everything captured so far
+
+
+Example usage:
+    >>> autoantibody = AutoAntibody(diagnostics="summary")
+    >>> ... run the simulation ...
+    >>> autoantibody.survival_probs_ab1.summary()
+    >>> AutoAntibody(diagnostics={"mode": "spill", "spill_dir": "/tmp/survival_frames"})
+"""
+
+import os
+import uuid
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+DIAGNOSTIC_MODES = ("off", "ring", "summary", "spill")
+
+DEFAULT_CAPACITY = 15
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# survival probabilities live in [0, 1]
+DEFAULT_BINS = np.linspace(0, 1, 21)
+
+
+class SurvivalDiagnostics:
+    """
+    Bounded capture of the survival frames predicted by one rate producer.
+    """
+
+    def __init__(self, name, mode="off", capacity=DEFAULT_CAPACITY, quantiles=DEFAULT_QUANTILES, bins=DEFAULT_BINS, spill_dir=None):
+        """
+        Args:
+            name (str): name of the captured rate, used in spilled file names
+            mode (str): one of DIAGNOSTIC_MODES
+            capacity (int): number of frames kept by the ring buffer
+            quantiles (tuple): quantiles of the survival probabilities reported by summary()
+            bins (array-like): histogram bin edges reported by summary()
+            spill_dir (str): directory of the spilled frames, required by the "spill" mode
+        """
+        if mode not in DIAGNOSTIC_MODES:
+            raise ValueError(f"Unknown diagnostics mode '{mode}'. Expected one of {list(DIAGNOSTIC_MODES)}")
+        if mode == "spill" and spill_dir is None:
+            raise ValueError("The 'spill' diagnostics mode requires a spill_dir")
+        self.name = name
+        self.mode = mode
+        self.capacity = capacity
+        self.quantiles = tuple(quantiles)
+        self.bins = np.asarray(bins, dtype=float)
+        self.spill_dir = spill_dir
+        self.clear()
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def append(self, survival_prob):
+        """
+        Records one survival frame.
+        Args:
+            survival_prob (pd.DataFrame): one row indexed by the prediction time and one column per simulant
+        """
+        if not self.enabled:
+            return
+        record = self.records
+        self.records += 1
+        values = survival_prob.to_numpy(dtype=float).ravel()
+
+        if self.mode == "ring":
+            self._frames.append(survival_prob)
+        elif self.mode == "summary":
+            self._summary.append(self._statistics(record, values))
+        elif self.mode == "spill":
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{self.name}-{os.getpid()}-{self._token}-{record:04d}.npz")
+            np.savez(path, index=survival_prob.columns.to_numpy(), times=survival_prob.index.to_numpy(), values=survival_prob.to_numpy())
+            self._paths.append(path)
+
+    def _statistics(self, record, values):
+        """Summary statistics of the survival probabilities of one record"""
+        statistics = {"record": record, "n": len(values)}
+        if len(values):
+            statistics.update({"mean": values.mean(), "min": values.min(), "max": values.max()})
+            statistics.update({f"q{quantile:g}": value for quantile, value in zip(self.quantiles, np.quantile(values, self.quantiles))})
+        statistics["histogram"] = np.histogram(values, bins=self.bins)[0]
+        return statistics
+
+    def summary(self):
+        """
+        Returns:
+            pd.DataFrame: one row of statistics per record (computed from the retained frames in "ring" and "spill" modes)
+        """
+        if self.mode == "summary":
+            rows = self._summary
+        else:
+            first_record = self.records - len(self)
+            rows = [
+                self._statistics(first_record + offset, frame.to_numpy(dtype=float).ravel())
+                for offset, frame in enumerate(self.frames())
+            ]
+        return pd.DataFrame(rows)
+
+    def frames(self):
+        """
+        Returns:
+            list: retained survival frames, oldest first (empty in "off" and "summary" modes)
+        """
+        if self.mode == "ring":
+            return list(self._frames)
+        if self.mode == "spill":
+            frames = []
+            for path in self._paths:
+                with np.load(path, allow_pickle=True) as spilled:
+                    frames.append(pd.DataFrame(spilled["values"], index=spilled["times"], columns=spilled["index"]))
+            return frames
+        return []
+
+    def clear(self):
+        """Drops everything captured so far (spilled files are left on disk)"""
+        self.records = 0
+        # distinguishes the spilled files of this instance (and of every clear) from those of other instances of the
+        # same name and process, whose records are numbered from 0 as well
+        self._token = uuid.uuid4().hex[:12]
+        self._frames = deque(maxlen=self.capacity)
+        self._summary = []
+        self._paths = []
+
+    def __len__(self):
+        """Number of frames that can be returned by frames()"""
+        if self.mode == "ring":
+            return len(self._frames)
+        if self.mode == "spill":
+            return len(self._paths)
+        return 0
+
+    def __getitem__(self, position):
+        return self.frames()[position]
+
+    def __iter__(self):
+        return iter(self.frames())
+
+
+def make_diagnostics(name, diagnostics=None):
+    """
+    Builds the diagnostics of one rate producer from a component's ``diagnostics`` argument.
+    Args:
+        name (str): name of the captured rate
+        diagnostics (None, str or dict): None (off), a mode name, or keyword arguments of SurvivalDiagnostics
+    Returns:
+        SurvivalDiagnostics
+    """
+    if diagnostics is None:
+        return SurvivalDiagnostics(name)
+    if isinstance(diagnostics, str):
+        return SurvivalDiagnostics(name, mode=diagnostics)
+    return SurvivalDiagnostics(name, **diagnostics)
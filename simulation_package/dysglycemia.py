@@ -16,29 +16,26 @@ Methods:
 
 Note:
     1) This module requires two key simulation engine systems: Builder, Event, which must be imported from vivarium.framework
-    2) 2) This modules requires external serialized survival regression models (compute transition probabilities) to be imported, loaded with pickle and used in 
+    2) 2) This modules requires external serialized survival regression models (compute transition probabilities) loaded lazily through model_registry.registry and used in 
         base_ab1_to_dysglycemia_rate and base_mab1_to_dysglycemia_rate and 
 """
 
 import pandas as pd
-import pickle
 from vivarium.framework.engine import Builder
 from vivarium.framework.event import Event
+from simulation_package.model_registry import registry
+from simulation_package.bookkeeping import transition_update
+from simulation_package.state_index import get_state_index
+
+# survival regression models are loaded lazily (on first use) by the registry, see model_registry.py
 
-######## GET BINARY FILE ###########
-# ab1 to dysglycemic
-with open("transition_probabilities/binary_files/sAB2Hyperglycemia.bin","rb") as binary_ab1_to_dysglycemic:
-    ab1_to_dysglycemic_model = pickle.load(binary_ab1_to_dysglycemic)
-      
-# mab1 to dysglycemic
-with open("transition_probabilities/binary_files/mAB2Hyperglycemia.bin","rb") as binary_mab1_to_dysglycemic:
-    mab1_to_dysglycemic_model = pickle.load(binary_mab1_to_dysglycemic)
-   
 
 class Dysglycemia:
-    def __init__(self):
+    def __init__(self, engine="lifelines"):
         self.name = "dysglycemia"
         self.completed_cycles = 0
+        # "lifelines" (fitted models), "numpy" (closed-form hazard_engine) or "lookup" (precomputed lookup_tables)
+        self.engine = engine
 
     def setup(self, builder: Builder):
         """this is wehre the component initialization takes place"""
@@ -46,6 +43,8 @@ class Dysglycemia:
 
         self.ab1_population_view = builder.population.get_view(["state", "previous_state", "time_in_state", "GRS2", "fdr", "age"], query="state == 'Ab1'")
         self.mab1_population_view = builder.population.get_view(["state", "previous_state", "time_in_state", "GRS2", "fdr", "age"], query="state == 'mAb1'")
+        # Ab1 and mAb1 simulants are read from the shared per-state index, see state_index.py
+        self.state_index = get_state_index(builder)
 
         self.ab1_to_dysglycemia_rate = builder.value.register_rate_producer("ab1_to_dysglycemia_rate", source=self.base_ab1_to_dysglycemia_rate)
         self.mab1_to_dysglycemia_rate = builder.value.register_rate_producer("mab1_to_dysglycemia_rate", source=self.base_mab1_to_dysglycemia_rate)
@@ -55,37 +54,28 @@ class Dysglycemia:
 
         builder.event.register_listener("time_step", self.determine_ab1_to_dysglycemia)
         builder.event.register_listener("time_step", self.determine_mab1_to_dysglycemia)
-        builder.event.register_listener("time_step", self.determine_time_in_state)
         
 
     def base_ab1_to_dysglycemia_rate(self, index: pd.Index) -> pd.Series:
         """get individual transition probabilities"""
         population_df = self.ab1_population_view.get(index)
-        survival_prob = ab1_to_dysglycemic_model.predict_survival_function(population_df, times=1, conditional_after=population_df['time_in_state'])
+        survival_prob = registry.transition_model("sAB2Hyperglycemia", self.engine).predict_survival_function(population_df, times=1, conditional_after=population_df['time_in_state'])
         rate = 1 - survival_prob.iloc[0]
         return rate
 
     def base_mab1_to_dysglycemia_rate(self, index: pd.Index) -> pd.Series:
         """get individual transition probabilities"""
         population_df = self.mab1_population_view.get(index)
-        survival_prob = mab1_to_dysglycemic_model.predict_survival_function(population_df, times=1, conditional_after=population_df['time_in_state'])
+        survival_prob = registry.transition_model("mAB2Hyperglycemia", self.engine).predict_survival_function(population_df, times=1, conditional_after=population_df['time_in_state'])
         rate = 1 - survival_prob.iloc[0]
         return rate
     
-    def _get_ab1_population_index(self, ab1_population):
-        ab1_index = ab1_population.index
-        return ab1_index
-    
     def _compute_affected_individuals_ab1_to_dysglycemia(self, effective_ab1_to_dysglycemia, ab1_index):
         """compute affected individuals"""
         draw_ab1_to_dysglycemia = self.randomness_ab1_to_dysglycemia.get_draw(ab1_index)
         affected_ab1_to_dysglycemia = (draw_ab1_to_dysglycemia < effective_ab1_to_dysglycemia)
         return affected_ab1_to_dysglycemia
     
-    def _get_mab1_population_index(self, mab1_population):
-        mab1_index = mab1_population.index
-        return mab1_index
-    
     def _compute_affected_individuals_mab1_to_dysglycemia(self, effective_mab1_to_dysglycemia, mab1_index):
         """compute affected individuals"""
         draw_mab1_to_dysglycemia = self.randomness_mab1_to_dysglycemia.get_draw(mab1_index)
@@ -101,38 +91,22 @@ class Dysglycemia:
         if self.completed_cycles < 2:
             return
         
-        ab1_population = self.ab1_population_view.get(event.index)
-        ab1_index = self._get_ab1_population_index(ab1_population)
+        ab1_index = self.state_index.get("Ab1")
         effective_ab1_to_dysglycemia = self.ab1_to_dysglycemia_rate(ab1_index)
         affected_ab1_to_dysglycemia = self._compute_affected_individuals_ab1_to_dysglycemia(effective_ab1_to_dysglycemia, ab1_index)
-        self.population_view.update(pd.Series("dysglycemic", index=ab1_index[affected_ab1_to_dysglycemia], name ="state"))
+        moved = ab1_index[affected_ab1_to_dysglycemia]
+        self.population_view.update(transition_update("dysglycemic", index=moved))
+        self.state_index.move(moved, "dysglycemic")
 
     def determine_mab1_to_dysglycemia(self, event: Event):
         """Determines who transitions or not"""
         if self.completed_cycles < 2:
             return
         
-        mab1_population = self.mab1_population_view.get(event.index)
-        mab1_index = self._get_mab1_population_index(mab1_population)
+        mab1_index = self.state_index.get("mAb1")
         effective_mab1_to_dysglycemia = self.mab1_to_dysglycemia_rate(mab1_index)
         affected_mab1_to_dysglycemia = self._compute_affected_individuals_mab1_to_dysglycemia(effective_mab1_to_dysglycemia, mab1_index)
-        self.population_view.update(pd.Series("dysglycemic", index=mab1_index[affected_mab1_to_dysglycemia], name= "state"))
-
-
-    def determine_time_in_state(self, event: Event):
-        """
-        Updates the 'time_in_state' and 'previous_state' for individuals in the population.
-        Args:
-            event (Event): The event containing the index of the population to be evaluated.
-        Returns:
-            None
-        """
-        # get population
-        population = self.population_view.get(event.index)
-        # get all rows in the population where state != previous state
-        # these individuals just changed state in this cycle, so reset their time_in_state to 0
-        population.loc[population["state"] != population["previous_state"], "time_in_state"] = 0
-        # update previous_state to the current state for those who changed state
-        population.loc[population["state"] != population["previous_state"], "previous_state"] = population.loc[population["state"] != population["previous_state"], "state"]
-        # update the population view with the modified data
-        self.population_view.update(population)
+        moved = mab1_index[affected_mab1_to_dysglycemia]
+        self.population_view.update(transition_update("dysglycemic", index=moved))
+        self.state_index.move(moved, "dysglycemic")
+
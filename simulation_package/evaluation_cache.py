@@ -0,0 +1,283 @@
+"""
+This module contains the EvaluationCache class, an on-disk SQLite cache of the outcome tallies of NoisyProblem
+simulations, shared by the worker processes of a run and kept between runs.
+
+CustomMutation and PolynomialMutation often produce screening vectors that are identical, or that screen exactly the
+same simulants: a simulant is screened in a cycle if its GRS2 is above the threshold of the cycle, and GRS2 only takes
+the values of the background distribution (grs_sampler.py). Two percentiles whose thresholds fall between the same two
+background values (or that are both 0, or below the lowest value, ...) therefore give the same simulation. The cache
+key of a simulation is a hash of:
+
+    canonical vector:   number of background GRS2 values at or below the threshold of every cycle (canonical_vector),
+                        i.e. which simulants the cycle can screen
+    options:            the simulation options of NoisyProblem (population size, engine, layout, shards, replay, ...)
+    seed:               the random seed of the simulation
+
+and every entry stores the raw outcome tallies (outcomes.py) of the simulation, from which NoisyProblem computes the
+objectives, and the seconds it took. The number of non-zero percentiles (third objective) is computed from the actual
+vector, as before.
+
+Every entry also records the environment it was simulated in (environment_digest): a hash of the transition model files
+(binary and lean), the background GRS2 CSV and the source of every simulation module of the package. Entries of another
+environment are never returned, and prune deletes them, so that a new model binary or an edited component never reuses
+stale tallies.
+
+The database is opened in write-ahead logging mode, with a busy timeout, by every process that uses it (the connection is
+not pickled with NoisyProblem), so that the workers of the elementwise pool can read and write it concurrently. Hits,
+misses and the seconds of simulation they saved are counted per session (by default one per EvaluationCache created in
+the parent process, shared with its workers) in the database, so that report sees the counts of every worker.
+
+Methods:
+    EvaluationCache.evaluate: tallies of a simulation, from the cache or simulated and stored
+
+    EvaluationCache.report: hits, misses and seconds saved of the session (or of every session)
+
+    EvaluationCache.prune: deletes the entries of other environments
+
+    canonical_vector: the screening vector as the simulants each cycle can screen
+
+    environment_digest: hash of the model files, background distribution and simulation sources
+
+
+Example usage:
+    >>> cache = EvaluationCache("evaluation_cache.sqlite")
+    >>> screening_problem = NoisyProblem(elementwise_runner=runner, evaluation_cache=cache)
+    >>> results = minimize(problem=screening_problem, algorithm=algorithm, termination=("n_gen", 50))
+    >>> cache.report()
+    {'hits': 112, 'misses': 138, 'seconds_saved': 2241.7, 'seconds_simulated': 2790.2}
+
+Note:
+    Caching only saves simulations when a (canonical vector, seed) pair comes back, i.e. with common_random_numbers (or a
+    base_seed) where candidates share seeds; with fresh seeds every evaluation is a miss. The environment digest is
+    computed once per process: files changed during a run are picked up by the next run.
+"""
+
+import functools
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import uuid
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from simulation_package.grs_sampler import BACKGROUND_GRS_FILE, get_grs_sampler
+from simulation_package.lean_models import BINARY_FILES_DIR, LEAN_FILES_DIR
+from simulation_package.screening import Screening
+
+
+PACKAGE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+EVALUATION_CACHE_PATH = os.path.abspath(os.path.join(PACKAGE_DIR, "..", "evaluation_cache.sqlite"))
+
+# modules of the package that never run inside a simulation, left out of the environment digest
+OPTIMISATION_MODULES = (
+    "archive_driver.py",
+    "archive_persistence.py",
+    "benchmark_memory.py",
+    "checkpointing.py",
+    "common_random_numbers.py",
+    "custom_mutation.py",
+    "evaluation_cache.py",
+    "run_optimisation.py",
+    "run_simulation.py",
+    "surrogate.py",
+    "uncertain_archiver.py",
+)
+
+# bump when the key or the stored tallies change so that old entries are not reused
+CACHE_FORMAT_VERSION = 1
+
+
+@functools.lru_cache(maxsize=1)
+def environment_digest():
+    """
+    Returns:
+        str: hash of the transition model files, the background GRS2 CSV and the simulation modules of the package
+    """
+    digest = hashlib.sha256(f"{CACHE_FORMAT_VERSION}".encode())
+    model_files = sorted(glob.glob(os.path.join(BINARY_FILES_DIR, "*")) + glob.glob(os.path.join(LEAN_FILES_DIR, "*")))
+    sources = sorted(path for path in glob.glob(os.path.join(PACKAGE_DIR, "*.py"))
+                     if os.path.basename(path) not in OPTIMISATION_MODULES)
+    for path in model_files + [BACKGROUND_GRS_FILE] + sources:
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=None)
+def grs_support():
+    """
+    Returns:
+        np.ndarray: sorted unique background GRS2 values, once per process
+    """
+    return get_grs_sampler().support()
+
+
+def canonical_vector(screening_vector, grs_distribution="normal"):
+    """
+    Args:
+        screening_vector (np.ndarray): screening percentile of every cycle
+        grs_distribution (str): distribution the percentiles are read on (see screening.py)
+    Returns:
+        np.ndarray: number of background GRS2 values at or below the threshold of every cycle, the same for every
+        screening vector that screens the same simulants
+    """
+    thresholds = Screening(continuous_vector=screening_vector, grs_distribution=grs_distribution).threshold_vector
+    return np.searchsorted(grs_support(), thresholds, side="right").astype(np.int64)
+
+
+class EvaluationCache:
+    """
+    SQLite cache of simulation outcome tallies, keyed by canonical screening vector, simulation options and seed.
+    """
+
+    def __init__(self, path=EVALUATION_CACHE_PATH, session=None, timeout=60):
+        """
+        Args:
+            path (str): SQLite database, created if needed
+            session (str): name the hits and misses are counted under, a new one if None
+            timeout (float): seconds a process waits for another one's write before failing
+        """
+        self.path = str(path)
+        self.session = uuid.uuid4().hex if session is None else session
+        self.timeout = timeout
+        self._connection = None
+        self._pid = None
+
+    def __getstate__(self):
+        # connections cannot be pickled or shared with other processes, every process opens its own
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_pid"] = None
+        return state
+
+    def connection(self):
+        """
+        Returns:
+            sqlite3.Connection: connection of the current process, opened (and the tables created) on first use
+        """
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations (key TEXT PRIMARY KEY, environment TEXT NOT NULL, seed INTEGER NOT NULL,"
+                " tallies TEXT NOT NULL, seconds REAL NOT NULL, created REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS statistics (session TEXT PRIMARY KEY, hits INTEGER NOT NULL DEFAULT 0,"
+                " misses INTEGER NOT NULL DEFAULT 0, seconds_saved REAL NOT NULL DEFAULT 0, seconds_simulated REAL NOT NULL DEFAULT 0)"
+            )
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def close(self):
+        """Closes the connection of the current process"""
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection, self._pid = None, None
+
+    def key(self, screening_vector, seed, options):
+        """
+        Args:
+            screening_vector (np.ndarray): screening percentile of every cycle
+            seed (int): random seed of the simulation
+            options (dict): simulation options that change the tallies (JSON-serialisable)
+        Returns:
+            str: cache key of the simulation
+        """
+        digest = hashlib.sha256()
+        digest.update(canonical_vector(screening_vector, options.get("grs_distribution", "normal")).tobytes())
+        digest.update(json.dumps(options, sort_keys=True).encode())
+        digest.update(f"{int(seed)}".encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Args:
+            key (str): cache key of the simulation
+        Returns:
+            tuple: (tallies, seconds the simulation took) of the entry of the current environment, None if there is none
+        """
+        row = self.connection().execute(
+            "SELECT tallies, seconds FROM evaluations WHERE key = ? AND environment = ?", (key, environment_digest())
+        ).fetchone()
+        return None if row is None else (json.loads(row[0]), row[1])
+
+    def put(self, key, seed, tallies, seconds):
+        """
+        Args:
+            key (str): cache key of the simulation
+            seed (int): random seed of the simulation
+            tallies (dict): outcome tallies of the simulation
+            seconds (float): seconds the simulation took
+        """
+        self.connection().execute(
+            "INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?, ?, ?)",
+            (key, environment_digest(), int(seed), json.dumps(tallies), seconds, time.time()),
+        )
+
+    def _count(self, hits, misses, seconds_saved, seconds_simulated):
+        self.connection().execute(
+            "INSERT INTO statistics VALUES (?, ?, ?, ?, ?) ON CONFLICT(session) DO UPDATE SET hits = hits + excluded.hits,"
+            " misses = misses + excluded.misses, seconds_saved = seconds_saved + excluded.seconds_saved,"
+            " seconds_simulated = seconds_simulated + excluded.seconds_simulated",
+            (self.session, hits, misses, seconds_saved, seconds_simulated),
+        )
+
+    def evaluate(self, screening_vector, seed, options, simulate):
+        """
+        Args:
+            screening_vector (np.ndarray): screening percentile of every cycle
+            seed (int): random seed of the simulation
+            options (dict): simulation options that change the tallies (JSON-serialisable)
+            simulate (callable): runs the simulation and returns its outcome tallies, called on a miss
+        Returns:
+            dict: outcome tallies of the simulation
+        """
+        key = self.key(screening_vector, seed, options)
+        entry = self.get(key)
+        if entry is not None:
+            tallies, seconds = entry
+            self._count(1, 0, seconds, 0.0)
+            return tallies
+
+        start = time.perf_counter()
+        tallies = simulate()
+        seconds = time.perf_counter() - start
+        self.put(key, seed, tallies, seconds)
+        self._count(0, 1, 0.0, seconds)
+        return tallies
+
+    def report(self, all_sessions=False):
+        """
+        Args:
+            all_sessions (bool): counts of every session of the database rather than of this one
+        Returns:
+            dict: hits, misses, seconds of simulation saved by the hits and seconds simulated by the misses
+        """
+        query = "SELECT COALESCE(SUM(hits), 0), COALESCE(SUM(misses), 0), COALESCE(SUM(seconds_saved), 0), COALESCE(SUM(seconds_simulated), 0) FROM statistics"
+        if all_sessions:
+            row = self.connection().execute(query).fetchone()
+        else:
+            row = self.connection().execute(query + " WHERE session = ?", (self.session,)).fetchone()
+        return dict(zip(("hits", "misses", "seconds_saved", "seconds_simulated"), row))
+
+    def __len__(self):
+        return self.connection().execute(
+            "SELECT COUNT(*) FROM evaluations WHERE environment = ?", (environment_digest(),)
+        ).fetchone()[0]
+
+    def prune(self):
+        """
+        Returns:
+            int: number of entries of other environments deleted
+        """
+        return self.connection().execute("DELETE FROM evaluations WHERE environment != ?", (environment_digest(),)).rowcount
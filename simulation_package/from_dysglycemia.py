@@ -2,40 +2,43 @@
 import os
 import sys
 
+import numpy as np
 import pandas as pd
-import pickle
 from vivarium.framework.engine import Builder
 from vivarium.framework.event import Event
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-######## GET BINARY FILES ###########
+from simulation_package.competing_risks import CompetingRisksEvaluator
+from simulation_package.diagnostics import make_diagnostics
+from simulation_package.model_registry import registry
+from simulation_package.bookkeeping import transition_update
+from simulation_package.state_index import get_state_index
 
-# dysglycemic to ab1
-with open("transition_probabilities/binary_files/Hyperglycemia2sAB.bin","rb") as binary_dysglycemic_to_ab1:
-    dysglycemic_to_ab1_model = pickle.load(binary_dysglycemic_to_ab1)
-
-# dysglycemic to mab1
-with open("transition_probabilities/binary_files/Hyperglycemia2mAB.bin","rb") as binary_dysglycemic_to_mab1:
-    dysglycemic_to_mab1_model = pickle.load(binary_dysglycemic_to_mab1)
-
-# dysglycemic to t1d
-with open("transition_probabilities/binary_files/Hyperglycemia2T1D.bin","rb") as binary_dysglycemic_to_t1d:
-    dysglycemic_to_t1d_model = pickle.load(binary_dysglycemic_to_t1d)
+# survival regression models are loaded lazily (on first use) by the registry, see model_registry.py
 
 
 class FromDysglycemia:
 
-    def __init__(self):
+    def __init__(self, engine="lifelines", diagnostics=None):
         self.name = "from_dysglycemia"
         self.completed_cycles = 0
-        self.survival_probs_dysglycemic_to_ab1 = []
-        self.survival_probs_dysglycemic_to_mab1 = []
-        self.survival_probs_dysglycemic_to_t1d = []
+        # "lifelines" (fitted models), "numpy" (closed-form hazard_engine) or "lookup" (precomputed lookup_tables)
+        self.engine = engine
+        # survival frames are only captured when diagnostics is set ("ring", "summary", "spill"), see diagnostics.py
+        self.survival_probs_dysglycemic_to_ab1 = make_diagnostics("dysglycemic_to_ab1", diagnostics)
+        self.survival_probs_dysglycemic_to_mab1 = make_diagnostics("dysglycemic_to_mab1", diagnostics)
+        self.survival_probs_dysglycemic_to_t1d = make_diagnostics("dysglycemic_to_t1d", diagnostics)
+        # the three exits out of dysglycemic are evaluated in one pass per time step, see competing_risks.py
+        self.competing_risks = CompetingRisksEvaluator(
+            ["Ab1", "mAb1", "type1_diabetes"], ["Hyperglycemia2sAB", "Hyperglycemia2mAB", "Hyperglycemia2T1D"], engine=engine
+        )
     
     def setup(self, builder:Builder):
         self.population_view = builder.population.get_view(["state","previous_state","time_in_state","GRS2","fdr","age"])
         self.dysglycemic_population_view = builder.population.get_view(["state","previous_state","time_in_state","GRS2","fdr","age"], query = "state == 'dysglycemic'")
+        # dysglycemic simulants are read from the shared per-state index, see state_index.py
+        self.state_index = get_state_index(builder)
 
         # register rates with value_system
         self.dysglycemia_to_ab1_rate = builder.value.register_rate_producer("dysglycemia_to_ab1_rate", source= self.base_dysglycemia_to_ab1_rate)
@@ -47,120 +50,89 @@ class FromDysglycemia:
 
         #resgister determine_from_dysglycemia in event system
         builder.event.register_listener("time_step", self.determine_from_dysglycemia)
-        builder.event.register_listener("time_step", self.determine_time_in_state)
 
     def base_dysglycemia_to_ab1_rate(self, index:pd.Index) -> pd.Series:
+        # rates computed by determine_from_dysglycemia for this step
+        rate = self.competing_risks.rate("Ab1", index)
+        if rate is not None:
+            if self.survival_probs_dysglycemic_to_ab1.enabled:
+                self.survival_probs_dysglycemic_to_ab1.append(self.competing_risks.survival_function("Ab1"))
+            return rate
         dysglycemic_population_df = self.dysglycemic_population_view.get(index)
-        survival_prob = dysglycemic_to_ab1_model.predict_survival_function(dysglycemic_population_df, times=1, conditional_after=dysglycemic_population_df['time_in_state'])
+        survival_prob = registry.transition_model("Hyperglycemia2sAB", self.engine).predict_survival_function(dysglycemic_population_df, times=1, conditional_after=dysglycemic_population_df['time_in_state'])
         # store probs for each cycle
         self.survival_probs_dysglycemic_to_ab1.append(survival_prob)
         rate = 1 - survival_prob.iloc[0]
         return rate
 
     def base_dysglycemia_to_mab1_rate(self, index:pd.Index) -> pd.Series:
+        # rates computed by determine_from_dysglycemia for this step
+        rate = self.competing_risks.rate("mAb1", index)
+        if rate is not None:
+            if self.survival_probs_dysglycemic_to_mab1.enabled:
+                self.survival_probs_dysglycemic_to_mab1.append(self.competing_risks.survival_function("mAb1"))
+            return rate
         dysglycemic_population_df = self.dysglycemic_population_view.get(index)
-        survival_prob = dysglycemic_to_mab1_model.predict_survival_function(dysglycemic_population_df, times=1, conditional_after=dysglycemic_population_df['time_in_state'])
+        survival_prob = registry.transition_model("Hyperglycemia2mAB", self.engine).predict_survival_function(dysglycemic_population_df, times=1, conditional_after=dysglycemic_population_df['time_in_state'])
         # store probs for each cycle
         self.survival_probs_dysglycemic_to_mab1.append(survival_prob)
         rate = 1 - survival_prob.iloc[0]
         return rate
 
     def base_dysglycemia_to_t1d_rate(self, index:pd.Index) -> pd.Series:
+        # rates computed by determine_from_dysglycemia for this step
+        rate = self.competing_risks.rate("type1_diabetes", index)
+        if rate is not None:
+            if self.survival_probs_dysglycemic_to_t1d.enabled:
+                self.survival_probs_dysglycemic_to_t1d.append(self.competing_risks.survival_function("type1_diabetes"))
+            return rate
         dysglycemic_population_df = self.dysglycemic_population_view.get(index)
-        survival_prob = dysglycemic_to_t1d_model.predict_survival_function(dysglycemic_population_df, times=1, conditional_after=dysglycemic_population_df['time_in_state'])
+        survival_prob = registry.transition_model("Hyperglycemia2T1D", self.engine).predict_survival_function(dysglycemic_population_df, times=1, conditional_after=dysglycemic_population_df['time_in_state'])
         # store probs for each cycle
         self.survival_probs_dysglycemic_to_t1d.append(survival_prob)
         rate = 1 - survival_prob.iloc[0]
         return rate
     
 
-    def _get_dysglycemic_population(self, full_population):
-        """Get the dysglycemic population index from the full population."""
-        dysglycemic_population = full_population[full_population["state"] == "dysglycemic"]
-        dysglycemic_population_index = dysglycemic_population.index
-        return dysglycemic_population_index
-    
     def _compute_future_state(self, effective_dysglycemia_to_ab1_rate, effective_dysglycemia_to_mab1_rate, effective_dysglycemia_to_t1d_rate, dysglycemic_population_index):
-        merged_df = pd.concat([effective_dysglycemia_to_ab1_rate.rename("dysglycemia_to_ab1_rate"), effective_dysglycemia_to_mab1_rate.rename("dysglycemia_to_mab1_rate"), effective_dysglycemia_to_t1d_rate.rename("dysglycemia_to_t1d_rate")], axis = 1)
+        """Returns the destination code of each dysglycemic simulant: 0 = Ab1, 1 = mAb1, 2 = type1_diabetes, 3 = stays dysglycemic"""
+        rates = np.column_stack([
+            effective_dysglycemia_to_ab1_rate.to_numpy(),
+            effective_dysglycemia_to_mab1_rate.to_numpy(),
+            effective_dysglycemia_to_t1d_rate.to_numpy(),
+        ])
         #get draw
         draw = self.randomness.get_draw(dysglycemic_population_index)
-        draw, merged_df = draw.align(merged_df)
-
-        #merge draw onto merged_df
-        merged_df = pd.concat([merged_df, draw.rename("draw")], axis = 1)
-        # add 'future_state' column
-        merged_df["future_state"] = ""
 
-        #logical vectors and populate 'future_state' column
-        merged_df.loc[merged_df["draw"] < merged_df["dysglycemia_to_ab1_rate"], "future_state"] = "Ab1"
-        merged_df.loc[(merged_df["draw"] >= merged_df["dysglycemia_to_ab1_rate"]) & (merged_df["draw"] < (merged_df["dysglycemia_to_ab1_rate"] + merged_df["dysglycemia_to_mab1_rate"])), "future_state"] = "mAb1"
-        merged_df.loc[(merged_df["draw"] >= merged_df["dysglycemia_to_ab1_rate"] + merged_df["dysglycemia_to_mab1_rate"]) & (merged_df["draw"] < (merged_df["dysglycemia_to_ab1_rate"] + merged_df["dysglycemia_to_mab1_rate"] + merged_df["dysglycemia_to_t1d_rate"])), "future_state"] = "type1_diabetes"
-        
-        #get back to vectors so that state_table can be updated
-        ab1_series = merged_df.loc[merged_df["future_state"]=="Ab1","future_state"]
-        mab1_series = merged_df.loc[merged_df["future_state"]=="mAb1","future_state"]
-        t1d_series = merged_df.loc[merged_df["future_state"]=="type1_diabetes","future_state"]
-        t1d_series_index = t1d_series.index
+        # one draw against the cumulative rates picks the destination
+        return CompetingRisksEvaluator.choose_destinations(rates, draw.to_numpy())
 
-        return ab1_series, mab1_series, t1d_series, 
-
-        
-    
     def determine_from_dysglycemia(self, event:Event):
         self.completed_cycles += 1
 
         if self.completed_cycles < 2:
             return
         
-        full_population = self.population_view.get(event.index)
-        dysglycemic_index = self._get_dysglycemic_population(full_population)
+        dysglycemic_index = self.state_index.get("dysglycemic")
+
+        # compute the three transition probabilities in one pass; the rate pipelines below read them
+        self.competing_risks.evaluate(self.population_view.get(dysglycemic_index))
 
-  
         #effective_rates
         effective_dysglycemia_to_ab1_rate = self.dysglycemia_to_ab1_rate(dysglycemic_index)
         effective_dysglycemia_to_mab1_rate = self.dysglycemia_to_mab1_rate(dysglycemic_index)
         effective_dysglycemia_to_t1d_rate = self.dysglycemia_to_t1d_rate(dysglycemic_index)
 
-        ab1_series, mab1_series, t1d_series = self._compute_future_state(
+        destinations = self._compute_future_state(
             effective_dysglycemia_to_ab1_rate, 
             effective_dysglycemia_to_mab1_rate, 
             effective_dysglycemia_to_t1d_rate, 
             dysglycemic_index
         )
+        self.competing_risks.clear()
     
         # #use series to update state_table
-        self.population_view.update(ab1_series.rename("state"))
-        self.population_view.update(mab1_series.rename("state"))
-        self.population_view.update(t1d_series.rename("state"))
-
-    def determine_time_in_state(self, event: Event):
-        """
-        Updates the 'time_in_state' and 'previous_state' for individuals in the population.
-        Args:
-            event (Event): The event containing the index of the population to be evaluated.
-        Returns:
-            None
-        """
-        # get population
-        population = self.population_view.get(event.index)
-        # get all rows in the population where state != previous state
-        # these individuals just changed state in this cycle, so reset their time_in_state to 0
-        population.loc[population["state"] != population["previous_state"], "time_in_state"] = 0
-        # update previous_state to the current state for those who changed state
-        population.loc[population["state"] != population["previous_state"], "previous_state"] = population.loc[population["state"] != population["previous_state"], "state"]
-        # update the population view with the modified data
-        self.population_view.update(population)
-
-
-
-
-            
-
-            
-
-            
-           
-
-
-
-        
+        for code, state in enumerate(self.competing_risks.destinations):
+            moved = dysglycemic_index[destinations == code]
+            self.population_view.update(transition_update(state, index=moved))
+            self.state_index.move(moved, state)
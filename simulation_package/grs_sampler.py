@@ -0,0 +1,121 @@
+"""
+This module contains the GRSSampler class, the background GRS2 distribution simulants are sampled from.
+
+The distribution is the GRS2 of the participants without type 1 diabetes (t1d_status == 0) of the WTCC dataset in
+background_population_grs.csv. Parsing the CSV with pandas on every import (and mapping draws to values with a Python
+list comprehension over every simulant) dominated the initialisation of large cohorts, so the values are parsed once and
+cached as a binary NumPy array next to the CSV, under a name that includes a hash of the CSV contents so that an edited
+CSV never reuses a stale cache. Each process then loads the array once (get_grs_sampler is cached).
+
+Methods:
+    GRSSampler.sample: maps uniform draws to GRS2 values with a single vectorised take (same mapping as before: value
+                       number int(draw * number of values) of the background list, in file order)
+
+    GRSSampler.quantile: empirical inverse CDF of the background distribution, used by Screening's "empirical"
+                         thresholds
+
+    GRSSampler.support: sorted unique GRS2 values (the support of the lookup tables, see lookup_tables.py)
+
+    get_grs_sampler: the sampler of a background CSV, loaded once per process
+
+
+Example usage:
+    >>> grs_sampler = get_grs_sampler()
+    >>> grs2_values = grs_sampler.sample(self.grs_randomness.get_draw(pop_data.index))
+    >>> thresholds = grs_sampler.quantile([0.5, 0.9])
+"""
+
+import functools
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+
+BACKGROUND_GRS_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "background_population_grs.csv"))
+
+
+class GRSSampler:
+    """
+    Background GRS2 values, sampled by index and queried by quantile.
+    """
+
+    def __init__(self, values):
+        """
+        Args:
+            values (array-like): background GRS2 values, in file order
+        """
+        self.values = np.asarray(values, dtype=np.float64)
+        self.sorted_values = np.sort(self.values)
+
+    def __len__(self):
+        return self.values.size
+
+    @classmethod
+    def from_csv(cls, path=BACKGROUND_GRS_FILE):
+        """
+        Reads the values from the cached .npy next to the CSV, parsing the CSV (and writing the cache) if needed.
+        Args:
+            path (str): CSV with t1d_status and GRS2 columns
+        Returns:
+            GRSSampler
+        """
+        cache_path = grs_cache_path(path)
+        if os.path.exists(cache_path):
+            return cls(np.load(cache_path))
+
+        background = pd.read_csv(path, usecols=["t1d_status", "GRS2"])
+        values = background.loc[background["t1d_status"] == 0, "GRS2"].to_numpy(dtype=np.float64)
+        # written atomically, as pool workers may race
+        temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as cache_file:
+            np.save(cache_file, values)
+        os.replace(temporary_path, cache_path)
+        return cls(values)
+
+    def sample(self, draws):
+        """
+        Args:
+            draws (pd.Series or np.ndarray): uniform draws in [0, 1)
+        Returns:
+            np.ndarray: GRS2 value of each draw
+        """
+        positions = (np.asarray(draws) * self.values.size).astype(np.int64)
+        return self.values.take(positions)
+
+    def quantile(self, probabilities):
+        """
+        Args:
+            probabilities (float or array-like): probabilities in [0, 1]
+        Returns:
+            float or np.ndarray: empirical inverse CDF, the smallest background value whose CDF reaches each probability
+        """
+        return np.quantile(self.sorted_values, probabilities, method="inverted_cdf")
+
+    def support(self):
+        """
+        Returns:
+            np.ndarray: sorted unique GRS2 values
+        """
+        return np.unique(self.sorted_values)
+
+
+def grs_cache_path(path):
+    """Path of the binary cache of a background CSV, named after a hash of its contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as csv_file:
+        digest.update(csv_file.read())
+    stem, _ = os.path.splitext(path)
+    return f"{stem}-{digest.hexdigest()[:16]}.npy"
+
+
+@functools.lru_cache(maxsize=None)
+def get_grs_sampler(path=BACKGROUND_GRS_FILE):
+    """
+    Args:
+        path (str): background CSV
+    Returns:
+        GRSSampler: sampler of the CSV, shared by every simulation of the process
+    """
+    return GRSSampler.from_csv(path)
@@ -0,0 +1,230 @@
+"""
+This module contains the ParametricAFTModel class, a closed-form NumPy replacement for the lifelines fitters stored in
+transition_probabilities/binary_files.
+
+Every transition component asks its survival regression model for the probability of surviving one more cycle given the
+time already spent in the current state:
+
+    model.predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
+
+lifelines answers that question by building formulaic design matrices and pandas frames for every simulant, which dominates
+the cost of a time step in large populations. All our fitters are parametric AFT models (log-normal or log-logistic), so the
+conditional survival has a closed form:
+
+    S(t | T > c) = exp(-(H(c + t) - H(c)))
+
+where H is the cumulative hazard of the fitted distribution. ParametricAFTModel pulls the coefficients out of a fitter once
+and evaluates the expression above as a vectorised NumPy expression over the covariate columns.
+
+Methods:
+    ParametricAFTModel.from_fitter: builds the closed-form model from a fitted lifelines AFT fitter
+
+    ParametricAFTModel.transition_probability: one-step conditional transition probability as a numpy array
+
+    ParametricAFTModel.predict_survival_function: drop-in replacement of the lifelines method with the same signature and output
+
+    transition_model: returns either the lifelines fitter or its (cached) closed-form counterpart, depending on the engine
+
+    EmptyPopulationGuard: lifelines fitter wrapper returning an empty survival frame for an empty population
+
+
+Example usage:
+    >>> from simulation_package.hazard_engine import transition_model
+    >>> model = transition_model(healthy_to_ab1_model, engine="numpy")
+    >>> survival_prob = model.predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
+
+Note:
+    The closed-form engine matches lifelines up to floating point error (see tests/simulation_tests/test_hazard_engine.py).
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.special import log_ndtr
+
+
+ENGINES = ("lifelines", "numpy")
+
+# lifelines class name -> distribution name used by ParametricAFTModel
+SUPPORTED_FITTERS = {
+    "LogNormalAFTFitter": "log_normal",
+    "LogLogisticAFTFitter": "log_logistic",
+}
+
+# lifelines parameter names (primary, ancillary) of each supported distribution
+PARAMETER_NAMES = {
+    "log_normal": ("mu_", "sigma_"),
+    "log_logistic": ("alpha_", "beta_"),
+}
+
+
+class ParametricAFTModel:
+    """
+    Closed-form survival model equivalent to a fitted lifelines log-normal or log-logistic AFT fitter.
+
+    The linear predictor of each distribution parameter is a dot product between its coefficients and the covariate
+    columns (the "Intercept" covariate is a column of ones), exactly as in lifelines.
+    """
+
+    def __init__(self, distribution, primary_covariates, primary_coefficients, ancillary_covariates, ancillary_coefficients):
+        if distribution not in PARAMETER_NAMES:
+            raise ValueError(f"Unsupported distribution '{distribution}'. Expected one of {list(PARAMETER_NAMES)}")
+        self.distribution = distribution
+        self.primary_covariates = list(primary_covariates)
+        self.primary_coefficients = np.asarray(primary_coefficients, dtype=float)
+        self.ancillary_covariates = list(ancillary_covariates)
+        self.ancillary_coefficients = np.asarray(ancillary_coefficients, dtype=float)
+
+    @classmethod
+    def from_fitter(cls, fitter):
+        """
+        Extracts the coefficients of a fitted lifelines AFT fitter.
+        Args:
+            fitter: a fitted LogNormalAFTFitter or LogLogisticAFTFitter (as unpickled from binary_files)
+        Returns:
+            ParametricAFTModel
+        """
+        fitter_name = type(fitter).__name__
+        if fitter_name not in SUPPORTED_FITTERS:
+            raise ValueError(f"Unsupported fitter '{fitter_name}'. Expected one of {list(SUPPORTED_FITTERS)}")
+        distribution = SUPPORTED_FITTERS[fitter_name]
+        primary_name, ancillary_name = PARAMETER_NAMES[distribution]
+        primary_params = fitter.params_.loc[primary_name]
+        ancillary_params = fitter.params_.loc[ancillary_name]
+        return cls(
+            distribution,
+            primary_params.index.tolist(),
+            primary_params.values,
+            ancillary_params.index.tolist(),
+            ancillary_params.values,
+        )
+
+    @property
+    def covariates(self):
+        """Names of the population columns needed by this model (Intercept excluded)"""
+        names = []
+        for covariate in self.primary_covariates + self.ancillary_covariates:
+            if covariate != "Intercept" and covariate not in names:
+                names.append(covariate)
+        return names
+
+    def _linear_predictor(self, population_df, covariates, coefficients, n):
+        """Dot product of coefficients and covariate columns, returned as a float array of length n"""
+        linear_predictor = np.zeros(n)
+        for covariate, coefficient in zip(covariates, coefficients):
+            if covariate == "Intercept":
+                linear_predictor += coefficient
+            else:
+                linear_predictor += coefficient * np.asarray(population_df[covariate], dtype=float)
+        return linear_predictor
+
+    def _parameters(self, population_df, n):
+        """Returns the (primary, ancillary) linear predictors for every simulant"""
+        primary = self._linear_predictor(population_df, self.primary_covariates, self.primary_coefficients, n)
+        ancillary = self._linear_predictor(population_df, self.ancillary_covariates, self.ancillary_coefficients, n)
+        return primary, ancillary
+
+    def _cumulative_hazard_from_parameters(self, primary, ancillary, times):
+        """Cumulative hazard H(times) given the linear predictors, following lifelines' _cumulative_hazard"""
+        with np.errstate(divide="ignore"):
+            if self.distribution == "log_normal":
+                # primary = mu, ancillary = log(sigma); H(t) = -log(1 - Phi(Z))
+                z = (np.log(times) - primary) / np.exp(ancillary)
+                return -log_ndtr(-z)
+            # log_logistic: primary = log(alpha), ancillary = log(beta); H(t) = log(1 + (t / alpha) ** beta)
+            return np.logaddexp(np.exp(ancillary) * (np.log(np.clip(times, 1e-25, np.inf)) - primary), 0)
+
+    def cumulative_hazard(self, population_df, times):
+        """
+        Cumulative hazard of every simulant evaluated at their own time.
+        Args:
+            population_df (pd.DataFrame or mapping of arrays): covariate columns
+            times (array-like): one time per simulant
+        Returns:
+            np.ndarray
+        """
+        times = np.asarray(times, dtype=float)
+        primary, ancillary = self._parameters(population_df, len(times))
+        return self._cumulative_hazard_from_parameters(primary, ancillary, times)
+
+    def transition_probability(self, population_df, conditional_after, times=1):
+        """
+        Probability of leaving the state within ``times`` given ``conditional_after`` time already spent in it.
+        Args:
+            population_df (pd.DataFrame or mapping of arrays): covariate columns
+            conditional_after (array-like): time already spent in state (time_in_state) for each simulant
+            times (float): length of the prediction window (one cycle by default)
+        Returns:
+            np.ndarray: 1 - S(conditional_after + times | T > conditional_after)
+        """
+        conditional_after = np.asarray(conditional_after, dtype=float)
+        primary, ancillary = self._parameters(population_df, len(conditional_after))
+        hazard = self._cumulative_hazard_from_parameters(
+            primary, ancillary, conditional_after + times
+        ) - self._cumulative_hazard_from_parameters(primary, ancillary, conditional_after)
+        return -np.expm1(-np.clip(hazard, 0, np.inf))
+
+    def predict_survival_function(self, df, times=1, conditional_after=None):
+        """
+        Drop-in replacement of lifelines' predict_survival_function for a single prediction time.
+        Args:
+            df (pd.DataFrame): population with the covariate columns
+            times (float): prediction time
+            conditional_after (array-like): time already spent in state. Defaults to zero (unconditional survival)
+        Returns:
+            pd.DataFrame: one row indexed by ``times`` and one column per simulant, as returned by lifelines
+        """
+        return survival_function_frame(self, df, times, conditional_after)
+
+
+def survival_function_frame(model, df, times=1, conditional_after=None):
+    """
+    Builds lifelines' predict_survival_function output from any model exposing transition_probability.
+    Returns:
+        pd.DataFrame: one row indexed by ``times`` and one column per simulant
+    """
+    times = float(np.atleast_1d(times)[0])
+    if conditional_after is None:
+        conditional_after = np.zeros(len(df))
+    survival = 1 - model.transition_probability(df, conditional_after, times=times)
+    return pd.DataFrame(survival[np.newaxis, :], index=[times], columns=df.index)
+
+
+class EmptyPopulationGuard:
+    """
+    Wraps a lifelines fitter so that an empty at-risk population gets an empty survival frame. lifelines cannot build
+    the design matrix of an empty frame, which happens in small populations and population shards (see sharding.py).
+    """
+
+    def __init__(self, fitter):
+        self.fitter = fitter
+
+    def predict_survival_function(self, df, times=1, conditional_after=None):
+        if len(df) == 0:
+            return pd.DataFrame(np.empty((1, 0)), index=[float(np.atleast_1d(times)[0])], columns=df.index)
+        return self.fitter.predict_survival_function(df, times=times, conditional_after=conditional_after)
+
+
+# cache of closed-form models built from lifelines fitters, keyed by id of the fitter
+_closed_form_models = {}
+
+
+def transition_model(fitter, engine="lifelines"):
+    """
+    Returns the object used to predict transition probabilities for the requested engine.
+    Args:
+        fitter: lifelines fitter loaded from binary_files
+        engine (str): "lifelines" to use the fitter itself, "numpy" to use the closed-form ParametricAFTModel
+    Returns:
+        an object exposing predict_survival_function(df, times, conditional_after)
+    """
+    if engine == "lifelines":
+        return fitter
+    if engine == "numpy":
+        if isinstance(fitter, ParametricAFTModel):
+            return fitter
+        key = id(fitter)
+        if key not in _closed_form_models:
+            # keep a reference to the fitter so its id cannot be reused while cached
+            _closed_form_models[key] = (fitter, ParametricAFTModel.from_fitter(fitter))
+        return _closed_form_models[key][1]
+    raise ValueError(f"Unknown engine '{engine}'. Expected one of {list(ENGINES)}")
@@ -0,0 +1,165 @@
+"""
+This module contains the exporter and loader of the lean transition model format.
+
+The .bin files in transition_probabilities/binary_files are full pickled lifelines fitters. They carry the training data
+and fitting state, but prediction only needs the distribution and the coefficients of each distribution parameter
+(see hazard_engine.ParametricAFTModel). The lean format stores exactly that as a NumPy structured array saved in an
+uncompressed .npy file, one record per coefficient:
+
+    distribution   parameter   covariate   coefficient
+    log_normal     primary     GRS2        -0.300941
+    log_normal     primary     fdr         -0.434588
+    log_normal     primary     Intercept    9.937775
+    log_normal     ancillary   Intercept    0.808055
+
+Covariate order is the record order. lifelines does not normalise covariates at prediction time for parametric AFT models
+and these models have no baseline hazard grid (the baseline is the closed-form distribution), so nothing else is needed.
+Files are opened with mmap_mode="r" so that all worker processes share the same read-only pages.
+
+Methods:
+    export_fitter: writes a lifelines fitter (or ParametricAFTModel) to a lean .npy file
+
+    export_binary_files: exports every .bin file of a directory (run this module as a script to refresh the lean files)
+
+    load_lean_model: memory-maps a lean .npy file and returns a ParametricAFTModel
+
+    model_path: path of the file of a transition model for a given format
+
+    load_transition_model: loads a transition model by file stem, either the pickled fitter or the lean file, depending on MODEL_FORMAT
+
+
+Example usage:
+    >>> python3 simulation_package/lean_models.py
+    >>> TRANSITION_MODEL_FORMAT=lean python3 simulation_package/run_simulation.py
+"""
+
+import os
+import sys
+import glob
+import pickle
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from simulation_package.hazard_engine import ParametricAFTModel
+
+
+# resolved from the repository root so that models load regardless of the current working directory
+TRANSITION_PROBABILITIES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "transition_probabilities"))
+BINARY_FILES_DIR = os.path.join(TRANSITION_PROBABILITIES_DIR, "binary_files")
+LEAN_FILES_DIR = os.path.join(TRANSITION_PROBABILITIES_DIR, "lean_files")
+
+# "pickle" loads the lifelines fitters, "lean" loads the memory-mapped .npy files
+MODEL_FORMAT = os.environ.get("TRANSITION_MODEL_FORMAT", "pickle")
+
+LEAN_MODEL_DTYPE = np.dtype(
+    [
+        ("distribution", "U16"),
+        ("parameter", "U16"),
+        ("covariate", "U32"),
+        ("coefficient", "f8"),
+    ]
+)
+
+
+def export_fitter(fitter, path):
+    """
+    Writes the coefficients of a fitted model to a lean .npy file.
+    Args:
+        fitter: lifelines AFT fitter or ParametricAFTModel
+        path (str): destination .npy file
+    """
+    if not isinstance(fitter, ParametricAFTModel):
+        fitter = ParametricAFTModel.from_fitter(fitter)
+
+    records = [
+        (fitter.distribution, "primary", covariate, coefficient)
+        for covariate, coefficient in zip(fitter.primary_covariates, fitter.primary_coefficients)
+    ] + [
+        (fitter.distribution, "ancillary", covariate, coefficient)
+        for covariate, coefficient in zip(fitter.ancillary_covariates, fitter.ancillary_coefficients)
+    ]
+    np.save(path, np.array(records, dtype=LEAN_MODEL_DTYPE), allow_pickle=False)
+
+
+def export_binary_files(binary_files_dir=BINARY_FILES_DIR, lean_files_dir=LEAN_FILES_DIR):
+    """
+    Exports every pickled fitter in binary_files_dir to a lean file with the same stem in lean_files_dir.
+    Returns:
+        list: paths of the exported files
+    """
+    os.makedirs(lean_files_dir, exist_ok=True)
+    exported = []
+    for binary_path in sorted(glob.glob(os.path.join(binary_files_dir, "*.bin"))):
+        with open(binary_path, "rb") as binary_file:
+            fitter = pickle.load(binary_file)
+        stem = os.path.splitext(os.path.basename(binary_path))[0]
+        lean_path = os.path.join(lean_files_dir, stem + ".npy")
+        export_fitter(fitter, lean_path)
+        exported.append(lean_path)
+    return exported
+
+
+def load_lean_model(path):
+    """
+    Memory-maps a lean .npy file (read-only) and builds the closed-form model on top of it.
+    Args:
+        path (str): lean .npy file
+    Returns:
+        ParametricAFTModel
+    """
+    records = np.load(path, mmap_mode="r", allow_pickle=False)
+    distributions = np.unique(records["distribution"])
+    if len(distributions) != 1:
+        raise ValueError(f"Lean model file {path} mixes distributions {list(distributions)}")
+    # primary records are written first, slicing (rather than masking) keeps the coefficients as views on the mapped pages
+    n_primary = int(np.count_nonzero(records["parameter"] == "primary"))
+    if not (records["parameter"][n_primary:] == "ancillary").all():
+        raise ValueError(f"Lean model file {path} must list primary records before ancillary records")
+    primary = records[:n_primary]
+    ancillary = records[n_primary:]
+    return ParametricAFTModel(
+        str(distributions[0]),
+        primary["covariate"].tolist(),
+        primary["coefficient"],
+        ancillary["covariate"].tolist(),
+        ancillary["coefficient"],
+    )
+
+
+def model_path(stem, model_format=None):
+    """
+    Returns the path of the file holding the transition model stored under stem.
+    Args:
+        stem (str): file name without extension
+        model_format (str): "pickle" or "lean". Defaults to MODEL_FORMAT
+    """
+    model_format = model_format or MODEL_FORMAT
+    if model_format == "pickle":
+        return os.path.join(BINARY_FILES_DIR, stem + ".bin")
+    if model_format == "lean":
+        return os.path.join(LEAN_FILES_DIR, stem + ".npy")
+    raise ValueError(f"Unknown model format '{model_format}'. Expected 'pickle' or 'lean'")
+
+
+def load_transition_model(stem, model_format=None):
+    """
+    Loads a transition model by the stem of its file name (e.g. "healthy2sAB").
+    Args:
+        stem (str): file name without extension
+        model_format (str): "pickle" or "lean". Defaults to MODEL_FORMAT (TRANSITION_MODEL_FORMAT environment variable)
+    Returns:
+        lifelines fitter or ParametricAFTModel, both exposing predict_survival_function
+    """
+    model_format = model_format or MODEL_FORMAT
+    path = model_path(stem, model_format)
+    if model_format == "lean":
+        return load_lean_model(path)
+    with open(path, "rb") as binary_file:
+        return pickle.load(binary_file)
+
+
+if __name__ == "__main__":
+    for lean_path in export_binary_files():
+        print(f"exported {lean_path}")
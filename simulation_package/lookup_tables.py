@@ -0,0 +1,177 @@
+"""
+This module contains the TransitionLookupTable class, a precomputed table of one-step transition probabilities.
+
+GRS2 is sampled from a finite set of background values (background_population_grs.csv), fdr is binary and age and
+time_in_state are integers bounded by the horizon of the simulation. Each transition model therefore only ever sees a
+finite set of covariate profiles, and its one-step transition probability can be tabulated once over
+
+    (GRS2 value index, [fdr], [age], time_in_state)
+
+where fdr and age are only axes of the table when the model uses them. At prediction time the GRS2 value index is found
+with a vectorised searchsorted on the sorted support and the probability is gathered from the table. Profiles outside of
+the table (GRS2 not in the support, ages or times beyond the horizon) fall back to the closed-form model.
+
+Tables are cached on disk (memory-mapped read-only when reloaded) under a name that includes a hash of the model file,
+the GRS2 support and the horizon, so that a new model binary never reuses a stale table.
+
+Methods:
+    TransitionLookupTable.build: tabulates a closed-form model over the GRS2 support and horizon
+
+    TransitionLookupTable.transition_probability: gathers the one-step transition probability of every simulant
+
+    load_or_build_lookup_table: returns the cached table of a model file, building and saving it if needed
+
+
+Example usage:
+    >>> from simulation_package.model_registry import registry
+    >>> registry.build_lookup_tables(get_grs_sampler().values, horizon=15)
+    >>> AutoAntibody(engine="lookup")
+"""
+
+import os
+import sys
+import hashlib
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from simulation_package.hazard_engine import survival_function_frame
+
+
+LOOKUP_TABLES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "transition_probabilities", "lookup_tables"))
+
+# covariates that can be table axes (besides GRS2 and time_in_state), in axis order
+DISCRETE_COVARIATES = ("fdr", "age")
+
+# bump when the table layout changes so that old cache files are not reused
+TABLE_FORMAT_VERSION = 1
+
+
+class TransitionLookupTable:
+    """
+    One-step transition probabilities of a closed-form model tabulated over the finite covariate support.
+    """
+
+    def __init__(self, model, grs_values, table, horizon):
+        """
+        Args:
+            model (ParametricAFTModel): closed-form model, used to build the table and for out-of-table profiles
+            grs_values (np.ndarray): sorted unique GRS2 support
+            table (np.ndarray): probabilities with axes (GRS2 index, *discrete covariates used by the model, time_in_state)
+            horizon (int): largest tabulated age and time_in_state
+        """
+        self.model = model
+        self.grs_values = np.asarray(grs_values, dtype=float)
+        self.table = table
+        self.horizon = int(horizon)
+        self.discrete_covariates = [covariate for covariate in DISCRETE_COVARIATES if covariate in model.covariates]
+        unsupported = set(model.covariates) - set(self.discrete_covariates) - {"GRS2"}
+        if unsupported:
+            raise ValueError(f"Covariates {sorted(unsupported)} cannot be tabulated")
+
+    @property
+    def covariates(self):
+        """Names of the population columns needed by the tabulated model"""
+        return self.model.covariates
+
+    @classmethod
+    def shape_for(cls, model, n_grs, horizon):
+        """Shape of the table of model for a GRS2 support of size n_grs"""
+        sizes = {"fdr": 2, "age": horizon + 1}
+        return (n_grs,) + tuple(sizes[c] for c in DISCRETE_COVARIATES if c in model.covariates) + (horizon + 1,)
+
+    @classmethod
+    def build(cls, model, grs_values, horizon):
+        """
+        Tabulates model over every (GRS2, fdr, age, time_in_state) profile.
+        Args:
+            model (ParametricAFTModel): closed-form model
+            grs_values (array-like): GRS2 support (duplicates are dropped)
+            horizon (int): number of simulated cycles
+        Returns:
+            TransitionLookupTable
+        """
+        grs_values = np.unique(np.asarray(grs_values, dtype=float))
+        shape = cls.shape_for(model, len(grs_values), horizon)
+        axes = [grs_values] + [np.arange(size, dtype=float) for size in shape[1:]]
+        grid = np.meshgrid(*axes, indexing="ij")
+        names = ["GRS2"] + [c for c in DISCRETE_COVARIATES if c in model.covariates]
+        covariates = {name: values.ravel() for name, values in zip(names, grid[:-1])}
+        table = model.transition_probability(covariates, grid[-1].ravel()).reshape(shape)
+        return cls(model, grs_values, table, horizon)
+
+    def transition_probability(self, population_df, conditional_after, times=1):
+        """
+        Gathers the one-step transition probability of each simulant, see ParametricAFTModel.transition_probability.
+        """
+        conditional_after = np.asarray(conditional_after, dtype=float)
+        if times != 1:
+            return self.model.transition_probability(population_df, conditional_after, times=times)
+
+        grs = np.asarray(population_df["GRS2"], dtype=float)
+        grs_index = np.minimum(np.searchsorted(self.grs_values, grs), len(self.grs_values) - 1)
+        in_table = self.grs_values[grs_index] == grs
+
+        coordinates = [grs_index]
+        for covariate, values in [(c, np.asarray(population_df[c], dtype=float)) for c in self.discrete_covariates] + [
+            ("time_in_state", conditional_after)
+        ]:
+            upper = 1 if covariate == "fdr" else self.horizon
+            in_table &= (values >= 0) & (values <= upper) & (values == np.floor(values))
+            coordinates.append(np.clip(np.nan_to_num(values), 0, upper).astype(np.intp))
+
+        flat_index = np.ravel_multi_index(coordinates, self.table.shape)
+        probabilities = self.table.reshape(-1)[flat_index]
+        if not in_table.all():
+            outside = ~in_table
+            covariates = {c: np.asarray(population_df[c], dtype=float)[outside] for c in self.model.covariates}
+            probabilities[outside] = self.model.transition_probability(covariates, conditional_after[outside])
+        return probabilities
+
+    def predict_survival_function(self, df, times=1, conditional_after=None):
+        """Drop-in replacement of lifelines' predict_survival_function for a single prediction time"""
+        return survival_function_frame(self, df, times, conditional_after)
+
+
+def lookup_table_key(model_file, grs_values, horizon):
+    """Hash of the model file contents, GRS2 support and horizon used to name cached tables"""
+    digest = hashlib.sha256()
+    with open(model_file, "rb") as binary_file:
+        digest.update(binary_file.read())
+    digest.update(np.unique(np.asarray(grs_values, dtype=float)).tobytes())
+    digest.update(f"{horizon}:{TABLE_FORMAT_VERSION}".encode())
+    return digest.hexdigest()[:16]
+
+
+def load_or_build_lookup_table(stem, model, model_file, grs_values, horizon, cache_dir=LOOKUP_TABLES_DIR):
+    """
+    Returns the lookup table of a model, reading it from cache_dir when a table for the same model file, GRS2 support
+    and horizon was saved before. Otherwise builds it and saves it (atomically, as pool workers may race).
+    Args:
+        stem (str): model name used in the cache file name
+        model (ParametricAFTModel): closed-form model
+        model_file (str): file the model was loaded from (hashed)
+        grs_values (array-like): GRS2 support
+        horizon (int): number of simulated cycles
+        cache_dir (str): directory of the cached tables, None disables the disk cache
+    Returns:
+        TransitionLookupTable
+    """
+    if cache_dir is None:
+        return TransitionLookupTable.build(model, grs_values, horizon)
+
+    path = os.path.join(cache_dir, f"{stem}-{lookup_table_key(model_file, grs_values, horizon)}.npy")
+    grs_values = np.unique(np.asarray(grs_values, dtype=float))
+    if os.path.exists(path):
+        table = np.load(path, mmap_mode="r")
+        if table.shape == TransitionLookupTable.shape_for(model, len(grs_values), horizon):
+            return TransitionLookupTable(model, grs_values, table, horizon)
+
+    lookup_table = TransitionLookupTable.build(model, grs_values, horizon)
+    os.makedirs(cache_dir, exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as table_file:
+        np.save(table_file, lookup_table.table)
+    os.replace(temporary_path, path)
+    return lookup_table
@@ -8,8 +8,16 @@ Methods:
     on_initializes_simulants: this method is registered in the setup() method as a simulant initializer. With current implementation this happens a single time at the very beginning of a simulation.
                               like the setup method, it takes an argument passed automatically by the simulation engine. pop_data is an instance of SimulantData which has information useful when initializing simulants.
 
+    state_index: StateIndex (see state_index.py) seeded here with the new simulants, which the other components read their at-risk simulants from.
+
     age_simulants: this method, surprise surprise, ages simulants at every simulation cycle. The method is a listener of the "time_step" event so that it fires in every cycle. 
                    this method, taking advantage that it is a listener of the cycle event, also handles the counting of number of years in a particular state which is later used by the external survival regression models.
+                   it only ages the active simulants (StateIndex.active) and records their number in active_simulants, one entry per cycle.
+
+    settle_pruned_simulants: with population.prune_absorbing set, simulants in T1D_with_DKA / T1D_without_DKA are pruned from the active set at the start of a cycle and
+                             only Screening touches them afterwards (they are not aged, booked or observed), so their age, time_in_state and previous_state stay frozen.
+                             The objective functions do not read those columns. For reports, this method returns the final state table with the values the skipped
+                             cycles would have given them, i.e. the state table of an unpruned run.
 
 
 Example usage:
@@ -28,17 +36,15 @@ from vivarium.framework.engine import Builder
 from vivarium.framework.event import Event
 from vivarium.framework.population import SimulantData
 
+from simulation_package.grs_sampler import get_grs_sampler
+from simulation_package.population_schema import cast_columns, column_series
+from simulation_package.states import state_series
+from simulation_package.state_index import StateIndex
+
 import pandas as pd
 import numpy as np
 
 
-#wtcc dataset to compute GRS
-df_wtcc = pd.read_csv("background_population_grs.csv")
-df_wtcc = df_wtcc.drop(columns= "Unnamed: 0")
-no_t1d_wtcc_df = df_wtcc[df_wtcc["t1d_status"]== 0]
-no_t1d_wtcc_list = no_t1d_wtcc_df["GRS2"].tolist()
-
-
 class Population:
     """
     Component creates population of simulants with initial values for age, GRS2, family history, state, time in state, and other relevant columns.
@@ -49,13 +55,21 @@ class Population:
         "population": {
             "age_start": 0,
             "time_in_state":0,
+            # drop simulants in absorbing states from per-step processing, see state_index.py
+            "prune_absorbing": False,
         },
     }
 
     def __init__(self):
         self.name = "population"
         self.completed_cycles = 0
-        self.no_t1d_wtcc_list = no_t1d_wtcc_list
+        # background GRS2 distribution of the wtcc dataset (participants without T1D), see grs_sampler.py
+        self.grs_sampler = get_grs_sampler()
+        # per-state simulant index shared with the other components, see state_index.py
+        self.state_index = StateIndex()
+        # number of active simulants at every cycle, and (cycle, pruned simulants) pairs
+        self.active_simulants = []
+        self.pruned_simulants = []
     
 
     def setup(self, builder: Builder):
@@ -79,8 +93,14 @@ class Population:
         
         
         builder.population.initializes_simulants(self.on_initializes_simulants, creates_columns=columns_created)
+        self.state_index.clear()
+        self.state_index.prune_absorbing = self.config.population.prune_absorbing
+        self.active_simulants = []
+        self.pruned_simulants = []
 
         self.population_view = builder.population.get_view(columns_created)
+        # aging only reads the bookkeeping columns and writes age and time_in_state
+        self.aging_view = builder.population.get_view(["age", "state", "previous_state", "time_in_state"])
         builder.event.register_listener("time_step", self.age_simulants)
 
     def on_initializes_simulants(self, pop_data: SimulantData):
@@ -92,31 +112,34 @@ class Population:
         family_history_probs = self.family_history_randomness.get_draw(pop_data.index)
         #uniform_randoms = self.grs_randomness.get_draw(pop_data.index)
         grs_random_draws = self.grs_randomness.get_draw(pop_data.index)
-        mapped_indices = (grs_random_draws * len(self.no_t1d_wtcc_list)).astype(int)
-        grs2_values = [self.no_t1d_wtcc_list[idx] for idx in mapped_indices]
+        grs2_values = self.grs_sampler.sample(grs_random_draws)
 
 
 
+        # compact dtypes of population_schema.py, which every later update has to keep
+        # (every column is built on pop_data.index, so the frame is assembled without aligning indexes)
+        index = pop_data.index
         population = pd.DataFrame(
             {
-                "age": self.config.population.age_start,
-                "GRS2":grs2_values, # change this to 0 - 20 normally distributed (mean of 10 and sigma value 2.375)
-                "fdr":np.where(family_history_probs < 0.02, 1,0), # 1 = yes, 0 = no
-                "state": pd.Series("healthy", index=pop_data.index),
-                "previous_state": pd.Series("healthy", index = pop_data.index),
-                "time_in_state": self.config.population.time_in_state,
-                "screened_in_past": pd.Series(0, index= pop_data.index), # 1 = yes, 0 = no
-                "number_of_screens": pd.Series(0, index= pop_data.index),
-                "screen_status": pd.Series("not_screened", index=pop_data.index),
-                "screening_cost": pd.Series(0, index=pop_data.index),
-                "t1d_cost": pd.Series(0, index = pop_data.index),
-                "market_basket_cost": pd.Series(0, index = pop_data.index),
-                "entrance_time":pop_data.creation_time,
-                "ever_antibody":pd.Series(0, index= pop_data.index) # 1 = yes, 0 = no,
+                "age": column_series(self.config.population.age_start, index, "age"),
+                "GRS2": column_series(grs2_values, index, "GRS2"), # change this to 0 - 20 normally distributed (mean of 10 and sigma value 2.375)
+                "fdr": column_series(np.where(family_history_probs < 0.02, 1, 0), index, "fdr"), # 1 = yes, 0 = no
+                "state": state_series("healthy", index=index),
+                "previous_state": state_series("healthy", index=index, name="previous_state"),
+                "time_in_state": column_series(self.config.population.time_in_state, index, "time_in_state"),
+                "screened_in_past": column_series(0, index, "screened_in_past"), # 1 = yes, 0 = no
+                "number_of_screens": column_series(0, index, "number_of_screens"),
+                "screen_status": state_series("not_screened", index=index, name="screen_status"),
+                "screening_cost": column_series(0, index, "screening_cost"),
+                "t1d_cost": column_series(0, index, "t1d_cost"),
+                "market_basket_cost": column_series(0, index, "market_basket_cost"),
+                "entrance_time": pd.Series(pop_data.creation_time, index=index),
+                "ever_antibody": column_series(0, index, "ever_antibody"), # 1 = yes, 0 = no,
             },
-            index=pop_data.index,
+            index=index,
         )
         self.population_view.update(population)
+        self.state_index.add_simulants(pop_data.index, "healthy")
 
     def age_simulants(self, event: Event):
         """
@@ -124,14 +147,34 @@ class Population:
         """
 
         self.completed_cycles +=1
-        population = self.population_view.get(event.index)
-      
-
+        pruned = self.state_index.prune()
+        if not pruned.empty:
+            self.pruned_simulants.append((self.completed_cycles, pruned))
+        active_index = self.state_index.active()
+        self.active_simulants.append(len(active_index))
+        population = self.aging_view.get(active_index)
+
+        # simulants whose last state change is not booked yet (see bookkeeping.py) keep time_in_state
         population.loc[population["state"] == population["previous_state"], "time_in_state"] += 1
-        
-        
+
         population["age"] += 1
-        self.population_view.update(population)
+        self.aging_view.update(population[["age", "time_in_state"]])
 
-   
-        
+    def settle_pruned_simulants(self, state_table):
+        """
+        bring pruned simulants up to date with the cycles they skipped
+        Args:
+            state_table (pd.DataFrame): state table at the end of the simulation (sim.get_population())
+        Returns:
+            pd.DataFrame: copy with the age, time_in_state and previous_state the skipped cycles would have given the pruned simulants
+        """
+        state_table = state_table.copy()
+        for cycle, pruned in self.pruned_simulants:
+            skipped_cycles = self.completed_cycles - cycle + 1
+            population = state_table.loc[pruned]
+            # simulants pruned before their last state change was booked would have been booked in the cycle they were pruned
+            unbooked = (population["state"] != population["previous_state"]).to_numpy()
+            state_table.loc[pruned, "age"] = population["age"] + skipped_cycles
+            state_table.loc[pruned, "time_in_state"] = np.where(unbooked, skipped_cycles - 1, population["time_in_state"] + skipped_cycles)
+            state_table.loc[pruned, "previous_state"] = population["state"]
+        return cast_columns(state_table)
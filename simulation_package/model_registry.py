@@ -0,0 +1,171 @@
+"""
+This module contains the TransitionModelRegistry class, a lazy per-process cache of the survival regression models used by
+the transition components.
+
+Models are loaded the first time a component asks for them (not when a module is imported), from paths resolved relative
+to the repository root. Each process keeps one copy of each model. Calling ``registry.warm()`` in the parent process before
+``multiprocessing.Pool`` forks its workers means the workers inherit the loaded models copy-on-write instead of reloading them.
+
+Methods:
+    get: returns the model stored under a file stem (e.g. "healthy2sAB"), loading it on first use
+
+    warm: loads every transition model up front
+
+    report: load time (seconds) and memory allocated while loading (bytes) for every loaded model
+
+    transition_model: the model of a stem as used by an engine ("lifelines", "numpy" or "lookup")
+
+    build_lookup_tables: precomputes the tables of the "lookup" engine, see lookup_tables.py
+
+    clear: drops all cached models
+
+
+Example usage:
+    >>> from simulation_package.model_registry import registry
+    >>> registry.warm()
+    >>> registry.get("healthy2sAB").predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from simulation_package.hazard_engine import EmptyPopulationGuard, transition_model
+from simulation_package.lean_models import load_transition_model, model_path
+from simulation_package.lookup_tables import LOOKUP_TABLES_DIR, load_or_build_lookup_table
+
+
+# "lifelines" (fitted models), "numpy" (closed-form hazard_engine) or "lookup" (precomputed lookup_tables)
+ENGINES = ("lifelines", "numpy", "lookup")
+
+# file stems of every transition model, see transition_probabilities/binary_files
+TRANSITION_MODELS = [
+    "healthy2sAB",
+    "healthy2mAB",
+    "sAB2Healthy",
+    "sAB2mAB",
+    "mAB2sAB",
+    "sAB2Hyperglycemia",
+    "mAB2Hyperglycemia",
+    "Hyperglycemia2sAB",
+    "Hyperglycemia2mAB",
+    "Hyperglycemia2T1D",
+]
+
+
+class TransitionModelRegistry:
+    """
+    Lazy cache of transition models, one instance per process.
+    """
+
+    def __init__(self, model_format=None):
+        # None falls back to lean_models.MODEL_FORMAT (TRANSITION_MODEL_FORMAT environment variable)
+        self.model_format = model_format
+        self._models = {}
+        self._lookup_tables = {}
+        # stems the "lookup" engine was asked for without a table, warned about once
+        self._missing_lookup_tables = set()
+        self.load_stats = {}
+
+    def get(self, stem):
+        """
+        Returns the transition model stored under stem, loading it on first use.
+        Args:
+            stem (str): file name of the model without extension
+        Returns:
+            lifelines fitter or ParametricAFTModel
+        """
+        if stem not in self._models:
+            self._models[stem] = self._load(stem)
+        return self._models[stem]
+
+    def _load(self, stem):
+        """Loads a model and records how long it took and how much memory was allocated"""
+        # tracemalloc may already be running (e.g. under a profiler), in which case it is left running
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+        model = load_transition_model(stem, self.model_format)
+        load_time = time.perf_counter() - start_time
+        memory = tracemalloc.get_traced_memory()[0] - memory_before
+        if not tracing:
+            tracemalloc.stop()
+        self.load_stats[stem] = {"load_time": load_time, "memory": memory}
+        return model
+
+    def warm(self, stems=None):
+        """
+        Loads every model in stems (all transition models by default). Call before forking worker processes.
+        Returns:
+            TransitionModelRegistry: self, so that calls can be chained
+        """
+        for stem in stems or TRANSITION_MODELS:
+            self.get(stem)
+        return self
+
+    def transition_model(self, stem, engine="lifelines"):
+        """
+        Returns the object used by the requested engine to predict transitions of the model stored under stem.
+        The "lookup" engine falls back to the closed-form model, with a warning (once per stem), if build_lookup_tables
+        was not called for stem.
+        Returns:
+            an object exposing predict_survival_function(df, times, conditional_after)
+        """
+        if engine == "lookup":
+            if stem in self._lookup_tables:
+                return self._lookup_tables[stem]
+            if stem not in self._missing_lookup_tables:
+                self._missing_lookup_tables.add(stem)
+                warnings.warn(f"No lookup table for {stem}, call build_lookup_tables first; using the closed-form model")
+            engine = "numpy"
+        model = transition_model(self.get(stem), engine)
+        if hasattr(model, "transition_probability"):
+            return model
+        return EmptyPopulationGuard(model)
+
+    def build_lookup_tables(self, grs_values, horizon, stems=None, cache_dir=LOOKUP_TABLES_DIR):
+        """
+        Precomputes (or reads from the disk cache) the lookup tables used by the "lookup" engine.
+        Call in the parent process before forking workers, like warm().
+        Args:
+            grs_values (array-like): GRS2 support simulants are sampled from
+            horizon (int): number of simulated cycles
+            stems (list): models to tabulate, all transition models by default
+            cache_dir (str): directory of the cached tables, None to keep them in memory only
+        Returns:
+            TransitionModelRegistry: self, so that calls can be chained
+        """
+        for stem in stems or TRANSITION_MODELS:
+            model = transition_model(self.get(stem), "numpy")
+            self._lookup_tables[stem] = load_or_build_lookup_table(
+                stem, model, model_path(stem, self.model_format), grs_values, horizon, cache_dir
+            )
+        return self
+
+    def is_loaded(self, stem):
+        """Returns True if the model is already cached in this process"""
+        return stem in self._models
+
+    def report(self):
+        """
+        Returns:
+            dict: {stem: {"load_time": seconds, "memory": bytes}} for every model loaded so far
+        """
+        return {stem: dict(stats) for stem, stats in self.load_stats.items()}
+
+    def clear(self):
+        """Drops all cached models and their load statistics"""
+        self._models = {}
+        self._lookup_tables = {}
+        self._missing_lookup_tables = set()
+        self.load_stats = {}
+
+
+# process-wide registry shared by all transition components
+registry = TransitionModelRegistry()
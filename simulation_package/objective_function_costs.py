@@ -9,6 +9,9 @@ from vivarium import InteractiveContext
 from vivarium.framework.engine import Builder
 from vivarium.framework.event import Event
 
+from simulation_package.outcomes import outcome_tallies
+from simulation_package.state_index import get_state_index
+
 
 class ObjectiveFunctionCosts:
 
@@ -20,24 +23,31 @@ class ObjectiveFunctionCosts:
         self.t1d_without_dka_cost = t1d_without_dka_cost
         self.t1d_with_dka_cost = t1d_with_dka_cost
         self.total_costs = 0.0
+        self.tallies = {}
 
     def setup(self, builder:Builder):
-        self.population_view = builder.population.get_view(["state","number_of_screens","market_basket_cost","t1d_cost"])
+        self.population_view = builder.population.get_view(["number_of_screens","market_basket_cost","t1d_cost"])
+        # T1D counts are read from the shared per-state index, see state_index.py
+        self.state_index = get_state_index(builder)
         builder.event.register_listener("simulation_end", self.base_objective_function)
 
     def base_objective_function(self, event:Event):
         
         population = self.population_view.get(event.index)
-        total_autoantibody_screens = population["number_of_screens"].sum()
-
-        num_t1d_without_dka = len(population[population["state"] == "T1D_without_DKA"])
-        num_t1d_with_dka = len(population[population["state"] == "T1D_with_DKA"])
-        total_t1d_management_costs =  population["t1d_cost"].sum()
-
-        self.total_costs = (
-            total_autoantibody_screens * self.autoantibody_test_cost +
+        # additive tallies (see outcomes.py), so that sharded runs can merge them before computing the costs
+        self.tallies = outcome_tallies(population, self.state_index)
+        self.total_costs = self.costs_from_tallies(self.tallies)
+
+    def costs_from_tallies(self, tallies):
+        """
+        Args:
+            tallies (dict): outcome tallies of the simulants (outcome_tallies or merge_tallies, see outcomes.py)
+        Returns:
+            float: total costs objective
+        """
+        return (
+            tallies["number_of_screens"] * self.autoantibody_test_cost +
             self.number_genetic_screens * self.genetic_test_cost +
-            num_t1d_without_dka * self.t1d_without_dka_cost +
-            num_t1d_with_dka * self.t1d_with_dka_cost + total_t1d_management_costs
+            tallies["T1D_without_DKA"] * self.t1d_without_dka_cost +
+            tallies["T1D_with_DKA"] * self.t1d_with_dka_cost + tallies["t1d_cost"]
         ) / 100000 
-        
@@ -8,6 +8,8 @@ from vivarium import InteractiveContext
 from vivarium.framework.engine import Builder
 from vivarium.framework.event import Event
 
+from simulation_package.state_index import get_state_index
+
 class ObjectiveFunctionDKA:
 
     def __init__(self):
@@ -16,12 +18,22 @@ class ObjectiveFunctionDKA:
 
 
     def setup(self, builder:Builder):
-        self.population_view = builder.population.get_view(["state"])
+        # T1D counts are read from the shared per-state index, see state_index.py
+        self.state_index = get_state_index(builder)
         builder.event.register_listener("simulation_end", self.base_objective_function_dka)
 
     def base_objective_function_dka(self, event:Event):
-        population = self.population_view.get(event.index)
-        num_t1d_without_dka = len(population[population["state"] == "T1D_without_DKA"])
-        num_t1d_with_dka = len(population[population["state"] == "T1D_with_DKA"])
+        tallies = {state: self.state_index.count(state) for state in ("T1D_without_DKA", "T1D_with_DKA")}
+        self.dka_ratio = self.dka_ratio_from_tallies(tallies)
+
+    def dka_ratio_from_tallies(self, tallies):
+        """
+        Args:
+            tallies (dict): outcome tallies of the simulants, with the T1D_with_DKA and T1D_without_DKA counts (see outcomes.py)
+        Returns:
+            float: DKA ratio objective
+        """
+        num_t1d_without_dka = tallies["T1D_without_DKA"]
+        num_t1d_with_dka = tallies["T1D_with_DKA"]
 
-        self.dka_ratio = num_t1d_with_dka / (num_t1d_with_dka + num_t1d_without_dka)
\ No newline at end of file
+        return num_t1d_with_dka / (num_t1d_with_dka + num_t1d_without_dka)
@@ -15,6 +15,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import numpy as np
 
+from simulation_package.state_index import get_state_index
+
 class StateTableObserver:
     """
     Component creates the Observer()
@@ -48,6 +50,9 @@ class StateTableObserver:
             ]
         )
 
+        # simulants pruned from the active set (population.prune_absorbing) are not recorded, see state_index.py
+        self.state_index = get_state_index(builder)
+
         builder.event.register_listener("time_step", self.record_state_table)
      
         
@@ -58,7 +63,7 @@ class StateTableObserver:
         It can be used to collect any data from the simulation at that point in time.
         I add all state_tables to list as I used to build some animated plots
         """
-        current_state_table = self.population_view.get(event.index)
+        current_state_table = self.population_view.get(self.state_index.active())
         self.state_tables_list.append(current_state_table.copy())
 
       
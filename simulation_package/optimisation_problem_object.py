@@ -9,22 +9,21 @@ import numpy as np
 from vivarium.interface import InteractiveContext
 from simulation_package.make_population import Population
 from simulation_package.observer import StateTableObserver
-from simulation_package.autoantibody import AutoAntibody
-from simulation_package.dysglycemia import Dysglycemia
-from simulation_package.from_dysglycemia import FromDysglycemia
-from simulation_package.ab1_to_mab1 import AutoToMultiInsideAutoAntibody
-from simulation_package.mab1_to_ab1 import MultiToAutoInsideAutoantibody
+from simulation_package.transition_kernel import transition_components
 from simulation_package.type1_diabetes_dka_splitting import Type1DiabetesDkaSplitting
-from simulation_package.ab1_to_healthy import Ab1ToHealthy
 from simulation_package.screening_intervention import ScreeningIntervention
 from simulation_package.screening import Screening
 from simulation_package.objective_function_costs import ObjectiveFunctionCosts
 from simulation_package.objective_function_dka import ObjectiveFunctionDKA
+from simulation_package.sharding import run_sharded
+from simulation_package.common_random_numbers import SeedSchedule
+from simulation_package.trajectory_cache import get_natural_history
+from simulation_package.batch_evaluation import run_batch
 #
 from simulation_package.uncertain_archiver import Solution, UncertainSol, MeanPerformanceSol, UncertainObjectivesArchiver, UncertainTester
 
 import pymoo
-#from pymoo.core.problem import Problem
+from pymoo.core.problem import Problem
 from pymoo.core.problem import ElementwiseProblem
 import numpy as np
 
@@ -33,48 +32,93 @@ import numpy as np
 class NoisyProblem(ElementwiseProblem):
     total_simulations = 0
 
-    def __init__(self, **kwargs):
+    def __init__(self, layout="components", engine="lifelines", prune_absorbing=False, grs_distribution="normal",
+                 population_size=100_000, n_shards=1, shard_processes=None, shard_streams="global",
+                 common_random_numbers=False, seed_rotation=1, n_replications=1, base_seed=None, replay=False,
+                 evaluation_cache=None, **kwargs):
+
+        # natural-history transitions: "components" (one component per transition) or "fused" (TransitionKernel), see transition_kernel.py
+        self.layout = layout
+        # "lifelines", "numpy" or "lookup", see model_registry.py
+        self.engine = engine
+        # drop T1D_with_DKA / T1D_without_DKA simulants from per-step processing, see state_index.py
+        self.prune_absorbing = prune_absorbing
+        # screening percentiles read on N(10, 2.375) ("normal") or the background GRS2 distribution ("empirical"), see screening.py
+        self.grs_distribution = grs_distribution
+        self.population_size = population_size
+        # n_shards > 1 splits every evaluation into shards run in shard_processes worker processes, see sharding.py
+        # (use shard_processes=1 with the elementwise pool runner of run_optimisation.py, pool workers cannot fork)
+        self.n_shards = n_shards
+        self.shard_processes = shard_processes
+        self.shard_streams = shard_streams
+        # simulations (seeds) per candidate, averaged
+        self.n_replications = n_replications
+        # common random numbers: the candidates of a generation share a seed set, rotated every seed_rotation
+        # generations (None: one seed set for the whole run), see common_random_numbers.py; otherwise fresh seeds
+        self.seed_schedule = SeedSchedule(n_replications, seed_rotation, base_seed) if common_random_numbers else None
+        self.seed_set = None
+        # replay screening vectors on the natural history of each seed, simulated once per process, see trajectory_cache.py
+        # (pays off with common_random_numbers, where the candidates share seeds)
+        if replay and n_shards > 1:
+            raise ValueError("replay simulates the natural history in one process, it cannot be combined with n_shards > 1")
+        self.replay = replay
+        # EvaluationCache of the outcome tallies of every (canonical screening vector, seed) simulated, shared by the
+        # workers and across runs, see evaluation_cache.py; None: every evaluation is simulated
+        self.evaluation_cache = evaluation_cache
 
-        
         # calls __init__ method of the super_class Problem so that standard pymoo attributes are initialized
 
         #super().__init__(n_var=10, n_obj=3, xl = np.zeros(10), xu = np.ones(10), **kwargs)
         super().__init__(n_var=15, n_obj=3, xl = np.zeros(15), xu = np.ones(15), **kwargs)
 
 
-    def _evaluate(self, x, out, *args, **kargs):
-   
-
-        objective_values_costs = [] 
-        objective_values_dka = []
-        objective_non_zero = []
-        simulation_counter = 0
-
-        seed = None
-        if seed is None:
-            seed = np.random.randint(1,2**32-1)
-
+    def do(self, X, return_values_of, *args, **kwargs):
+        # one seed set per evaluate call (generation), set before the candidates are handed to the elementwise runner
+        if self.seed_schedule is not None:
+            self.seed_set = self.seed_schedule.next_seed_set()
+        return super().do(X, return_values_of, *args, **kwargs)
+
+    def simulation_options(self):
+        """
+        Returns:
+            dict: options that change the outcome tallies of a simulation, part of the evaluation cache key
+        """
+        return {"layout": self.layout, "engine": self.engine, "prune_absorbing": self.prune_absorbing,
+                "grs_distribution": self.grs_distribution, "population_size": self.population_size,
+                "n_shards": self.n_shards, "shard_streams": self.shard_streams if self.n_shards > 1 else None,
+                "replay": self.replay, "step_size": 365}
+
+    def simulate(self, screening_vector, seed):
+        """
+        Args:
+            screening_vector (np.ndarray): screening percentile of every cycle
+            seed (int): random seed of the simulation
+        Returns:
+            dict: outcome tallies of the simulated cohort (see outcomes.py)
+        """
         config = {
             "randomness": {
                 "key_columns": ["entrance_time", "GRS2", "fdr"],
                 "random_seed": seed,
             },
-            "population": {"population_size": 100_000},
+            "population": {"population_size": self.population_size, "prune_absorbing": self.prune_absorbing},
             "time": {
                 "step_size": 365,
             },
         }
-        # run a simulation for each candidate solution 
-        screening_vector = x
-            
-        
 
-        sim = InteractiveContext(components=[Population(), AutoAntibody(), Ab1ToHealthy(),
-                                    AutoToMultiInsideAutoAntibody(),
-                                    MultiToAutoInsideAutoantibody(),
-                                    Dysglycemia(),
-                                    FromDysglycemia(),
-                                    Screening(continuous_vector= screening_vector),
+        if self.replay:
+            natural_history = get_natural_history(seed, self.population_size, len(screening_vector), self.layout, self.engine)
+            return natural_history.replay(screening_vector, grs_distribution=self.grs_distribution)
+        if self.n_shards > 1:
+            # only the additive outcome tallies of the shards are merged, see outcomes.py
+            return run_sharded(screening_vector, self.population_size, self.n_shards, seed, processes=self.shard_processes,
+                               streams=self.shard_streams, layout=self.layout, engine=self.engine,
+                               prune_absorbing=self.prune_absorbing, grs_distribution=self.grs_distribution)
+
+        sim = InteractiveContext(components=[Population(),
+                                    *transition_components(self.layout, self.engine),
+                                    Screening(continuous_vector= screening_vector, grs_distribution=self.grs_distribution),
                                     ScreeningIntervention('screening_intervention', 'further_t1d_splitting_rate'),
                                     Type1DiabetesDkaSplitting(dka_ratio=0.58),
                                     StateTableObserver(),
@@ -84,23 +128,108 @@ class NoisyProblem(ElementwiseProblem):
 
 
         sim.take_steps(len(screening_vector))
-        simulation_counter = simulation_counter + 1
         sim.finalize()
-        # costs
-        obj_function_costs = sim.get_component("objective_function_costs")
-        total_costs = obj_function_costs.total_costs
-        objective_values_costs.append(total_costs)
-        # dka
-        obj_function_dka = sim.get_component("objective_function_dka")
-        dka_ratio = obj_function_dka.dka_ratio
-        objective_values_dka.append(dka_ratio)
+        # tallies the costs and dka objectives are computed from
+        return sim.get_component("objective_function_costs").tallies
+
+    def _evaluate(self, x, out, *args, **kargs):
+   
+
+        objective_values_costs = [] 
+        objective_values_dka = []
+        objective_non_zero = []
+
+        # common random numbers: every candidate of the generation shares the seed set, see common_random_numbers.py
+        seeds = self.seed_set
+        if seeds is None:
+            seeds = [np.random.randint(1,2**32-1) for _ in range(self.n_replications)]
+
+        # run a simulation for each candidate solution 
+        screening_vector = x
+
+        for seed in seeds:
+            if self.evaluation_cache is not None:
+                # tallies of a simulation of the same canonical vector and seed are reused, see evaluation_cache.py
+                tallies = self.evaluation_cache.evaluate(screening_vector, seed, self.simulation_options(),
+                                                         lambda: self.simulate(screening_vector, seed))
+            else:
+                tallies = self.simulate(screening_vector, seed)
+            objective_values_costs.append(ObjectiveFunctionCosts().costs_from_tallies(tallies))
+            objective_values_dka.append(ObjectiveFunctionDKA().dka_ratio_from_tallies(tallies))
     
         #non-zero objective (this is independent of simulation)
         non_zero_counts = sum(1 for value in screening_vector if value > 0)
         objective_non_zero.append(non_zero_counts)
 
-        out["F"] = np.column_stack([objective_values_costs, objective_values_dka, objective_non_zero])
+        # replications of the candidate are averaged
+        out["F"] = np.column_stack([np.mean(objective_values_costs), np.mean(objective_values_dka), objective_non_zero])
         print(out["F"])
+        # seeds of the replications, kept with the candidate (e.g. in the streamed history, see checkpointing.py)
+        out["seeds"] = np.array(seeds)
         
 
-    
\ No newline at end of file
+    
+
+
+
+class BatchedNoisyProblem(Problem):
+    """
+    NoisyProblem evaluating a whole generation in stacked simulations, see batch_evaluation.py.
+
+    With common_random_numbers every candidate of a generation is simulated once per seed of the seed set on the same
+    draws, and gets exactly the objectives NoisyProblem(common_random_numbers=True) gives it. Otherwise each generation
+    gets a fresh seed and every candidate and replicate its own draws.
+    """
+
+    def __init__(self, layout="components", engine="lifelines", prune_absorbing=False, grs_distribution="normal",
+                 population_size=100_000, max_batch_size=None, common_random_numbers=False, seed_rotation=1,
+                 n_replications=1, base_seed=None, **kwargs):
+        self.simulation_options = {"layout": layout, "engine": engine, "prune_absorbing": prune_absorbing, "grs_distribution": grs_distribution}
+        self.population_size = population_size
+        # copies of the cohort per stacked simulation (memory grows with max_batch_size * population_size), None: whole generation
+        self.max_batch_size = max_batch_size
+        self.n_replications = n_replications
+        self.seed_schedule = SeedSchedule(n_replications, seed_rotation, base_seed) if common_random_numbers else None
+        self.seed_set = None
+
+        super().__init__(n_var=15, n_obj=3, xl = np.zeros(15), xu = np.ones(15), **kwargs)
+
+    def _batches(self, n_candidates, replicates):
+        # candidates per stacked simulation
+        step = n_candidates if self.max_batch_size is None else max(1, self.max_batch_size // replicates)
+        return [slice(start, start + step) for start in range(0, n_candidates, step)]
+
+    def _evaluate(self, X, out, *args, **kwargs):
+        X = np.atleast_2d(X)
+        costs = np.zeros((len(X), self.n_replications))
+        dka = np.zeros((len(X), self.n_replications))
+        seeds = np.zeros((len(X), self.n_replications), dtype=np.int64)
+
+        if self.seed_schedule is not None:
+            # one simulation per seed of the generation's seed set, on the same draws for every candidate
+            self.seed_set = self.seed_schedule.next_seed_set()
+            seeds[:] = self.seed_set
+            for replication, seed in enumerate(self.seed_set):
+                for batch in self._batches(len(X), 1):
+                    for candidate, tallies in enumerate(run_batch(X[batch], self.population_size, seed, **self.simulation_options)):
+                        costs[batch.start + candidate, replication] = ObjectiveFunctionCosts().costs_from_tallies(tallies[0])
+                        dka[batch.start + candidate, replication] = ObjectiveFunctionDKA().dka_ratio_from_tallies(tallies[0])
+        else:
+            # every candidate and replicate on its own draws, as with fresh seeds
+            for batch in self._batches(len(X), self.n_replications):
+                seed = np.random.randint(1, 2**32 - 1)
+                seeds[batch] = seed
+                batch_tallies = run_batch(X[batch], self.population_size, seed, replicates=self.n_replications,
+                                          common_draws=False, **self.simulation_options)
+                for candidate, tallies in enumerate(batch_tallies):
+                    costs[batch.start + candidate] = [ObjectiveFunctionCosts().costs_from_tallies(t) for t in tallies]
+                    dka[batch.start + candidate] = [ObjectiveFunctionDKA().dka_ratio_from_tallies(t) for t in tallies]
+
+        #non-zero objective (this is independent of simulation)
+        non_zero_counts = (X > 0).sum(axis=1)
+
+        # replications of every candidate are averaged
+        out["F"] = np.column_stack([costs.mean(axis=1), dka.mean(axis=1), non_zero_counts])
+        print(out["F"])
+        # seeds of every candidate's replications (a batch shares its seed, on draws of its own per copy)
+        out["seeds"] = seeds
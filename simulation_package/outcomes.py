@@ -0,0 +1,99 @@
+"""
+This module contains the additive outcome tallies the objective functions are computed from.
+
+ObjectiveFunctionCosts and ObjectiveFunctionDKA only need sums over simulants (screens, T1D management costs) and state
+counts. Tallies of disjoint groups of simulants therefore add up to the tallies of their union, which is what lets a
+cohort be split into shards run in separate processes (see sharding.py): every shard returns its tallies, they are merged
+with merge_tallies and the objective functions are evaluated once on the merged tallies, exactly as on an unsharded run.
+
+Methods:
+    outcome_tallies: tallies of the simulants of a simulation at its end
+
+    merge_tallies: sum of the tallies of disjoint groups of simulants
+
+    batch_tallies: tallies of every copy of the cohort of a stacked batch simulation (see batch_evaluation.py)
+
+
+Example usage:
+    >>> tallies = outcome_tallies(self.population_view.get(event.index), self.state_index)
+    >>> total_costs = ObjectiveFunctionCosts().costs_from_tallies(merge_tallies([tallies_1, tallies_2]))
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from simulation_package.states import STATES
+
+
+# state table columns summed over the simulants
+SUMMED_COLUMNS = ("number_of_screens", "t1d_cost", "market_basket_cost")
+
+
+def outcome_tallies(population, state_index):
+    """
+    Args:
+        population (pd.DataFrame): state table with at least the SUMMED_COLUMNS
+        state_index (StateIndex): per-state index of the same simulants (see state_index.py)
+    Returns:
+        dict: number of simulants, sum of every SUMMED_COLUMNS column and number of simulants in every state
+    """
+    tallies = {"simulants": len(population)}
+    # accumulate the compact columns (int16 / float32, see population_schema.py) in 64 bits
+    tallies["number_of_screens"] = int(population["number_of_screens"].to_numpy().sum(dtype=np.int64))
+    tallies["t1d_cost"] = float(population["t1d_cost"].to_numpy().sum(dtype=np.float64))
+    tallies["market_basket_cost"] = float(population["market_basket_cost"].to_numpy().sum(dtype=np.float64))
+    for state in STATES:
+        tallies[state] = state_index.count(state)
+    return tallies
+
+
+def merge_tallies(tallies_list):
+    """
+    Args:
+        tallies_list (list): tallies (outcome_tallies) of disjoint groups of simulants
+    Returns:
+        dict: tallies of all the simulants
+    """
+    merged = {}
+    for tallies in tallies_list:
+        for key, value in tallies.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def batch_tallies(population, state_index, n_batches):
+    """
+    Args:
+        population (pd.DataFrame): state table with the SUMMED_COLUMNS and the batch_id column
+        state_index (StateIndex): per-state index of the same simulants (see state_index.py)
+        n_batches (int): number of copies of the cohort
+    Returns:
+        list: tallies (as outcome_tallies) of the simulants of every batch_id
+    """
+    batch_id = population["batch_id"].to_numpy()
+    simulants = np.bincount(batch_id, minlength=n_batches)
+    sums = {
+        column: np.bincount(batch_id, weights=population[column].to_numpy(dtype=np.float64), minlength=n_batches)
+        for column in SUMMED_COLUMNS
+    }
+    # one count per (batch, state) pair
+    state_counts = np.bincount(
+        batch_id.astype(np.int64) * len(STATES) + state_index.codes(population.index), minlength=n_batches * len(STATES)
+    ).reshape(n_batches, len(STATES))
+
+    tallies_list = []
+    for batch in range(n_batches):
+        tallies = {
+            "simulants": int(simulants[batch]),
+            "number_of_screens": int(sums["number_of_screens"][batch]),
+            "t1d_cost": float(sums["t1d_cost"][batch]),
+            "market_basket_cost": float(sums["market_basket_cost"][batch]),
+        }
+        for code, state in enumerate(STATES):
+            tallies[state] = int(state_counts[batch, code])
+        tallies_list.append(tallies)
+    return tallies_list
@@ -0,0 +1,78 @@
+"""
+This module contains the compact column schema of the Population state table.
+
+Every column gets the smallest dtype that holds its values over a simulation: 0/1 flags are int8, counters and ages are
+int16 (bounded by the horizon), costs are float32 (integer costs are exact in float32 up to 2**24 per simulant and the
+objective functions accumulate them in float64) and the state columns are the int8-coded categoricals of states.py.
+Vivarium refuses an update that changes the dtype of a column, so a component writing an int64 Series into an int8
+column fails loudly instead of silently upcasting the table. Components build their updates with column_series or
+cast_columns.
+
+Two columns keep 64-bit dtypes because they are randomness key columns (entrance_time, GRS2, fdr): Vivarium hashes them
+with integer arithmetic in their own dtype, so narrowing them would change every random draw. GRS2 is also matched
+exactly against the support of the lookup tables (lookup_tables.py).
+
+Methods:
+    column_series: pd.Series with the schema dtype of a column, for population_view.update
+
+    cast_columns: copy of a DataFrame with its columns cast to the schema
+
+    bytes_per_simulant: memory footprint of a state table per simulant
+
+
+Example usage:
+    >>> self.population_view.update(column_series(1, index=affected_index, name="screened_in_past"))
+"""
+
+import numpy as np
+import pandas as pd
+
+from simulation_package.states import CATEGORICAL_COLUMNS
+
+
+COLUMN_DTYPES = {
+    "age": np.int16,
+    "GRS2": np.float64,
+    "fdr": np.int64,
+    "time_in_state": np.int16,
+    "screened_in_past": np.int8,
+    "number_of_screens": np.int16,
+    "screening_cost": np.float32,
+    "market_basket_cost": np.float32,
+    "t1d_cost": np.float32,
+    "ever_antibody": np.int8,
+    **CATEGORICAL_COLUMNS,
+}
+
+
+def column_series(values, index, name):
+    """
+    Args:
+        values (scalar or array-like): one value for every simulant, or one value per simulant
+        index (pd.Index): simulants to update
+        name (str): column to update
+    Returns:
+        pd.Series: series with the schema dtype of the column
+    """
+    return pd.Series(values, index=index, name=name, dtype=COLUMN_DTYPES[name])
+
+
+def cast_columns(frame):
+    """
+    Args:
+        frame (pd.DataFrame): columns of the state table
+    Returns:
+        pd.DataFrame: copy with every column of the schema cast to its dtype
+    """
+    return frame.astype({column: COLUMN_DTYPES[column] for column in frame.columns if column in COLUMN_DTYPES})
+
+
+def bytes_per_simulant(state_table):
+    """
+    Args:
+        state_table (pd.DataFrame): state table (sim.get_population())
+    Returns:
+        float: bytes used by the columns and the index, per simulant
+    """
+    # shallow: the strings of the legacy state columns are shared objects, only the pointers are per simulant
+    return state_table.memory_usage(index=True, deep=False).sum() / len(state_table)
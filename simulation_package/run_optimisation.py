@@ -1,3 +1,4 @@
+import argparse
 import time
 import multiprocessing
 import pickle
@@ -11,8 +12,15 @@ from pymoo.algorithms.moo.nsga2 import NSGA2
 from pymoo.optimize import minimize
 from pymoo.core.problem import StarmapParallelization
 from pymoo.operators.mutation.pm import PolynomialMutation
-from simulation_package.optimiser_noisy import NoisyProblem
+from simulation_package.optimisation_problem_object import BatchedNoisyProblem, NoisyProblem
 from simulation_package.custom_mutation import CustomMutation, CombinedMutation
+from simulation_package.model_registry import registry
+from simulation_package.surrogate import SurrogatePreScreening
+from simulation_package.archive_driver import ArchiveDriver
+from simulation_package.asynchronous_scheduler import AsynchronousScheduler
+from simulation_package.archive_persistence import restore_archiver
+from simulation_package.checkpointing import GenerationCheckpoint, resume
+from simulation_package.evaluation_cache import EVALUATION_CACHE_PATH, EvaluationCache
 #from simulation_package.optimization_call_back import MyCallback
 
 
@@ -55,11 +63,50 @@ def generate_diverse_population(n_individuals=100, n_genes=15):
 screening_problem = NoisyProblem()
 
 if __name__ == "__main__":
-    n_processes = 6
-    pool = multiprocessing.Pool(n_processes)
-    runner = StarmapParallelization(pool.starmap)
-
-    screening_problem = NoisyProblem(elementwise_runner=runner)
+    parser = argparse.ArgumentParser(description="NSGA2 optimisation of the screening vector")
+    parser.add_argument("--resume", action="store_true", help="resume the run from the last checkpoint of checkpoint_directory (generational runs only)")
+    arguments = parser.parse_args()
+
+    # True: simulate each generation in one stacked simulation (see batch_evaluation.py) instead of a pool of elementwise runs
+    batched = False
+    # True: reuse the outcome tallies of every simulated (canonical screening vector, seed) across generations and runs,
+    # dropped when a model file or simulation module changes (see evaluation_cache.py); needs batched = False
+    evaluation_caching = False
+    # > 0: share of every generation's evaluations spent re-evaluating the most uncertain elites of an
+    # UncertainObjectivesArchiver, which then gives the Pareto set (see archive_driver.py)
+    reevaluation_share = 0.0
+    # directory of a crash-safe log of the archive (see archive_persistence.py), reloaded if it already holds one; None: in memory only
+    archive_directory = None
+    # True: steady-state NSGA2 without generation barriers, every worker of the pool handed a new candidate (or an elite
+    # re-evaluation, with reevaluation_share > 0) as soon as it frees up (see asynchronous_scheduler.py); needs batched = False
+    asynchronous = False
+
+    if batched and evaluation_caching:
+        raise ValueError("The evaluation cache is only used by NoisyProblem, set batched = False to use it")
+    if batched and asynchronous:
+        raise ValueError("The asynchronous scheduler hands single candidates to the pool of elementwise runs, set batched = False to use it")
+    if arguments.resume and (asynchronous or reevaluation_share > 0):
+        raise ValueError("--resume reloads the generation checkpoints of minimize, which the asynchronous scheduler and the archive "
+                         "driver do not write; set archive_directory to reload their archive instead")
+
+    # load transition models once in the parent so that forked workers share them copy-on-write
+    registry.warm()
+    for stem, stats in registry.report().items():
+        print(f"loaded {stem} in {stats['load_time']:.3f} s ({stats['memory'] / 1024:.0f} KiB)")
+
+    evaluation_cache = None
+    if batched:
+        screening_problem = BatchedNoisyProblem()
+    else:
+        n_processes = 6
+        pool = multiprocessing.Pool(n_processes)
+        runner = StarmapParallelization(pool.starmap)
+
+        if evaluation_caching:
+            evaluation_cache = EvaluationCache(EVALUATION_CACHE_PATH)
+            print(f"evaluation cache: {evaluation_cache.prune()} stale entries removed, {len(evaluation_cache)} entries")
+
+        screening_problem = NoisyProblem(elementwise_runner=runner, evaluation_cache=evaluation_cache)
       
     X = generate_diverse_population(n_individuals=10, n_genes=15)
 
@@ -69,16 +116,52 @@ if __name__ == "__main__":
     composite_mutation = CombinedMutation(custom_mutation, default_mutation)
 
     algo_test = NSGA2(pop_size=10, sampling=X, mutation=composite_mutation)
+    # True: simulate only the offspring a surrogate trained on past simulations rates worth it (see surrogate.py)
+    surrogate_prescreening = False
+    if surrogate_prescreening:
+        algo_test.mating = SurrogatePreScreening(algo_test.mating, candidate_factor=4, simulated_fraction=0.25)
 
     num_generations = ("n_gen", 5) #250
 
-
-
-    results = minimize(problem = screening_problem, algorithm = algo_test, termination = num_generations, save_history = True)
-
-
-    with open("local_test.pkl", "wb") as file:
-        res = pickle.dump(results, file)
+    if asynchronous:
+        archiver = restore_archiver(archive_directory) if archive_directory is not None else None
+        scheduler = AsynchronousScheduler(screening_problem, algo_test, pool, n_processes, reevaluation_share=reevaluation_share,
+                                          archiver=archiver)
+        results = scheduler.run(n_evals=num_generations[1] * algo_test.pop_size)
+        metrics = scheduler.metrics()
+        print(f"pool utilisation: {metrics['utilisation']:.1%} of {metrics['workers']} workers over {metrics['wall_time']:.0f} s, "
+              f"{metrics['evaluations']} evaluations and {metrics['reevaluations']} re-evaluations")
+        with open("local_test_asynchronous.pkl", "wb") as file:
+            pickle.dump({"X": results.X, "F": results.F, "metrics": metrics}, file)
+    elif reevaluation_share > 0:
+        archiver = restore_archiver(archive_directory) if archive_directory is not None else None
+        driver = ArchiveDriver(screening_problem, algo_test, reevaluation_share=reevaluation_share, archiver=archiver)
+        archiver = driver.run(n_gen=num_generations[1])
+        elite_X, elite_F = driver.elite_front()
+        with open("local_test_archive.pkl", "wb") as file:
+            pickle.dump({"elite_X": elite_X, "elite_F": elite_F, "history": archiver.get_archive_history()}, file)
+    else:
+        # every generation's population is streamed to checkpoint_directory/history and the algorithm checkpointed
+        # there, instead of keeping the history in memory (see checkpointing.py); --resume carries on after a crash
+        checkpoint_directory = "checkpoints"
+        if arguments.resume:
+            algorithm = resume(checkpoint_directory, screening_problem)
+            if evaluation_cache is not None:
+                # hits and misses of the resumed run are counted in this run's cache session
+                algorithm.problem.evaluation_cache = evaluation_cache
+            results = minimize(algorithm.problem, algorithm, copy_algorithm=False)
+        else:
+            results = minimize(problem = screening_problem, algorithm = algo_test, termination = num_generations,
+                               callback = GenerationCheckpoint(checkpoint_directory))
+
+
+        with open("local_test.pkl", "wb") as file:
+            res = pickle.dump(results, file)
+
+    if evaluation_cache is not None:
+        statistics = evaluation_cache.report()
+        print(f"evaluation cache: {statistics['hits']} hits, {statistics['misses']} misses, "
+              f"{statistics['seconds_saved']:.1f} s of simulation saved")
 
 print("**************************************************************")
 print("--------- executed in %s seconds ---------" % (time.time() - start_time))
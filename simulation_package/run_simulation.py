@@ -7,18 +7,16 @@ import numpy as np
 
 from vivarium.interface import InteractiveContext
 from simulation_package.make_population import Population
-from simulation_package.autoantibody import AutoAntibody
-from simulation_package.ab1_to_healthy import Ab1ToHealthy
-from simulation_package.ab1_to_mab1 import AutoToMultiInsideAutoAntibody
-from simulation_package.mab1_to_ab1 import MultiToAutoInsideAutoantibody
-from simulation_package.dysglycemia import Dysglycemia 
-from simulation_package.from_dysglycemia import FromDysglycemia
+from simulation_package.grs_sampler import get_grs_sampler
+from simulation_package.transition_kernel import transition_components
 from simulation_package.type1_diabetes_dka_splitting import Type1DiabetesDkaSplitting
 from simulation_package.screening import Screening
 from simulation_package.screening_intervention import ScreeningIntervention
 from simulation_package.observer import StateTableObserver
 from simulation_package.objective_function_costs import ObjectiveFunctionCosts
 from simulation_package.objective_function_dka import ObjectiveFunctionDKA
+from simulation_package.model_registry import registry
+from simulation_package.sharding import run_sharded
 
 # ----------- timer -------------
 start_time = time.time()
@@ -27,6 +25,17 @@ start_time = time.time()
 dka_list = []
 costs = []
 
+# transition engine: "lifelines", "numpy" (closed form) or "lookup" (tables precomputed over the GRS2 support)
+engine = "lifelines"
+# transition layout: "components" (one component per transition) or "fused" (single TransitionKernel component)
+layout = "components"
+# drop simulants in absorbing states (T1D_with_DKA, T1D_without_DKA) from per-step processing; they are still screened
+prune_absorbing = False
+# split the cohort into shards simulated in separate processes (only outcome tallies are kept), see sharding.py
+n_shards = 1
+if engine == "lookup":
+    registry.build_lookup_tables(get_grs_sampler().values, horizon=15)
+
 for i in range(1):
 
     config = {
@@ -35,7 +44,8 @@ for i in range(1):
             'random_seed': i,
         },
         'population': {
-            'population_size': 100_000
+            'population_size': 100_000,
+            'prune_absorbing': prune_absorbing,
         },
         'time': {
             'step_size': 365,
@@ -44,6 +54,12 @@ for i in range(1):
 
     screening_strategy = np.ones(15)
 
+    if n_shards > 1:
+        tallies = run_sharded(screening_strategy, config['population']['population_size'], n_shards, seed=i,
+                              layout=layout, engine=engine, prune_absorbing=prune_absorbing)
+        print(tallies)
+        print(ObjectiveFunctionCosts().costs_from_tallies(tallies), ObjectiveFunctionDKA().dka_ratio_from_tallies(tallies))
+        continue
 
     # sim = InteractiveContext(components=[Population(), AutoAntibody(), Ab1ToHealthy(),
     #                                     AutoToMultiInsideAutoAntibody(),
@@ -59,8 +75,7 @@ for i in range(1):
     #                                     ], configuration=config)
     
 
-    sim = InteractiveContext(components=[Population(), AutoAntibody(), Ab1ToHealthy(), AutoToMultiInsideAutoAntibody(),
-                                           MultiToAutoInsideAutoantibody(), Dysglycemia(),FromDysglycemia(),
+    sim = InteractiveContext(components=[Population(), *transition_components(layout, engine),
                                            Type1DiabetesDkaSplitting(dka_ratio=0.58), Screening(continuous_vector= screening_strategy), StateTableObserver()
                                     ], configuration=config)
 
@@ -69,7 +84,8 @@ for i in range(1):
 
     sim.take_steps(15)
     sim.finalize()
-    state_table = sim.get_population()
+    # pruned simulants are frozen at the cycle they were pruned, see make_population.py
+    state_table = sim.get_component("population").settle_pruned_simulants(sim.get_population())
     print(state_table.head(5))
     print(state_table["state"].value_counts())
     # print("-----------------------------------------------")
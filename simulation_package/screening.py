@@ -4,6 +4,7 @@ import os
 import sys
 
 from scipy.stats import norm
+import numpy as np
 import pandas as pd
 
 from vivarium.framework.engine import Builder
@@ -11,32 +12,46 @@ from vivarium.framework.event import Event
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from simulation_package.grs_sampler import get_grs_sampler
+from simulation_package.states import state_series
+from simulation_package.population_schema import column_series
+from simulation_package.state_index import get_state_index
+
+
+# states recorded in screen_status when a simulant is screened in them
+SCREEN_POSITIVE_STATES = ("Ab1", "mAb1", "dysglycemic", "type1_diabetes")
+
 
 class Screening:
-    def __init__(self, continuous_vector=None):
+    def __init__(self, continuous_vector=None, grs_distribution="normal"):
         self.name = "screening"
         self.completed_cycles = 0
 
         # distribution parameters
         self.mean = 10
         self.std_dev = 2.375
+        # percentiles are read on N(mean, std_dev) ("normal") or on the background GRS2 distribution simulants are
+        # sampled from ("empirical", see grs_sampler.py)
+        self.grs_distribution = grs_distribution
 
         self.threshold_vector = self.compute_threshold_vector(continuous_vector)
 
     def compute_threshold_vector(self, continuous_vector):
-        grs_threshold_vector = []
-        for percentile in continuous_vector:
-            if percentile == 0:
-                threshold = float("inf")
-            elif percentile == 1:
-                threshold = float("-inf")
-            else:
-                threshold = norm.ppf(percentile, loc=self.mean, scale=self.std_dev)
-            grs_threshold_vector.append(threshold)
-        return grs_threshold_vector
+        percentiles = np.asarray(continuous_vector, dtype=float)
+        if self.grs_distribution == "normal":
+            thresholds = norm.ppf(percentiles, loc=self.mean, scale=self.std_dev)
+        elif self.grs_distribution == "empirical":
+            thresholds = get_grs_sampler().quantile(percentiles)
+        else:
+            raise ValueError(f"Unknown GRS2 distribution {self.grs_distribution!r}, expected 'normal' or 'empirical'")
+        # 0 screens nobody and 1 screens everybody
+        grs_threshold_vector = np.where(percentiles == 0, np.inf, np.where(percentiles == 1, -np.inf, thresholds))
+        return grs_threshold_vector.tolist()
 
     def setup(self, builder: Builder):
-        self.population_view = builder.population.get_view(["age","number_of_screens","GRS2","screen_status","screened_in_past","state", "screening_cost",])
+        self.population_view = builder.population.get_view(["age","number_of_screens","GRS2","screen_status","screened_in_past", "screening_cost",])
+        # screen-positive simulants and their states are read from the shared per-state index, see state_index.py
+        self.state_index = get_state_index(builder)
         self.screening_rate = builder.value.register_rate_producer("screening_rate", source=self.base_screening_rate)
         self.randomness = builder.randomness.get_stream("screening_randomness")
         builder.event.register_listener("time_step", self.determine_screening)
@@ -44,21 +59,30 @@ class Screening:
     def base_screening_rate(self, index: pd.Index) -> pd.Series:
         return pd.Series(1, index=index)
 
-    def determine_screening(self, event: Event):
-        self.completed_cycles += 1
+    def select_eligible(self, index):
+        """
+        Screening eligibility is read on every simulant, including those pruned from the active set (see state_index.py),
+        so that the screens and their costs do not depend on population.prune_absorbing.
+        Args:
+            index (pd.Index): simulants of the simulation
+        Returns:
+            pd.DataFrame: simulants whose GRS2 is above the threshold of the current cycle, None if nobody is screened
+        """
         threshold = self.threshold_vector[self.completed_cycles - 1]
+        if threshold == float("inf"):
+            return None
 
-        population = self.population_view.get(event.index)
+        population = self.population_view.get(index)
+        if threshold == float("-inf"):
+            return population
+        return population.loc[population["GRS2"] > threshold]
 
-        if threshold == float("inf"):
-            return
-        elif threshold == float("-inf"):
-            eligible_for_screening = population
-        else:
-            eligible_for_screening = population.loc[population["GRS2"] > threshold]
+    def determine_screening(self, event: Event):
+        self.completed_cycles += 1
+        eligible_for_screening = self.select_eligible(event.index)
 
         # if the eligible_for_screening dataframe is not empty: 
-        if not eligible_for_screening.empty:
+        if eligible_for_screening is not None and not eligible_for_screening.empty:
             population_index = eligible_for_screening.index
             effective_screening_rate = self.screening_rate(population_index)
             draw = self.randomness.get_draw(population_index)
@@ -71,12 +95,11 @@ class Screening:
             # if there are individuals for screening
             if affected_screening.any():
                 # 1) update screened_in_past collumn
-                self.population_view.update(pd.Series(1, index=affected_indices, name="screened_in_past"))
+                self.population_view.update(column_series(1, index=affected_indices, name="screened_in_past"))
                 
                 # 2) update screen_status column
-                update_conditions = eligible_for_screening['state'].isin(['Ab1', 'mAb1', 'dysglycemic','type1_diabetes'])
-                filtered_affected_indices = affected_indices[update_conditions[affected_indices]]
-                screen_status_update = pd.Series(eligible_for_screening.loc[filtered_affected_indices, "state"],index=filtered_affected_indices,name="screen_status")
+                filtered_affected_indices = affected_indices.intersection(self.state_index.get(*SCREEN_POSITIVE_STATES))
+                screen_status_update = state_series(self.state_index.states(filtered_affected_indices),index=filtered_affected_indices,name="screen_status")
                 if not screen_status_update.empty:
                     self.population_view.update(screen_status_update)
                 # 3) update number_of_screens collumn
@@ -27,6 +27,9 @@ from vivarium.framework.population import SimulantData
 from vivarium.interface import InteractiveContext
 
 
+# multiplier of the DKA splitting rate of simulants screened positive (screen_status in the SCREEN_POSITIVE_STATES of screening.py)
+SCREENED_DKA_MULTIPLIER = 0.119
+
 
 class ScreeningIntervention():
      
@@ -69,7 +72,7 @@ class ScreeningIntervention():
             condition = screen_status.isin(['Ab1', 'mAb1', 'dysglycemic','type1_diabetes'])
             affected_indices = index[condition]
 
-            value.loc[affected_indices] = value.loc[affected_indices] * 0.119
+            value.loc[affected_indices] = value.loc[affected_indices] * SCREENED_DKA_MULTIPLIER
 
             return value
             
@@ -0,0 +1,175 @@
+"""
+This module contains the sharded runner, which splits a cohort into shards simulated in separate processes.
+
+A single InteractiveContext holds the whole population in one process, so one evaluation uses one core and is bounded by
+the memory of that process. Simulants of this model never interact: every transition, screen and DKA split of a simulant
+only depends on its own columns and on its own random draws. run_sharded therefore splits the simulant ids 0..N-1 into
+K contiguous shards, simulates each shard in its own process and merges the additive outcome tallies of the shards
+(outcomes.py), from which ObjectiveFunctionCosts and ObjectiveFunctionDKA are computed as on the unsharded run.
+
+Randomness:
+    Vivarium draws the random number of simulant i at position i of the stream of each decision point (the key-column
+    map of the randomness system is never registered by this model). Each shard maps its local ids 0..n-1 to its global
+    ids start..stop-1 (offset_simulant_ids), so the shards have disjoint randomness keys and every simulant gets exactly
+    the draws it gets in the unsharded run with the same seed: the merged tallies, hence both objectives, are identical.
+    The stream is generated up to the last global id of the shard, so the draws of the last shard cost as much as those
+    of an unsharded run of stop simulants (Vivarium generates the stream up to 10 * population_size without shards).
+
+    With streams="per_shard" every shard instead draws from its own streams (the seed is extended with the shard number)
+    at its local ids. Draws then cost the same in every shard, so K shards on K cores take about as long as one shard
+    of N / K simulants, and results are reproducible for the same seed and number of shards, but they are a different
+    (equally distributed) sample from the unsharded run.
+
+Methods:
+    shard_bounds: contiguous (start, stop) simulant ids of each shard
+
+    model_components: components of one screening simulation (without observers and objective functions)
+
+    offset_simulant_ids: makes the simulants of a shard draw the random numbers of their global ids
+
+    run_shard: simulates one shard and returns its outcome tallies
+
+    run_sharded: simulates a cohort in shards (in a process pool) and returns the merged outcome tallies
+
+
+Example usage:
+    >>> tallies = run_sharded(screening_vector, population_size=10_000_000, n_shards=100, seed=3, engine="numpy")
+    >>> total_costs = ObjectiveFunctionCosts().costs_from_tallies(tallies)
+    >>> dka_ratio = ObjectiveFunctionDKA().dka_ratio_from_tallies(tallies)
+
+Note:
+    Workers are forked, so call registry.warm() (and build_lookup_tables for the "lookup" engine) in the parent first,
+    see model_registry.py. Pool workers cannot start their own pools: inside an elementwise pool (run_optimisation.py)
+    use processes=1, which runs the shards one after the other in the calling process.
+"""
+
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from vivarium.interface import InteractiveContext
+
+from simulation_package.make_population import Population
+from simulation_package.outcomes import merge_tallies, outcome_tallies
+from simulation_package.screening import Screening
+from simulation_package.screening_intervention import ScreeningIntervention
+from simulation_package.transition_kernel import transition_components
+from simulation_package.type1_diabetes_dka_splitting import Type1DiabetesDkaSplitting
+
+
+def shard_bounds(population_size, n_shards):
+    """
+    Args:
+        population_size (int): number of simulants of the cohort
+        n_shards (int): number of shards
+    Returns:
+        list: (start, stop) global simulant ids of every shard, contiguous and of sizes differing by at most one
+    """
+    if not 1 <= n_shards <= population_size:
+        raise ValueError(f"n_shards must be between 1 and the population size ({population_size}), got {n_shards}")
+    edges = np.linspace(0, population_size, n_shards + 1).astype(np.int64)
+    return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:])]
+
+
+def model_components(screening_vector, layout="components", engine="lifelines", grs_distribution="normal"):
+    """
+    Args:
+        screening_vector (array-like): screening percentile of every cycle
+        layout (str): "components" or "fused", see transition_kernel.py
+        engine (str): "lifelines", "numpy" or "lookup", see model_registry.py
+        grs_distribution (str): "normal" or "empirical", see screening.py
+    Returns:
+        list: components of the natural history, screening and DKA splitting
+    """
+    return [
+        Population(),
+        *transition_components(layout, engine),
+        Screening(continuous_vector=screening_vector, grs_distribution=grs_distribution),
+        ScreeningIntervention("screening_intervention", "further_t1d_splitting_rate"),
+        Type1DiabetesDkaSplitting(dka_ratio=0.58),
+    ]
+
+
+def offset_simulant_ids(sim, start, stop):
+    """
+    Maps the local simulant ids 0..stop-start-1 of a simulation that is not set up yet to the global ids start..stop-1
+    of the randomness streams.
+    Args:
+        sim (InteractiveContext): simulation created with setup=False
+        start (int): first global simulant id of the shard
+        stop (int): last global simulant id of the shard + 1
+    """
+    # the IndexMap of Vivarium 1.0 (randomness.index_map) looks the draw position of each simulant up in _map, a Series
+    # indexed by key; its RangeIndex makes the lookup a cheap offset
+    key_mapping = sim._randomness._key_mapping
+    key_mapping._map = pd.Series(np.arange(start, stop, dtype=np.int64))
+
+
+def run_shard(shard):
+    """
+    Args:
+        shard (dict): screening_vector, seed, number, start, stop, streams and the model_components options of the shard
+    Returns:
+        dict: outcome tallies of the simulants of the shard (see outcomes.py)
+    """
+    start, stop = shard["start"], shard["stop"]
+    global_streams = shard.get("streams", "global") == "global"
+    randomness = {"key_columns": ["entrance_time", "GRS2", "fdr"], "random_seed": shard["seed"]}
+    if global_streams:
+        # the stream is only needed up to the last global id of the shard
+        randomness["map_size"] = stop
+    else:
+        randomness["additional_seed"] = f"shard{shard['number']}"
+    config = {
+        "randomness": randomness,
+        "population": {"population_size": stop - start, "prune_absorbing": shard.get("prune_absorbing", False)},
+        "time": {"step_size": 365},
+    }
+    components = model_components(
+        shard["screening_vector"],
+        layout=shard.get("layout", "components"),
+        engine=shard.get("engine", "lifelines"),
+        grs_distribution=shard.get("grs_distribution", "normal"),
+    )
+    sim = InteractiveContext(components=components, configuration=config, setup=False)
+    if global_streams:
+        offset_simulant_ids(sim, start, stop)
+    sim.setup()
+    sim.take_steps(len(shard["screening_vector"]))
+    sim.finalize()
+    population = sim.get_component("population")
+    return outcome_tallies(sim.get_population(), population.state_index)
+
+
+def run_sharded(screening_vector, population_size, n_shards, seed, processes=None, streams="global", **options):
+    """
+    Args:
+        screening_vector (array-like): screening percentile of every cycle
+        population_size (int): number of simulants of the cohort
+        n_shards (int): number of shards
+        seed (int): random seed, the same for every shard
+        processes (int): worker processes, one per shard up to the number of cores by default, 1 to run in this process
+        streams (str): "global" (the draws of the unsharded run) or "per_shard" (independent streams of every shard)
+        options: layout, engine, prune_absorbing and grs_distribution of the simulations
+    Returns:
+        dict: outcome tallies of the whole cohort
+    """
+    if streams not in ("global", "per_shard"):
+        raise ValueError(f"Unknown streams {streams!r}, expected 'global' or 'per_shard'")
+    screening_vector = np.asarray(screening_vector, dtype=float)
+    shards = [
+        {"screening_vector": screening_vector, "seed": seed, "number": number, "start": start, "stop": stop, "streams": streams, **options}
+        for number, (start, stop) in enumerate(shard_bounds(population_size, n_shards))
+    ]
+    if processes is None:
+        processes = min(n_shards, os.cpu_count() or 1)
+    if processes == 1:
+        return merge_tallies(map(run_shard, shards))
+    with multiprocessing.Pool(processes) as pool:
+        # chunksize 1: with global streams, shards further down the cohort draw longer streams, so hand them out one by one
+        return merge_tallies(pool.imap_unordered(run_shard, shards, chunksize=1))
@@ -0,0 +1,227 @@
+"""
+This module contains the StateIndex service, a per-state index of the simulants kept up to date incrementally.
+
+Components used to find their at-risk simulants with Vivarium query views (``query="state == 'Ab1'"``) or by masking the
+whole state table, i.e. every step evaluated the same state predicates over all simulants several times. Nearly every
+simulant sits in healthy while the other states are tiny, so the index keeps one sorted array of simulant ids per state:
+
+    Population:                 seeds the index when simulants are initialised
+    state writers:              every component that writes the state column (the transitions, TransitionKernel and
+                                Type1DiabetesDkaSplitting) calls move() with the simulants it moved, and only with those
+    readers:                    get("Ab1") returns the at-risk pd.Index in O(size of the state), count("T1D_with_DKA")
+                                is O(1), codes()/states() read the current state of a few simulants without a view
+
+Simulants that leave a state are dropped from its array lazily, the next time the state is read. The index is owned by the
+Population component; other components find it with get_state_index(builder). Every simulant of this model is created at
+initialisation and tracked until the end of the simulation, so the index covers the whole event.index.
+
+Active set:
+    active() is the set of simulants still processed every step (aged, booked, observed, read by TransitionKernel). It is
+    every simulant unless pruning is switched on (population.prune_absorbing, see make_population.py): then prune(),
+    called by Population at the start of each step, drops the simulants that reached an absorbing state
+    (states.ABSORBING_STATES). No transition moves them again, so per-step work scales with the at-risk population instead
+    of the whole cohort. They stay in their per-state arrays, so counts and get() still see them. Screening still screens
+    them (its eligibility does not depend on the state), so the outcome tallies are the same with or without pruning.
+
+Methods:
+    StateIndex.add_simulants: seeds the index with new simulants
+
+    StateIndex.move: records that simulants moved to a state (one state for all, or one per simulant)
+
+    StateIndex.get: sorted pd.Index of the simulants in one or more states
+
+    StateIndex.count: number of simulants in a state
+
+    StateIndex.codes / StateIndex.states: current state of the given simulants
+
+    StateIndex.prune / StateIndex.active / StateIndex.active_count: active set of simulants processed every step
+
+    get_state_index: the StateIndex shared by the components of a simulation
+
+
+Example usage:
+    >>> self.state_index = get_state_index(builder)
+    >>> ab1_index = self.state_index.get("Ab1")
+    >>> self.population_view.update(transition_update("mAb1", index=moved))
+    >>> self.state_index.move(moved, "mAb1")
+"""
+
+import numpy as np
+import pandas as pd
+
+from simulation_package.states import ABSORBING_STATES, STATE_DTYPE, STATES, state_codes
+
+
+class StateIndex:
+    """
+    Per-state sorted arrays of simulant ids, updated from the simulants that transition.
+    """
+
+    def __init__(self):
+        # drop simulants in absorbing states from the active set, see prune()
+        self.prune_absorbing = False
+        self.clear()
+
+    @classmethod
+    def from_states(cls, states):
+        """
+        Args:
+            states (pd.Series): state of every simulant, indexed by simulant id
+        Returns:
+            StateIndex: index seeded with those simulants
+        """
+        state_index = cls()
+        state_index.add_simulants(states.index, states)
+        return state_index
+
+    def clear(self):
+        """Forgets every simulant."""
+        # state code of every simulant id, -1 for ids that are not simulants
+        self._codes = np.empty(0, dtype=np.int8)
+        self._members = [np.empty(0, dtype=np.int64) for _ in STATES]
+        self._counts = np.zeros(len(STATES), dtype=np.int64)
+        # _left: some members moved out of the state, _arrived: new members were appended unsorted
+        self._left = np.zeros(len(STATES), dtype=bool)
+        self._arrived = np.zeros(len(STATES), dtype=bool)
+        # sorted ids of the active simulants, and whether each simulant id was pruned
+        self._active = np.empty(0, dtype=np.int64)
+        self._pruned = np.zeros(0, dtype=bool)
+
+    def add_simulants(self, index, state):
+        """
+        Args:
+            index (pd.Index): new simulants
+            state (str or array-like): their state, one for all of them or one per simulant
+        """
+        ids = np.asarray(index, dtype=np.int64)
+        if ids.size and ids.max() >= self._codes.size:
+            grow = ids.max() + 1 - self._codes.size
+            self._codes = np.concatenate([self._codes, np.full(grow, -1, dtype=np.int8)])
+            self._pruned = np.concatenate([self._pruned, np.zeros(grow, dtype=bool)])
+        if self._active.size == 0 and np.all(ids[1:] > ids[:-1]):
+            # the first (sorted) simulants of the simulation, no need to merge
+            self._active = ids.copy()
+        else:
+            self._active = np.union1d(self._active, ids)
+        self.move(index, state)
+
+    def move(self, index, state):
+        """
+        Args:
+            index (pd.Index): simulants that changed state
+            state (str or array-like): their new state, one for all of them or one per simulant
+        """
+        ids = np.asarray(index, dtype=np.int64)
+        if ids.size == 0:
+            return
+        if isinstance(state, str):
+            new_codes = np.full(ids.size, STATES.index(state), dtype=np.int8)
+        else:
+            new_codes = state_codes(state)
+        revived = ids[self._pruned[ids]]
+        if revived.size:
+            # only reachable if a transition out of an absorbing state is ever added
+            self._pruned[revived] = False
+            self._active = np.union1d(self._active, revived)
+
+        old_codes = self._codes[ids]
+        old_codes = old_codes[old_codes >= 0]
+        left = np.bincount(old_codes, minlength=len(STATES))
+        self._counts -= left
+        self._left |= left > 0
+
+        self._codes[ids] = new_codes
+        arrived = np.bincount(new_codes, minlength=len(STATES))
+        self._counts += arrived
+        for code in np.flatnonzero(arrived):
+            self._members[code] = np.concatenate([self._members[code], ids[new_codes == code]])
+            self._arrived[code] = True
+
+    def _compact(self, code):
+        members = self._members[code]
+        if self._arrived[code]:
+            # np.unique also sorts, and drops ids that left and came back within the same step
+            members = np.unique(members[self._codes[members] == code])
+        elif self._left[code]:
+            members = members[self._codes[members] == code]
+        self._members[code] = members
+        self._left[code] = self._arrived[code] = False
+        return members
+
+    def get(self, *states):
+        """
+        Args:
+            states (str): one or more states
+        Returns:
+            pd.Index: sorted ids of the simulants currently in any of the states
+        """
+        members = [self._compact(STATES.index(state)) for state in states]
+        if len(members) == 1:
+            return pd.Index(members[0])
+        return pd.Index(np.sort(np.concatenate(members)))
+
+    def count(self, state):
+        """
+        Args:
+            state (str): state
+        Returns:
+            int: number of simulants currently in the state
+        """
+        return int(self._counts[STATES.index(state)])
+
+    def codes(self, index):
+        """
+        Args:
+            index (pd.Index): simulants
+        Returns:
+            np.ndarray: int8 code (position in STATES) of the current state of each simulant
+        """
+        return self._codes[np.asarray(index, dtype=np.int64)]
+
+    def states(self, index, name="state"):
+        """
+        Args:
+            index (pd.Index): simulants
+            name (str): name of the returned series
+        Returns:
+            pd.Series: categorical current state of each simulant
+        """
+        return pd.Series(pd.Categorical.from_codes(self.codes(index), dtype=STATE_DTYPE), index=index, name=name)
+
+    def prune(self):
+        """
+        Drops the active simulants that are in an absorbing state from the active set (when prune_absorbing is set).
+        Returns:
+            pd.Index: simulants pruned by this call
+        """
+        if not self.prune_absorbing:
+            return pd.Index(np.empty(0, dtype=np.int64))
+        absorbed = np.isin(self._codes[self._active], [STATES.index(state) for state in ABSORBING_STATES])
+        pruned = self._active[absorbed]
+        self._active = self._active[~absorbed]
+        self._pruned[pruned] = True
+        return pd.Index(pruned)
+
+    def active(self):
+        """
+        Returns:
+            pd.Index: sorted ids of the simulants processed every step
+        """
+        return pd.Index(self._active)
+
+    def active_count(self):
+        """
+        Returns:
+            int: number of simulants processed every step
+        """
+        return int(self._active.size)
+
+
+def get_state_index(builder):
+    """
+    Args:
+        builder (Builder): builder of the simulation
+    Returns:
+        StateIndex: index owned by the Population component of the simulation
+    """
+    return builder.components.get_component("population").state_index
@@ -0,0 +1,78 @@
+"""
+This module contains the categorical encoding shared by the state, previous_state and screen_status columns.
+
+The columns are stored as pandas Categoricals with a fixed set of categories, i.e. one int8 code per simulant instead of a
+pointer to a Python string. Comparisons such as ``population["state"] == "healthy"``, ``isin([...])`` and Vivarium
+queries like ``"state == 'Ab1'"`` keep working unchanged, and pandas evaluates them on the codes. Vivarium refuses updates
+that change the dtype of a column, so every component writes these columns through state_series (or casts to the dtypes below).
+
+Methods:
+    state_series: categorical pd.Series holding one state (or one value per simulant) for population_view.update
+
+    state_codes: int8 codes of a state column (categorical or plain strings), positions in STATES
+
+    string_view: copy of a population with the categorical columns converted back to strings, for reports
+
+
+Example usage:
+    >>> self.population_view.update(state_series("Ab1", index=affected_index))
+    >>> codes = state_codes(population["state"])
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# the code of each state is its position in this tuple
+STATES = ("healthy", "Ab1", "mAb1", "dysglycemic", "type1_diabetes", "T1D_with_DKA", "T1D_without_DKA")
+
+# states no transition leaves (set by Type1DiabetesDkaSplitting), see StateIndex.prune
+ABSORBING_STATES = ("T1D_with_DKA", "T1D_without_DKA")
+
+# screen_status holds the state a simulant was screened in, or "not_screened"
+SCREEN_STATUSES = ("not_screened",) + STATES
+
+STATE_DTYPE = pd.CategoricalDtype(STATES)
+SCREEN_STATUS_DTYPE = pd.CategoricalDtype(SCREEN_STATUSES)
+
+# dtype of every categorical column of the state table
+CATEGORICAL_COLUMNS = {
+    "state": STATE_DTYPE,
+    "previous_state": STATE_DTYPE,
+    "screen_status": SCREEN_STATUS_DTYPE,
+}
+
+
+def state_series(values, index, name="state"):
+    """
+    Args:
+        values (str or array-like): one state for every simulant, or one state per simulant
+        index (pd.Index): simulants to update
+        name (str): column to update ("state", "previous_state" or "screen_status")
+    Returns:
+        pd.Series: categorical series with the dtype of the column
+    """
+    return pd.Series(values, index=index, name=name, dtype=CATEGORICAL_COLUMNS[name])
+
+
+def state_codes(states):
+    """
+    Args:
+        states (pd.Series or array-like): state column, categorical or plain strings
+    Returns:
+        np.ndarray: int8 position of each state in STATES, -1 for values that are not states
+    """
+    if isinstance(getattr(states, "dtype", None), pd.CategoricalDtype) and states.dtype == STATE_DTYPE:
+        return states.cat.codes.to_numpy(dtype=np.int8, copy=True)
+    return pd.Categorical(states, dtype=STATE_DTYPE).codes.astype(np.int8)
+
+
+def string_view(population):
+    """
+    Args:
+        population (pd.DataFrame): state table (or part of it)
+    Returns:
+        pd.DataFrame: copy in which the categorical columns hold plain strings
+    """
+    columns = {column: object for column in CATEGORICAL_COLUMNS if column in population.columns}
+    return population.astype(columns)
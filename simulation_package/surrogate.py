@@ -0,0 +1,209 @@
+"""
+This module contains the surrogate pre-screening of NSGA2 offspring, which only sends the most promising or most
+informative candidates to the simulator.
+
+Every offspring of NSGA2 is otherwise simulated with 100k simulants, including offspring that are obviously dominated.
+ObjectiveSurrogate is a scikit-learn random forest per simulated objective (total costs, DKA ratio), trained online on
+every (screening vector -> objectives) pair simulated so far; it predicts a mean and a standard deviation (spread of the
+trees) for any screening vector in milliseconds. The number of non-zero screening percentiles (third objective) does not need a model.
+
+SurrogatePreScreening wraps the mating of the algorithm. Asked for n offspring, it generates candidate_factor * n
+candidates with the wrapped mating and keeps n of them:
+
+    simulated_fraction * n:     drawn at random among the candidates, whatever the surrogate says, so that the training
+                                data keeps covering the search space and a wrong surrogate cannot lock the search
+    the others:                 lowest non-domination rank of their optimistic predictions (mean - kappa * std of each
+                                simulated objective, exact non-zero count) among the simulated objectives of the current
+                                population, i.e. the candidates most likely to survive; ties go to the candidates with
+                                the largest predicted uncertainty, the most informative ones
+
+Until the surrogate has seen min_samples simulations the first n candidates are kept, i.e. the wrapped mating is used as
+it is. The number of simulations per generation stays n_offsprings: pre-screening makes each of them count, so that a
+comparable front needs fewer generations (set NSGA2(n_offsprings=...) below pop_size to also simulate fewer per
+generation).
+
+Methods:
+    ObjectiveSurrogate.observe: adds simulated screening vectors and their objectives, and refits the models
+
+    ObjectiveSurrogate.predict: predicted mean and standard deviation of the simulated objectives
+
+    SurrogatePreScreening: infill criterion selecting the offspring to simulate
+
+    non_zero_objective: number of non-zero screening percentiles of every screening vector
+
+
+Example usage:
+    >>> algorithm = NSGA2(pop_size=100, sampling=X, mutation=composite_mutation)
+    >>> algorithm.mating = SurrogatePreScreening(algorithm.mating, candidate_factor=4, simulated_fraction=0.25)
+    >>> results = minimize(problem=screening_problem, algorithm=algorithm, termination=("n_gen", 50))
+
+Note:
+    The forests are refitted on the max_samples most recent simulations after every generation, which takes a fraction
+    of a second, negligible next to a 100k-simulant simulation.
+"""
+
+import math
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pymoo.core.infill import InfillCriterion
+from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
+from sklearn.ensemble import RandomForestRegressor
+
+
+def non_zero_objective(X):
+    """
+    Args:
+        X (np.ndarray): (candidates, cycles) screening vectors
+    Returns:
+        np.ndarray: number of non-zero screening percentiles of every screening vector (as in NoisyProblem)
+    """
+    return (np.atleast_2d(X) > 0).sum(axis=1)
+
+
+class ObjectiveSurrogate:
+    """
+    Random forest models of the simulated objectives, trained online on the simulated screening vectors.
+    """
+
+    def __init__(self, objectives=(0, 1), max_samples=500, random_state=None):
+        """
+        Args:
+            objectives (tuple): columns of F that are simulated (total costs, DKA ratio)
+            max_samples (int): most recent simulations the models are fitted on
+            random_state (int or np.random.Generator): seed of the forests when observe is not given a random generator
+        """
+        self.objectives = objectives
+        self.max_samples = max_samples
+        self.random_state = np.random.default_rng(random_state)
+        self.X = None
+        self.F = None
+        self.models = []
+
+    def __len__(self):
+        return 0 if self.X is None else len(self.X)
+
+    def observe(self, X, F, random_state=None):
+        """
+        Args:
+            X (np.ndarray): (simulations, cycles) simulated screening vectors
+            F (np.ndarray): (simulations, objectives) their objectives
+            random_state (np.random.Generator): generator the seeds of the refitted forests are drawn from (e.g. the
+                algorithm's), the surrogate's own if None
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        F = np.atleast_2d(np.asarray(F, dtype=float))[:, self.objectives]
+        # failed or pending evaluations are not learnt from
+        finite = np.isfinite(F).all(axis=1)
+        X, F = X[finite], F[finite]
+        self.X = X if self.X is None else np.vstack([self.X, X])[-self.max_samples:]
+        self.F = F if self.F is None else np.vstack([self.F, F])[-self.max_samples:]
+        rng = self.random_state if random_state is None else random_state
+        seeds = rng.integers(2**31 - 1, size=self.F.shape[1])
+        self.models = [self._fit(self.F[:, column], seeds[column]) for column in range(self.F.shape[1])]
+
+    def _fit(self, y, seed):
+        # the objectives jump where a percentile reaches 0 (nobody screened) or 1 (everybody screened), which trees
+        # follow without a kernel; min_samples_leaf averages out part of the Monte Carlo noise of the simulations
+        return RandomForestRegressor(n_estimators=100, min_samples_leaf=2, n_jobs=1, random_state=int(seed)).fit(self.X, y)
+
+    def predict(self, X):
+        """
+        Args:
+            X (np.ndarray): (candidates, cycles) screening vectors
+        Returns:
+            tuple: (candidates, simulated objectives) predicted means and standard deviations (spread of the trees)
+        """
+        X = np.atleast_2d(X)
+        mean, std = [], []
+        for model in self.models:
+            tree_predictions = np.stack([tree.predict(X) for tree in model.estimators_])
+            mean.append(tree_predictions.mean(axis=0))
+            std.append(tree_predictions.std(axis=0))
+        return np.column_stack(mean), np.column_stack(std)
+
+
+class SurrogatePreScreening(InfillCriterion):
+    """
+    Mating that generates more candidates than needed and keeps the ones worth simulating.
+    """
+
+    def __init__(self, mating, surrogate=None, candidate_factor=4, simulated_fraction=0.25, kappa=0.0, min_samples=20, **kwargs):
+        """
+        Args:
+            mating (InfillCriterion): mating of the algorithm (e.g. NSGA2(...).mating)
+            surrogate (ObjectiveSurrogate): surrogate of the simulated objectives, a new one if None
+            candidate_factor (int): candidates generated per offspring
+            simulated_fraction (float): fraction of the offspring drawn at random among the candidates
+            kappa (float): weight of the predicted standard deviation in the optimistic predictions (0: predicted means,
+                the uncertainty then only breaks ties)
+            min_samples (int): simulations before the surrogate is used
+        """
+        super().__init__(**kwargs)
+        self.mating = mating
+        self.surrogate = ObjectiveSurrogate() if surrogate is None else surrogate
+        self.candidate_factor = candidate_factor
+        self.simulated_fraction = simulated_fraction
+        self.kappa = kappa
+        self.min_samples = min_samples
+        # offspring the surrogate has already learnt from
+        self.observed = None
+        # candidates generated and offspring kept by every call
+        self.history = []
+
+    def learn(self, algorithm):
+        """
+        Args:
+            algorithm (Algorithm): algorithm whose last evaluated offspring (algorithm.off) are learnt from, with forests
+                seeded from its random_state so that a seeded run is reproducible
+        """
+        off = getattr(algorithm, "off", None)
+        if off is None or off is self.observed or len(off) == 0:
+            return
+        self.surrogate.observe(off.get("X"), off.get("F"), random_state=getattr(algorithm, "random_state", None))
+        self.observed = off
+
+    def _do(self, problem, pop, n_offsprings, algorithm=None, random_state=None, **kwargs):
+        if algorithm is not None:
+            self.learn(algorithm)
+        candidates = self.mating.do(problem, pop, self.candidate_factor * n_offsprings, algorithm=algorithm,
+                                    random_state=random_state, **kwargs)
+        if len(candidates) <= n_offsprings or len(self.surrogate) < self.min_samples:
+            self.history.append((len(candidates), min(len(candidates), n_offsprings)))
+            return candidates[:n_offsprings]
+
+        selected = self.select(candidates.get("X"), n_offsprings, pop.get("F"), random_state)
+        self.history.append((len(candidates), len(selected)))
+        return candidates[selected]
+
+    def select(self, X, n_offsprings, F_population=None, random_state=None):
+        """
+        Args:
+            X (np.ndarray): (candidates, cycles) candidate screening vectors
+            n_offsprings (int): candidates to keep
+            F_population (np.ndarray): simulated objectives of the current population, which the candidates compete with
+            random_state (np.random.Generator): random generator of the algorithm
+        Returns:
+            np.ndarray: indices of the candidates to simulate
+        """
+        rng = np.random.default_rng() if random_state is None else random_state
+        n_random = min(n_offsprings, math.ceil(self.simulated_fraction * n_offsprings))
+        chosen = rng.choice(len(X), size=n_random, replace=False)
+        remaining = np.setdiff1d(np.arange(len(X)), chosen)
+
+        mean, std = self.surrogate.predict(X[remaining])
+        optimistic = np.column_stack([mean - self.kappa * std, non_zero_objective(X[remaining])])
+        uncertainty = std.sum(axis=1)
+
+        # rank of every candidate among the current population (survival of NSGA2), then the most uncertain first
+        if F_population is not None and len(F_population):
+            _, rank = NonDominatedSorting().do(np.vstack([optimistic, F_population]), return_rank=True)
+            rank = rank[:len(remaining)]
+        else:
+            _, rank = NonDominatedSorting().do(optimistic, return_rank=True)
+        order = np.lexsort((-uncertainty, rank))
+        return np.concatenate([chosen, remaining[order[:n_offsprings - n_random]]])
@@ -0,0 +1,237 @@
+"""
+This module contains the NaturalHistory class, a cache of the natural-history trajectories of one seed that any screening
+vector is replayed on.
+
+Screening only changes outcomes through screen_status, which ScreeningIntervention reads to lower the
+further_t1d_splitting_rate of Type1DiabetesDkaSplitting. The disease progression (AutoAntibody, Ab1ToHealthy, the Ab1/mAb1
+transitions, Dysglycemia, FromDysglycemia or TransitionKernel) never reads a screening column, and Vivarium keys every
+draw on the stream, the clock, the simulant id and the seed. For a given seed the state of every simulant in every cycle
+is therefore the same whatever the screening vector, except for the DKA label of the simulants that reach T1D.
+
+NaturalHistory.simulate runs Vivarium once per seed without screening and keeps, per simulant:
+
+    states:         (cycles, N) int8 state code (position in states.STATES) at screening time of every cycle, i.e. after
+                    the transitions of the cycle and before the DKA split
+    grs2:           GRS2, which the screening thresholds are compared with
+    split ids:      simulants split into T1D_with_DKA / T1D_without_DKA, with the cycle of their split and the draw of the
+                    further_t1d_splitting stream they were split with
+
+NaturalHistory.replay then evaluates a screening vector with array operations over (cycles, N) that mirror Screening,
+ScreeningIntervention and Type1DiabetesDkaSplitting, in their simulation order:
+
+    eligible:       simulants (pruned from the active set or not, see state_index.py) whose GRS2 is above the threshold
+                    of the cycle. screening_rate is 1, so every eligible simulant is screened and the
+                    screening_randomness draws do not need to be stored
+    screen_status:  simulants screened in a SCREEN_POSITIVE_STATES state are screened positive from that cycle on
+    DKA split:      a simulant split in cycle c gets DKA if its draw is below dka_ratio, times SCREENED_DKA_MULTIPLIER if
+                    it was screened positive in cycle c or before
+
+and returns the outcome tallies (outcomes.py) of the full simulation, from which ObjectiveFunctionCosts and
+ObjectiveFunctionDKA give exactly the objectives of a full Vivarium run of NoisyProblem with the same seed.
+
+Methods:
+    NaturalHistory.simulate: runs the natural history of a seed and records the trajectories
+
+    NaturalHistory.replay: outcome tallies of a screening vector
+
+    NaturalHistory.save / NaturalHistory.load: .npz file of the trajectories
+
+    get_natural_history: the trajectories of a seed, simulated once per process (a few recent seeds are kept)
+
+
+Example usage:
+    >>> natural_history = get_natural_history(seed, population_size=100_000, cycles=15, engine="numpy")
+    >>> tallies = natural_history.replay(screening_vector)
+    >>> total_costs = ObjectiveFunctionCosts().costs_from_tallies(tallies)
+
+Note:
+    Replay pays off when many candidates share a seed, i.e. with NoisyProblem(common_random_numbers=True). Only the
+    components of NoisyProblem are replayed: a new component that reads screening columns, or a screening_rate below 1,
+    needs a matching change in replay.
+"""
+
+import functools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from vivarium.framework.utilities import from_yearly
+from vivarium.interface import InteractiveContext
+
+from simulation_package.make_population import Population
+from simulation_package.screening import SCREEN_POSITIVE_STATES, Screening
+from simulation_package.screening_intervention import SCREENED_DKA_MULTIPLIER
+from simulation_package.state_index import get_state_index
+from simulation_package.states import STATES
+from simulation_package.transition_kernel import transition_components
+from simulation_package.type1_diabetes_dka_splitting import T1D_MANAGEMENT_COST, Type1DiabetesDkaSplitting
+
+
+# recent seeds whose trajectories get_natural_history keeps in memory
+NATURAL_HISTORY_CACHE_SIZE = 8
+
+STEP_SIZE = pd.Timedelta(days=365)
+
+
+class RecordingDkaSplitting(Type1DiabetesDkaSplitting):
+    """
+    Type1DiabetesDkaSplitting that records the simulants it splits, their cycle and their further_t1d_splitting draw.
+    """
+
+    def __init__(self, dka_ratio=None):
+        super().__init__(dka_ratio=dka_ratio)
+        self.splits = []
+
+    def _compute_future_state(self, effective_further_t1d_rate, t1d_population_index):
+        # the stream gives the same draws for the same simulants within a cycle
+        draw = self.further_t1d_splitting_randomness.get_draw(t1d_population_index)
+        self.splits.append((t1d_population_index.to_numpy(), self.completed_cycles, draw.to_numpy()))
+        return super()._compute_future_state(effective_further_t1d_rate, t1d_population_index)
+
+
+class StateRecorder:
+    """
+    Records the state code of every simulant at the end of every cycle.
+    """
+
+    def __init__(self):
+        self.name = "state_recorder"
+        self.states = []
+
+    def setup(self, builder):
+        self.state_index = get_state_index(builder)
+        builder.event.register_listener("time_step", self.record, priority=9)
+
+    def record(self, event):
+        self.states.append(self.state_index.codes(event.index))
+
+
+class NaturalHistory:
+    """
+    Screening-independent trajectories of the simulants of one seed.
+    """
+
+    def __init__(self, grs2, states, split_ids, split_cycles, split_draws):
+        """
+        Args:
+            grs2 (np.ndarray): GRS2 of every simulant
+            states (np.ndarray): (cycles, N) int8 state code of every simulant at screening time of every cycle
+            split_ids (np.ndarray): simulants split into T1D_with_DKA / T1D_without_DKA
+            split_cycles (np.ndarray): cycle (1-based) of their split
+            split_draws (np.ndarray): their further_t1d_splitting draw
+        """
+        self.grs2 = grs2
+        self.states = states
+        self.split_ids = split_ids
+        self.split_cycles = split_cycles
+        self.split_draws = split_draws
+
+    @property
+    def cycles(self):
+        return self.states.shape[0]
+
+    @property
+    def population_size(self):
+        return self.states.shape[1]
+
+    @classmethod
+    def simulate(cls, seed, population_size=100_000, cycles=15, layout="components", engine="lifelines"):
+        """
+        Args:
+            seed (int): random seed of the simulation
+            population_size (int): number of simulants
+            cycles (int): number of cycles (length of the screening vectors)
+            layout (str): "components" or "fused", see transition_kernel.py
+            engine (str): "lifelines", "numpy" or "lookup", see model_registry.py
+        Returns:
+            NaturalHistory
+        """
+        config = {
+            "randomness": {"key_columns": ["entrance_time", "GRS2", "fdr"], "random_seed": seed},
+            "population": {"population_size": population_size},
+            "time": {"step_size": STEP_SIZE.days},
+        }
+        splitting = RecordingDkaSplitting(dka_ratio=0.58)
+        recorder = StateRecorder()
+        sim = InteractiveContext(
+            components=[Population(), *transition_components(layout, engine), splitting, recorder], configuration=config
+        )
+        sim.take_steps(cycles)
+        grs2 = sim.get_population()["GRS2"].to_numpy(dtype=np.float64)
+
+        states = np.array(recorder.states, dtype=np.int8)
+        split_ids = np.concatenate([ids for ids, _, _ in splitting.splits]).astype(np.int64)
+        split_cycles = np.concatenate([np.full(len(ids), cycle) for ids, cycle, _ in splitting.splits]).astype(np.int16)
+        split_draws = np.concatenate([draws for _, _, draws in splitting.splits]).astype(np.float64)
+        # simulants split in a cycle were still in type1_diabetes when they were screened
+        states[split_cycles - 1, split_ids] = STATES.index("type1_diabetes")
+        return cls(grs2, states, split_ids, split_cycles, split_draws)
+
+    def replay(self, screening_vector, grs_distribution="normal", dka_ratio=0.58):
+        """
+        Args:
+            screening_vector (array-like): screening percentile of every cycle
+            grs_distribution (str): "normal" or "empirical", see screening.py
+            dka_ratio (float): DKA splitting rate of the simulants not screened positive
+        Returns:
+            dict: outcome tallies of the simulation with this screening vector (see outcomes.py)
+        """
+        if len(screening_vector) != self.cycles:
+            raise ValueError(f"Screening vector of length {len(screening_vector)}, trajectories of {self.cycles} cycles")
+        thresholds = np.asarray(Screening(screening_vector, grs_distribution=grs_distribution).threshold_vector)
+
+        # (cycles, N): screened in the cycle (GRS2 > -inf for everybody, GRS2 > inf for nobody)
+        screened = self.grs2[np.newaxis, :] > thresholds[:, np.newaxis]
+        screened_positive = screened & np.isin(self.states, [STATES.index(state) for state in SCREEN_POSITIVE_STATES])
+        # screen_status stays positive once set (later negative screens do not overwrite it)
+        ever_screened_positive = np.logical_or.accumulate(screened_positive, axis=0)
+
+        positive_at_split = ever_screened_positive[self.split_cycles - 1, self.split_ids]
+        rate = np.where(positive_at_split, dka_ratio * SCREENED_DKA_MULTIPLIER, dka_ratio)
+        with_dka = self.split_draws < from_yearly(rate, STEP_SIZE)
+
+        final_states = self.states[-1].copy()
+        final_states[self.split_ids] = np.where(with_dka, STATES.index("T1D_with_DKA"), STATES.index("T1D_without_DKA"))
+        state_counts = np.bincount(final_states, minlength=len(STATES))
+
+        tallies = {
+            "simulants": self.population_size,
+            "number_of_screens": int(screened.sum()),
+            "t1d_cost": float(len(self.split_ids) * T1D_MANAGEMENT_COST),
+            "market_basket_cost": 0.0,
+        }
+        for code, state in enumerate(STATES):
+            tallies[state] = int(state_counts[code])
+        return tallies
+
+    def save(self, path):
+        """Saves the trajectories to an .npz file"""
+        np.savez(
+            path, grs2=self.grs2, states=self.states, split_ids=self.split_ids, split_cycles=self.split_cycles,
+            split_draws=self.split_draws,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Loads trajectories saved with save"""
+        with np.load(path) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+
+@functools.lru_cache(maxsize=NATURAL_HISTORY_CACHE_SIZE)
+def get_natural_history(seed, population_size=100_000, cycles=15, layout="components", engine="lifelines"):
+    """
+    Args:
+        seed (int): random seed
+        population_size (int): number of simulants
+        cycles (int): number of cycles
+        layout (str): "components" or "fused"
+        engine (str): "lifelines", "numpy" or "lookup"
+    Returns:
+        NaturalHistory: trajectories of the seed, simulated on the first call in this process
+    """
+    return NaturalHistory.simulate(seed, population_size, cycles, layout, engine)
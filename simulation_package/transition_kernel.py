@@ -0,0 +1,251 @@
+"""
+This module contains the TransitionKernel component, a fused alternative to the component-per-transition layout
+(AutoAntibody, Ab1ToHealthy, AutoToMultiInsideAutoAntibody, MultiToAutoInsideAutoantibody, Dysglycemia, FromDysglycemia).
+
+The component-per-transition layout runs every transition as its own Vivarium component: each one reads the population
+view, filters it with a query, draws its random numbers, writes its state changes, and five of them rescan the whole state
+table in determine_time_in_state. TransitionKernel holds the same state machine as an integer-coded transition graph
+(states.STATES, TRANSITION_STAGES) and, on every time step, does:
+
+    one population_view.get -> the stages below on in-memory numpy arrays -> one population_view.update
+
+The stages run in the order the separate components fire their listeners, on the states left by the previous stage, so a
+simulant can still cross several edges in one step (e.g. healthy -> Ab1 -> mAb1) exactly as before. Each stage uses the
+randomness stream and rate pipeline names of the component it replaces, so results are identical for the same seed and
+value modifiers registered on those pipelines still apply.
+
+Methods:
+    setup: registers one rate producer per edge, one randomness stream per stage and the time_step listener
+
+    determine_transitions: applies every stage to the population and writes state, previous_state, time_in_state and ever_antibody
+
+    transition_components: the natural-history components of a layout ("components" or "fused"), in simulation order
+
+Example usage:
+    >>> sim = InteractiveContext(components=[Population(), *transition_components("fused", engine="numpy"),
+    ...                                      Screening(continuous_vector=screening_vector), ...], configuration=config)
+
+Note:
+    Type1DiabetesDkaSplitting stays a separate component in both layouts: its DKA rate is modified by ScreeningIntervention
+    from the screen_status written by Screening earlier in the same step, so it has to keep its own place in the listener order.
+
+    The kernel books previous_state and time_in_state itself, in its single write, with the same ordering guarantee as
+    bookkeeping.StateBookkeeping: changes made after it in a step (DKA splitting) are booked at the start of the next step.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from vivarium.framework.engine import Builder
+from vivarium.framework.event import Event
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from simulation_package.ab1_to_healthy import Ab1ToHealthy
+from simulation_package.ab1_to_mab1 import AutoToMultiInsideAutoAntibody
+from simulation_package.autoantibody import AutoAntibody, grs_divisor
+from simulation_package.bookkeeping import StateBookkeeping
+from simulation_package.competing_risks import CompetingRisksEvaluator
+from simulation_package.dysglycemia import Dysglycemia
+from simulation_package.from_dysglycemia import FromDysglycemia
+from simulation_package.mab1_to_ab1 import MultiToAutoInsideAutoantibody
+from simulation_package.state_index import get_state_index
+from simulation_package.states import STATE_DTYPE, STATES, state_codes, state_series
+
+
+LAYOUTS = ("components", "fused")
+
+# antibody-positive states, used for ever_antibody
+ANTIBODY_STATES = ("Ab1", "mAb1")
+
+
+def healthy_rate_modifier(population_df, probabilities):
+    """GRS2-dependent attenuation of the exits out of healthy, as in AutoAntibody"""
+    return probabilities / grs_divisor(population_df["GRS2"].to_numpy())[:, np.newaxis]
+
+
+# edges of the transition graph grouped by stage, in the order the separate components fire their listeners.
+# exits of one stage compete for the same simulants and are resolved with a single draw of the stage's stream
+TRANSITION_STAGES = [
+    {
+        "source": "healthy",
+        "destinations": ["Ab1", "mAb1"],
+        "models": ["healthy2sAB", "healthy2mAB"],
+        "rates": ["ab1_rate", "mab1_rate"],
+        "stream": "autoantibody",
+        "modifier": healthy_rate_modifier,
+    },
+    {"source": "Ab1", "destinations": ["healthy"], "models": ["sAB2Healthy"], "rates": ["healthy_rate"], "stream": "ab1_to_healthy_model"},
+    {"source": "Ab1", "destinations": ["mAb1"], "models": ["sAB2mAB"], "rates": ["ab1_to_mab1_rate"], "stream": "ab1_to_mab1_randomness"},
+    {"source": "mAb1", "destinations": ["Ab1"], "models": ["mAB2sAB"], "rates": ["mab1_to_ab1_rate"], "stream": "autoantibody_3"},
+    {
+        "source": "Ab1",
+        "destinations": ["dysglycemic"],
+        "models": ["sAB2Hyperglycemia"],
+        "rates": ["ab1_to_dysglycemia_rate"],
+        "stream": "ab1_dysglycemia",
+    },
+    {
+        "source": "mAb1",
+        "destinations": ["dysglycemic"],
+        "models": ["mAB2Hyperglycemia"],
+        "rates": ["mab1_to_dysglycemia_rate"],
+        "stream": "mab1_dysglycemia",
+    },
+    {
+        "source": "dysglycemic",
+        "destinations": ["Ab1", "mAb1", "type1_diabetes"],
+        "models": ["Hyperglycemia2sAB", "Hyperglycemia2mAB", "Hyperglycemia2T1D"],
+        "rates": ["dysglycemia_to_ab1_rate", "dysglycemia_to_mab1_rate", "dysglycemia_to_t1d_rate"],
+        "stream": "from_dysglycemic",
+    },
+]
+
+# population columns read by the survival models
+COVARIATES = ["GRS2", "fdr", "age", "time_in_state"]
+
+
+class TransitionKernel:
+    """
+    Component handles every natural-history transition (healthy, Ab1, mAb1, dysglycemic -> type1_diabetes) in one pass.
+    """
+
+    def __init__(self, engine="lifelines"):
+        self.name = "transition_kernel"
+        self.completed_cycles = 0
+        # "lifelines" (fitted models), "numpy" (closed-form hazard_engine) or "lookup" (precomputed lookup_tables)
+        self.engine = engine
+        self.state_codes = {state: code for code, state in enumerate(STATES)}
+        self.evaluators = [
+            CompetingRisksEvaluator(stage["destinations"], stage["models"], engine=engine, modifier=stage.get("modifier"))
+            for stage in TRANSITION_STAGES
+        ]
+
+    def setup(self, builder: Builder):
+        self.population_view = builder.population.get_view(
+            ["state", "previous_state", "time_in_state", "GRS2", "fdr", "age", "ever_antibody"]
+        )
+
+        # one rate producer per edge, with the names used by the component-per-transition layout
+        self.rates = []
+        for stage_number, stage in enumerate(TRANSITION_STAGES):
+            self.rates.append(
+                [
+                    builder.value.register_rate_producer(rate_name, source=self._edge_rate_source(stage_number, destination))
+                    for rate_name, destination in zip(stage["rates"], stage["destinations"])
+                ]
+            )
+        self.randomness = [builder.randomness.get_stream(stage["stream"]) for stage in TRANSITION_STAGES]
+        # the kernel reads every active simulant at once, and keeps the shared per-state index in sync, see state_index.py
+        self.state_index = get_state_index(builder)
+
+        builder.event.register_listener("time_step", self.determine_transitions)
+
+    def _edge_rate_source(self, stage_number, destination):
+        """Returns the source of the rate pipeline of one edge"""
+
+        def base_rate(index: pd.Index) -> pd.Series:
+            evaluator = self.evaluators[stage_number]
+            # rates computed by determine_transitions for this stage
+            rate = evaluator.rate(destination, index)
+            if rate is not None:
+                return rate
+            rates = evaluator.evaluate(self.population_view.get(index))
+            evaluator.clear()
+            return pd.Series(rates[:, evaluator.destinations.index(destination)], index=index)
+
+        return base_rate
+
+    def determine_transitions(self, event: Event):
+        """
+        Applies every transition stage to the population and writes the result back in a single update.
+        Args:
+            event (Event): time step event
+        """
+        self.completed_cycles += 1
+
+        if self.completed_cycles < 2:
+            return
+
+        population = self.population_view.get(self.state_index.active())
+        index = population.index
+        state = state_codes(population["state"])
+        previous_state = state_codes(population["previous_state"])
+        if (state < 0).any() or (previous_state < 0).any():
+            raise ValueError(f"Unknown state in the population. Expected one of {list(STATES)}")
+        covariates = {column: population[column].to_numpy(copy=True) for column in COVARIATES}
+        ever_antibody = population["ever_antibody"].to_numpy(copy=True)
+        state_at_start = state.copy()
+
+        # state changes made after the kernel in the previous step (DKA splitting), see bookkeeping.py
+        changed = state != previous_state
+        covariates["time_in_state"][changed] = 0
+        previous_state[changed] = state[changed]
+
+        for stage_number, stage in enumerate(TRANSITION_STAGES):
+            at_risk = state == self.state_codes[stage["source"]]
+            if not at_risk.any():
+                continue
+            at_risk_index = index[at_risk]
+            at_risk_population = pd.DataFrame({column: values[at_risk] for column, values in covariates.items()}, index=at_risk_index)
+
+            evaluator = self.evaluators[stage_number]
+            evaluator.evaluate(at_risk_population)
+            rates = np.column_stack([rate(at_risk_index).to_numpy() for rate in self.rates[stage_number]])
+            draw = self.randomness[stage_number].get_draw(at_risk_index).to_numpy()
+            destinations = CompetingRisksEvaluator.choose_destinations(rates, draw)
+            evaluator.clear()
+
+            # code len(destinations) means the simulant stays in the source state
+            destination_codes = np.array([self.state_codes[d] for d in stage["destinations"]] + [self.state_codes[stage["source"]]], dtype=np.int8)
+            state[at_risk] = destination_codes[destinations]
+
+            # simulants that just changed state restart their time_in_state, as transition_update does in the components
+            changed = at_risk & (state != previous_state)
+            covariates["time_in_state"][changed] = 0
+            previous_state[changed] = state[changed]
+
+            if stage_number == 0:
+                # AutoAntibody.determine_ever_antibody runs right after the exits out of healthy
+                ever_antibody[np.isin(state, [self.state_codes[s] for s in ANTIBODY_STATES])] = 1
+
+        self.population_view.update(
+            pd.DataFrame(
+                {
+                    "state": pd.Categorical.from_codes(state, dtype=STATE_DTYPE),
+                    "previous_state": pd.Categorical.from_codes(previous_state, dtype=STATE_DTYPE),
+                    "time_in_state": covariates["time_in_state"],
+                    "ever_antibody": ever_antibody,
+                },
+                index=index,
+            )
+        )
+        moved = state != state_at_start
+        self.state_index.move(index[moved], state_series(pd.Categorical.from_codes(state[moved], dtype=STATE_DTYPE), index=index[moved]))
+
+
+def transition_components(layout="components", engine="lifelines"):
+    """
+    Returns the natural-history transition components of a layout, in simulation order.
+    Args:
+        layout (str): "components" (one component per transition) or "fused" (TransitionKernel)
+        engine (str): transition engine, see model_registry.TransitionModelRegistry.transition_model
+    Returns:
+        list: component instances to place right after Population(). The components layout ends with StateBookkeeping,
+        so that previous_state and time_in_state are booked after the last transition of the step
+    """
+    if layout == "components":
+        return [
+            AutoAntibody(engine=engine),
+            Ab1ToHealthy(engine=engine),
+            AutoToMultiInsideAutoAntibody(engine=engine),
+            MultiToAutoInsideAutoantibody(engine=engine),
+            Dysglycemia(engine=engine),
+            FromDysglycemia(engine=engine),
+            StateBookkeeping(),
+        ]
+    if layout == "fused":
+        return [TransitionKernel(engine=engine)]
+    raise ValueError(f"Unknown layout '{layout}'. Expected one of {list(LAYOUTS)}")
@@ -10,6 +10,13 @@ from vivarium.framework.event import Event
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from simulation_package.states import state_series
+from simulation_package.population_schema import column_series
+from simulation_package.state_index import get_state_index
+
+
+# yearly T1D monitoring cost booked in t1d_cost when a simulant is split (the same with and without DKA)
+T1D_MANAGEMENT_COST = 15077
 
 
 
@@ -22,7 +29,8 @@ class Type1DiabetesDkaSplitting:
 
     def setup(self, builder:Builder):
         self.population_view = builder.population.get_view(["state","previous_state","time_in_state","GRS2","fdr","age","screen_status","t1d_cost"])
-        self.t1d_population_view = builder.population.get_view(["state","previous_state","time_in_state","GRS2","fdr","age","t1d_cost"], query = "state == 'type1_diabetes'")
+        # type1_diabetes simulants are read from the shared per-state index, see state_index.py
+        self.state_index = get_state_index(builder)
         
 
         self.further_t1d_splitting_rate = builder.value.register_rate_producer("further_t1d_splitting_rate", source=self.base_further_t1d_splitting_rate)
@@ -40,7 +48,7 @@ class Type1DiabetesDkaSplitting:
         draw_further_t1d_rate = self.further_t1d_splitting_randomness.get_draw(t1d_population_index)
         affected_indices = (draw_further_t1d_rate < effective_further_t1d_rate)
 
-        further_splitting = pd.Series(np.where(affected_indices, "T1D_with_DKA", "T1D_without_DKA"), index=t1d_population_index, name="state")
+        further_splitting = state_series(np.where(affected_indices, "T1D_with_DKA", "T1D_without_DKA"), index=t1d_population_index)
         
         return further_splitting
     
@@ -50,20 +58,19 @@ class Type1DiabetesDkaSplitting:
         if self.completed_cycles < 2:
             return
         
-        # get T1D population
-        t1d_population = self.t1d_population_view.get(event.index)
-        # index from above
-        t1d_population_index = t1d_population.index
+        # get T1D population index
+        t1d_population_index = self.state_index.get("type1_diabetes")
 
         # calculate transitions
         effective_further_t1d_rate = self.further_t1d_splitting_rate(t1d_population_index)
 
         further_splitting = self._compute_future_state(effective_further_t1d_rate, t1d_population_index)
         self.population_view.update(further_splitting)
+        self.state_index.move(t1d_population_index, further_splitting)
         
         # t1d monitoring costs. 
         # Here I didn't create a dedicated method because I reallyu need to make sure only further_splitting individuals are updated.
-        t1d_costs = pd.Series(np.where(further_splitting == "T1D_with_DKA", 15077, 15077), index=t1d_population_index, name="t1d_cost")
+        t1d_costs = column_series(np.where(further_splitting == "T1D_with_DKA", T1D_MANAGEMENT_COST, T1D_MANAGEMENT_COST), index=t1d_population_index, name="t1d_cost")
         self.population_view.update(t1d_costs)
 
             
@@ -16,12 +16,15 @@ can periodically be reevaluated to update their expected performance. The data s
 best estimate of the non-dominated set based upon the assocaited expected performance of the solutions.
 and is based on the Java code hosted at https://github.com/fieldsend/
 
-Currently uses lists -- next version will incorporate refactoring with numpy arrays in a few places
+The estimated objective vectors, evaluation counts and guards of the history are mirrored in numpy arrays, so that
+dominance checks against the elite set and guarded lists are vectorised, and a generation can be inserted in one
+batch (insert_many / update_many)
 
 @author: Jonathan Fieldsend
 @version: 1.1
 """
 
+import heapq
 import random
 import numpy as np
 from typing import List
@@ -292,10 +295,23 @@ class UncertainSol(Solution):
     def get_guarded_indices(self) -> List[int] :
         """Returns the indices of solutions guarded by this UncertainSol"""
         return self.__guarded_indices
+
+    @property
+    def guarded_indices(self) -> List[int] :
+        """Indices of solutions guarded by this UncertainSol (the same list as get_guarded_indices)"""
+        return self.__guarded_indices
+
+    @guarded_indices.setter
+    def guarded_indices(self, to_guard : List) -> None :
+        self.__guarded_indices = to_guard
     
     def set_guarded_indices(self, to_guard : List) -> None :
         """Returns the indices of solutions guarded by this UncertainSol"""
         self.__guarded_indices = to_guard
+
+    def set_repeated_evaluations(self, evaluations : List[List[float]]) -> None :
+        """Replaces the repeated evaluations of this UncertainSol (the estimated objective vector is left as it is), e.g. when restoring a saved archive"""
+        self.__repeated_evaluations = evaluations
     
 class MeanPerformanceSol(UncertainSol):
     """
@@ -310,14 +326,35 @@ class MeanPerformanceSol(UncertainSol):
 class UncertainObjectivesArchiver:
     """ 
     Maintains the history and elite set for an uncertain/noisy multi-objective problem, where previously entered solutions
-    may have further reevaluations, which changes their performance relative to other members
+    may have further reevaluations, which changes their performance relative to other members.
+
+    The estimated objective vectors of the history are mirrored in a growable NumPy matrix (one row per solution, rows
+    never move), alongside the number of evaluations and the guard of every solution, so that dominance checks against
+    the elite set or a guarded list are single vectorised comparisons. The elite set members are also kept in a heap on
+    their number of evaluations, for the O(log n) selection of the most uncertain elite
     """
+    INITIAL_CAPACITY = 1024
+
     def __init__(self):
         """ Initialises and sets up empty history"""
+        # archive_persistence.ArchivePersistence logging the operations, if any (see set_persistence)
+        self.__persistence = None
         self.__history = []
-        self.__elite_indices = []
+        self.__elite_indices = np.zeros(0, dtype=np.int64) # in the order of entry into the elite set
         self.__random_number_generator = random.Random()
         self.__recent_dominator_index = -1
+        # rows 0..len(history)-1 are used, allocated on the first insertion once the number of objectives is known
+        self.__objectives = None
+        self.__evaluation_counts = np.zeros(0, dtype=np.int64)
+        # index of the solution guarding each solution, -1 for elite solutions
+        self.__guards = np.zeros(0, dtype=np.int64)
+        # (evaluations, entry, index) of the elite set members, where entry numbers the entries into the elite set, so that
+        # ties go to the first member of the elite set. Entries of solutions that have since left the elite set (or
+        # entered it again) are only dropped when they reach the top (lazy invalidation)
+        self.__uncertainty_heap = []
+        self.__elite_entry = np.zeros(0, dtype=np.int64) # entry of each solution's current (or last) membership
+        self.__number_of_elite_entries = 0
+        self.__elite_evaluations = 0 # evaluations summed over the elite set
 
     def self_guarding_check(self) -> bool:
         """Correctness check method, should always return True as a solution should never act as a guard to itself"""
@@ -333,131 +370,325 @@ class UncertainObjectivesArchiver:
                 return False
         return True
 
+    def __append(self, s: UncertainSol) -> int:
+        """Appends the solution to the history and its estimated objective vector to the objective matrix, returns its index"""
+        index = len(self.__history)
+        self.__history.append(s)
+        if self.__objectives is None:
+            self.__objectives = np.empty((self.INITIAL_CAPACITY, s.get_number_of_objectives()))
+            self.__evaluation_counts = np.zeros(self.INITIAL_CAPACITY, dtype=np.int64)
+            self.__guards = np.full(self.INITIAL_CAPACITY, -1, dtype=np.int64)
+            self.__elite_entry = np.full(self.INITIAL_CAPACITY, -1, dtype=np.int64)
+        elif index == len(self.__objectives): # full, so double the capacity
+            self.__objectives = np.concatenate([self.__objectives, np.empty_like(self.__objectives)])
+            self.__evaluation_counts = np.concatenate([self.__evaluation_counts, np.zeros_like(self.__evaluation_counts)])
+            self.__guards = np.concatenate([self.__guards, np.full_like(self.__guards, -1)])
+            self.__elite_entry = np.concatenate([self.__elite_entry, np.full_like(self.__elite_entry, -1)])
+        self.__objectives[index] = s.get_estimated_objective_vector()
+        self.__evaluation_counts[index] = s.get_number_of_repeated_evaluations()
+        return index
+
+    def __guard(self, guard: int, index: int) -> None:
+        """Appends index to the solutions guarded by guard"""
+        self.__history[guard].append_to_guarded_list(index)
+        self.__guards[index] = guard
+
+    def __set_guarded(self, guard: int, to_guard: List[int]) -> None:
+        """Replaces the solutions guarded by guard"""
+        self.__history[guard].set_guarded_indices(to_guard)
+        self.__guards[to_guard] = guard
+
+    def __first_dominators(self, indices: np.ndarray, vectors: np.ndarray, strictly: bool = True) -> np.ndarray:
+        """
+        Returns for each objective vector (row of vectors) the position in indices of the first solution dominating it
+        (weakly dominating it if strictly is False), -1 if none does. The solutions are compared in chunks of growing size,
+        and only with the vectors still without a dominator, as the first dominator is usually found early in the list
+        """
+        first = np.full(len(vectors), -1, dtype=np.int64)
+        if not len(indices) or not len(vectors):
+            return first
+        unresolved = np.arange(len(vectors))
+        start, chunk = 0, 64
+        while start < len(indices) and unresolved.size:
+            objectives = self.__objectives[indices[start:start + chunk]][np.newaxis, :, :]
+            remaining = vectors[unresolved][:, np.newaxis, :]
+            dominates = (objectives <= remaining).all(axis=2) # (unresolved, chunk) dominance
+            if strictly:
+                dominates &= (objectives < remaining).any(axis=2)
+            found = dominates.any(axis=1)
+            first[unresolved[found]] = start + np.argmax(dominates[found], axis=1)
+            unresolved = unresolved[~found]
+            start, chunk = start + chunk, 2 * chunk
+        return first
+
+    def __first_weak_dominator(self, indices: np.ndarray, vector: np.ndarray) -> int:
+        """Returns the position in indices of the first solution weakly dominating the objective vector, -1 if none does"""
+        if not len(indices):
+            return -1
+        hits = (self.__objectives[indices] <= vector).all(axis=1)
+        position = int(hits.argmax())
+        return position if hits[position] else -1
+
+    def __first_dominator(self, indices: np.ndarray, vector: np.ndarray) -> int:
+        """Returns the position in indices of the first solution dominating the objective vector, -1 if none does"""
+        if not len(indices):
+            return -1
+        objectives = self.__objectives[indices]
+        hits = (objectives <= vector).all(axis=1) & (objectives < vector).any(axis=1)
+        position = int(hits.argmax())
+        return position if hits[position] else -1
+
     def weakly_dominates(self, s: UncertainSol) -> bool:
         """Returns true if the argument solution is dominated by the elite set basedon their objective vector approximations, otherwise returns False"""
-        for i in self.__elite_indices:
-            if self.__history[i].weakly_dominates(s):
-                self.__recent_dominator_index = i
-                return True
+        return self.__weakly_dominates_vector(np.asarray(s.get_estimated_objective_vector()))
+
+    def __weakly_dominates_vector(self, vector: np.ndarray) -> bool:
+        """Returns true if the objective vector is weakly dominated by the elite set, whose first such member becomes the recent dominator"""
+        position = self.__first_weak_dominator(self.__elite_indices, vector)
+        if position >= 0:
+            self.__recent_dominator_index = int(self.__elite_indices[position])
+            return True
         return False
 
-    def __remove_dominated(self, s: UncertainSol) -> List[int]:
-        """ Removes and returns the sublist of indices from the elite set which relate to solutions dominated by the solution argument"""
-        to_be_guarded = []
-        for i in range(len(self.__elite_indices) - 1, -1, -1):
-            if s.dominates(self.__history[self.__elite_indices[i]]):
-                to_be_guarded.append(self.__elite_indices.pop(i))
+    def __remove_dominated(self, vector: np.ndarray) -> List[int]:
+        """ Removes and returns the sublist of indices from the elite set which relate to solutions dominated by the objective vector"""
+        objectives = self.__objectives[self.__elite_indices]
+        dominated = (vector <= objectives).all(axis=1) & (vector < objectives).any(axis=1)
+        to_be_guarded = self.__elite_indices[dominated][::-1].tolist() # in the order the elite set used to be scanned, from its end
+        self.__elite_evaluations -= int(self.__evaluation_counts[to_be_guarded].sum())
+        self.__elite_indices = self.__elite_indices[~dominated]
         return to_be_guarded
 
+    def __enter_elite(self, index: int) -> None:
+        """Appends index to the elite set"""
+        self.__elite_indices = np.append(self.__elite_indices, index)
+        self.__push_elite(index)
+
+    def __push_elite(self, index: int) -> None:
+        """Records the entry of index into the elite set and pushes it on the heap of the elite set members"""
+        self.__guards[index] = -1
+        self.__elite_entry[index] = self.__number_of_elite_entries
+        self.__elite_evaluations += int(self.__evaluation_counts[index])
+        heapq.heappush(self.__uncertainty_heap, (int(self.__evaluation_counts[index]), self.__number_of_elite_entries, index))
+        self.__number_of_elite_entries += 1
+        if len(self.__uncertainty_heap) > 2 * len(self.__elite_indices) + 64: # mostly outdated entries, so rebuild
+            elite = self.__elite_indices
+            self.__uncertainty_heap = list(zip(self.__evaluation_counts[elite].tolist(), self.__elite_entry[elite].tolist(), elite.tolist()))
+            heapq.heapify(self.__uncertainty_heap)
+
+    def __is_current(self, entry: tuple) -> bool:
+        """Returns True if the heap entry is that of a current elite set member (the evaluations of a member do not change
+        while it is in the elite set, as update_solution takes it out first)"""
+        _, number, index = entry
+        return self.__guards[index] == -1 and self.__elite_entry[index] == number
+
+    def __most_uncertain_entry(self) -> tuple:
+        """Returns the heap entry of the elite set member with the fewest evaluations, first dropping any outdated entries above it"""
+        while not self.__is_current(self.__uncertainty_heap[0]):
+            heapq.heappop(self.__uncertainty_heap)
+        return self.__uncertainty_heap[0]
+
+    def __place(self, index: int) -> None:
+        """Places the appended solution at index in the elite set or under the guard of a solution dominating it"""
+        vector = self.__objectives[index]
+        # first check not weakly dominated, if so, need to put into guarded state
+        if self.__weakly_dominates_vector(vector):
+            # a solution guarded by the elite set dominator that also dominates the new solution is set as the guarding dominator,
+            # otherwise the new solution is guarded by the elite set dominator
+            guarded = np.asarray(self.__history[self.__recent_dominator_index].get_guarded_indices(), dtype=np.int64)
+            position = self.__first_dominator(guarded, vector) if guarded.size else -1
+            self.__guard(int(guarded[position]) if position >= 0 else self.__recent_dominator_index, index)
+        else: # not dominated, so need to add to elite set and update its contents
+            to_be_guarded = self.__remove_dominated(vector)
+            self.__set_guarded(index, to_be_guarded) # update guarded list with any dominated members removed from elite set
+            self.__enter_elite(index) # put in elite set tracking list
+
+    def __check_objective_vectors(self, objective_vectors: List[List[float]]) -> None:
+        """Raises a ValueError if the objective vectors do not all have the number of objectives of the archive, so that
+        an operation that would fail is rejected before it is logged"""
+        lengths = {len(vector) for vector in objective_vectors}
+        if self.__objectives is not None:
+            lengths.add(self.__objectives.shape[1])
+        if len(lengths) > 1:
+            raise ValueError(f"Objective vectors of lengths {sorted(lengths)}, expected a single number of objectives")
+
+    def __check_index(self, index: int) -> None:
+        """Raises an IndexError if no solution is stored at the index, before the operation is logged"""
+        if not 0 <= index < len(self.__history):
+            raise IndexError(f"No solution at index {index}, the archive holds {len(self.__history)} solutions")
+
     def insert_new_solution(self, objective_vector: List[float], decision_vector: List[float]) -> int:
         """
         Creates and adds the solution represented by the decision vector and single objective vector argument. Places
         in the history tracked by the archive and updates the elite set membership if necessary. Returns the index
         at which the solution is stored -- this location will remain unchanged across the lifetime of this UncertainObjectivesArchiver
         """
-        s = MeanPerformanceSol(objective_vector, decision_vector)
-        inserted_index = len(self.__history)
-        self.__history.append(s) #// new solution is now at index len(history)-1
-
-        # first check not weakly dominated, if so, need to put into guarded state
-        if self.weakly_dominates(s):
-            is_guarded = False
-            # add to guarded list
-            for index in self.__history[self.__recent_dominator_index].guarded_indices:
-                if self.__history[index].dominates(s):
-                    # solution that is guarded by the elite set dominator also dominates the new 
-                    # solution, so set as the guarding dominator
-                    self.__history[index].append_to_guarded_list(len(self.__history) - 1)
-                    is_guarded = True # track that it has been added to the guarded list of a solution
-                    break
-            # if no solution immediately guarded by the dominating member of the elite set
-            # dominates the new solution, so assign as guarded by the elite set dominator
-            if not is_guarded:
-                self.__history[self.__recent_dominator_index].guarded_indices.append(len(self.__history) - 1)
-        else: # not dominated, so need to add to elite set and update its contents
-            to_be_guarded = self.__remove_dominated(s)
-            # add removed to guarded list
-            s.guarded_indices = to_be_guarded # update guarded list with any dominated members removed from elite set
-            self.__elite_indices.append(inserted_index) # put in elite set tracking list
+        self.__check_objective_vectors([objective_vector])
+        if self.__persistence is not None:
+            self.__persistence.record_insert(objective_vector, decision_vector)
+        inserted_index = self.__append(MeanPerformanceSol(objective_vector, decision_vector))
+        self.__place(inserted_index)
+        if self.__persistence is not None:
+            self.__persistence.completed(self)
         return inserted_index
 
+    def insert_many(self, objective_vectors: List[List[float]], decision_vectors: List[List[float]]) -> List[int]:
+        """
+        Inserts a batch of solutions (e.g. a generation), as insert_new_solution would one by one, and returns their indices,
+        in the order of the arguments. The solutions weakly dominated by the current elite set are filtered out in one
+        vectorised comparison and guarded straight away; the others are placed in increasing order of the sum of their
+        objectives, so that no solution of the batch is placed before a solution of the batch dominating it
+        """
+        if len(objective_vectors) != len(decision_vectors):
+            raise ValueError(f"{len(objective_vectors)} objective vectors for {len(decision_vectors)} decision vectors")
+        self.__check_objective_vectors(objective_vectors)
+        if self.__persistence is not None:
+            self.__persistence.record_insert_many(objective_vectors, decision_vectors)
+        indices = self.__insert_batch(objective_vectors, decision_vectors)
+        if self.__persistence is not None:
+            self.__persistence.completed(self)
+        return indices
+
+    def __insert_batch(self, objective_vectors: List[List[float]], decision_vectors: List[List[float]]) -> List[int]:
+        """Inserts the batch of solutions, see insert_many"""
+        indices = [self.__append(MeanPerformanceSol(o, d)) for o, d in zip(objective_vectors, decision_vectors)]
+        if not indices:
+            return indices
+        batch = np.asarray(indices, dtype=np.int64)
+        vectors = self.__objectives[batch]
+        elite = self.__elite_indices
+        # first elite set member weakly dominating every new solution, if any
+        elite_dominator = self.__first_dominators(elite, vectors, strictly=False)
+        dominated = np.flatnonzero(elite_dominator >= 0)
+        elite_dominators = elite[elite_dominator[dominated]]
+        for dominator in np.unique(elite_dominators):
+            # as in __place, guarded by the first solution guarded by their elite set dominator that dominates them, if any
+            members = dominated[elite_dominators == dominator]
+            guarded = np.asarray(self.__history[dominator].get_guarded_indices(), dtype=np.int64)
+            first = self.__first_dominators(guarded, vectors[members])
+            guards = np.where(first >= 0, guarded[np.maximum(first, 0)] if guarded.size else dominator, dominator)
+            for position, guard in zip(members, guards):
+                self.__guard(int(guard), indices[position])
+        remaining = np.flatnonzero(elite_dominator < 0)
+        for position in remaining[np.argsort(vectors[remaining].sum(axis=1), kind="stable")]:
+            self.__place(indices[position])
+        return indices
+
     def update_solution(self, index: int, reevaluation: List[float]) -> None:
         """
         Updates the solution stored at the index with an additional objective vector reevaluation. Maintains correctness of
         the elite set given this change.
         """
+        self.__check_index(index)
+        self.__check_objective_vectors([reevaluation])
+        if self.__persistence is not None:
+            self.__persistence.record_update(index, reevaluation)
+        self.__update(index, reevaluation)
+        if self.__persistence is not None:
+            self.__persistence.completed(self)
+
+    def __update(self, index: int, reevaluation: List[float]) -> None:
+        """Updates the solution stored at the index with the reevaluation, see update_solution"""
         updated_solution = self.__history[index]
         updated_solution.add_new_evaluation(reevaluation) # add reevaluation, which will update expected performance
-        self.__elite_indices.remove(index) # index is removed from the elite list if in it, as may now be dominated
+        self.__objectives[index] = updated_solution.get_estimated_objective_vector()
+        self.__evaluation_counts[index] += 1
+        updated_vector = self.__objectives[index]
+
+        former_guard = int(self.__guards[index])
+        if former_guard < 0:
+            self.__elite_indices = self.__elite_indices[self.__elite_indices != index] # index is removed from the elite list, as may now be dominated
+            self.__elite_evaluations -= int(self.__evaluation_counts[index]) - 1 # counted before this reevaluation
+        else:
+            # guarded solution (e.g. an elite displaced by an earlier update or insertion), so detach it from its guard
+            self.__history[former_guard].get_guarded_indices().remove(index)
 
         # get set of guarded and reset to empty the guarded for the (previously) elite member
         guarded = updated_solution.get_guarded_indices() # get a copy of the guarded solutions
         updated_solution.set_guarded_indices([]) # redirect to an empty list
+        guarded_array = np.asarray(guarded, dtype=np.int64)
 
-        if not self.weakly_dominates(updated_solution): # elite set does not dominate updated solution
-            dominated = False
-            dominator = -1
+        if not self.__weakly_dominates_vector(updated_vector): # elite set does not dominate updated solution
             # even if not dominated by elite set, could be dominated by members of the guarded set, due to location change
-            for i in guarded: # check if any previously guarded dominate it
-                if self.__history[i].weakly_dominates(updated_solution):
-                    dominator = i
-                    dominated = True
-                    break
-            if not dominated: # not dominated by any previously guarding either, so need to (re)insert into elite set
-                to_be_guarded = self.__remove_dominated(updated_solution) # first take out any elite set members who are dominated
-                updated_solution.guarded_indices = to_be_guarded # assign to be guarded by the new elite member
-                self.__elite_indices.append(index) # (re)insert reevaluated solution into elite set 
+            dominator = self.__first_weak_dominator(guarded_array, updated_vector) if guarded else -1
+            if dominator < 0: # not dominated by any previously guarding either, so need to (re)insert into elite set
+                to_be_guarded = self.__remove_dominated(updated_vector) # first take out any elite set members who are dominated
+                self.__set_guarded(index, to_be_guarded) # assign to be guarded by the new elite member
+                self.__enter_elite(index) # (re)insert reevaluated solution into elite set 
             else:
-                self.__history[dominator].guarded_indices.append(index) # dominated by a previously guarded solution, so set it as guardian
+                self.__guard(guarded[dominator], index) # dominated by a previously guarded solution, so set it as guardian
         else:
-            self.__history[self.__recent_dominator_index].guarded_indices.append(index) # dominated by an elite solution, so guard by that
-
-        # now need to reassign the members of the previous guarded solution set for the solution before it was updated
-        for c in guarded:
-            guarded_solution = self.__history[c]
-            not_assigned = True
-            for d in guarded:
-                if self.__history[d].dominates(guarded_solution):
-                    self.__history[d].append_to_guarded_list(c)
-                    not_assigned = False
-                    break
-            if not_assigned: # if a guard not identifed from the other members of the previous guarded set, look at previous dominator
-                if updated_solution.weakly_dominates(guarded_solution):
-                    updated_solution.guarded_indices.append(c)
-                    not_assigned = False
-            if not_assigned: # previous dominator no longer dominates, so look at rest of updated elite set
-                # possibly could make quicker by ensuring e != element, but as the elite set grows the 
-                # time spent checking for each element of elite set is likely to outweight the single extra 
-                # weakdominates check saving it causes.
-                for e in self.__elite_indices:  
-                    if self.__history[e].weakly_dominates(guarded_solution):
-                        self.__history[e].guarded_indices.append(c)
-                        not_assigned = False
-                        break
-            if not_assigned: # not dominated due to moving of orginal guard which must have been only dominator, so add to elite set
-                self.__elite_indices.append(c)
+            self.__guard(self.__recent_dominator_index, index) # dominated by an elite solution, so guard by that
+
+        if not guarded:
+            return
+        # now need to reassign the members of the previous guarded solution set for the solution before it was updated:
+        # first to the first member of that set dominating them, then to the updated solution, then to its former guard,
+        # which weakly dominated it before its update and so everything it guarded, then to the rest of the elite set
+        objectives = self.__objectives[guarded_array]
+        # a single member has no other member to be dominated by
+        first_dominator = self.__first_dominators(guarded_array, objectives) if len(guarded) > 1 else np.array([-1])
+        dominated_by_updated = (updated_vector <= objectives).all(axis=1)
+        elite = self.__elite_indices
+        elite_dominator = np.full(len(guarded), -1, dtype=np.int64)
+        if former_guard < 0 and not dominated_by_updated.all():
+            # for the members the previous dominator no longer dominates, the first dominator in the rest of the elite set
+            unassigned = np.flatnonzero((first_dominator < 0) & ~dominated_by_updated)
+            first = self.__first_dominators(elite, objectives[unassigned], strictly=False)
+            elite_dominator[unassigned[first >= 0]] = elite[first[first >= 0]]
+        new_elite = [] # members entering the elite set below, which come after the rest of the elite set
+
+        for position, c in enumerate(guarded):
+            if first_dominator[position] >= 0:
+                self.__guard(guarded[first_dominator[position]], c)
+            elif dominated_by_updated[position]:
+                self.__guard(index, c)
+            elif former_guard >= 0:
+                self.__guard(former_guard, c)
+            elif elite_dominator[position] >= 0: # previous dominator no longer dominates, so look at rest of updated elite set
+                self.__guard(int(elite_dominator[position]), c)
+            else:
+                dominator = self.__first_weak_dominator(np.asarray(new_elite, dtype=np.int64), objectives[position]) if new_elite else -1
+                if dominator >= 0:
+                    self.__guard(new_elite[dominator], c)
+                else: # not dominated due to moving of orginal guard which must have been only dominator, so add to elite set
+                    self.__guards[c] = -1
+                    new_elite.append(c)
+        if new_elite:
+            self.__elite_indices = np.append(self.__elite_indices, new_elite)
+            for c in new_elite:
+                self.__push_elite(c)
+
+    def update_many(self, indices: List[int], reevaluations: List[List[float]]) -> None:
+        """Updates the solutions stored at the indices with one reevaluation each (e.g. the reevaluations of a generation), in order"""
+        for index, reevaluation in zip(indices, reevaluations):
+            self.update_solution(index, reevaluation)
 
     def get_index_of_random_elite(self) -> int:
         """Return the index of an elite solution at random"""
-        return self.__elite_indices[self.__random_number_generator.randint(0, len(self.__elite_indices) - 1)]
+        if not len(self.__elite_indices):
+            raise ValueError("The elite set is empty")
+        if self.__persistence is not None: # the draw advances the random number generator, so it is logged too
+            self.__persistence.record_random_elite()
+        return int(self.__elite_indices[self.__random_number_generator.randint(0, len(self.__elite_indices) - 1)])
 
     def get_index_of_most_uncertain_elite(self) -> int:
         """Returns the index of the elite solution with the fewest reevaluations"""
-
-        # can speed up by using an additional sorted data structure on the size such as a red black tree 
-        # and change from O(n) to O(log n)
-        index = self.__elite_indices[0]
-        size = len(self.__history[self.__elite_indices[0]].get_repeated_evaluations())
-        for i in range(1, len(self.__elite_indices)):
-            if len(self.__history[self.__elite_indices[i]].get_repeated_evaluations()) < size:
-                size = len(self.__history[self.__elite_indices[i]].get_repeated_evaluations())
-                index = self.__elite_indices[i]
-        return index
+        return self.__most_uncertain_entry()[2] # first of the elite set among ties
+
+    def get_indices_of_most_uncertain_elites(self, number: int) -> List[int]:
+        """Returns the indices of the number elite solutions with the fewest reevaluations, fewest first (the first is get_index_of_most_uncertain_elite)"""
+        entries = []
+        while len(entries) < min(number, len(self.__elite_indices)): # ties keep the elite order
+            entries.append(self.__most_uncertain_entry())
+            heapq.heappop(self.__uncertainty_heap)
+        for entry in entries:
+            heapq.heappush(self.__uncertainty_heap, entry)
+        return [index for _, _, index in entries]
 
     def get_average_number_of_resamples_in_elite(self) -> float:
         """Returns the averages number of reevaluations across all elite set members"""
-        total = sum(len(self.__history[i].get_repeated_evaluations()) for i in self.__elite_indices)
-        return total / len(self.__elite_indices)
+        return self.__elite_evaluations / len(self.__elite_indices)
 
     def get_decision_vector_at_index(self, index: int) -> List[float]:
         """Returns the decision vector of the solution stored at the corresponding index"""
@@ -467,6 +698,12 @@ class UncertainObjectivesArchiver:
         """Returns the estimated objective vector of the solution stored at the corresponding index (based on the set of reevaluated stored for the solution)"""
         return self.__history[index].get_estimated_objective_vector()
 
+    def get_estimated_objective_matrix(self) -> np.ndarray:
+        """Returns a copy of the estimated objective vectors of every stored solution, one row per index"""
+        if self.__objectives is None:
+            return np.empty((0, 0))
+        return self.__objectives[:len(self.__history)].copy()
+
     def get_repeated_evaluations_at_index(self, index: int) -> List[List[float]]:
         """Returns the repeated_evaluations (objective vectors) of the solution stored at the corresponding index"""
         return self.__history[index].get_repeated_evaluations()
@@ -474,6 +711,10 @@ class UncertainObjectivesArchiver:
 
     def get_index_of_random_solution(self) -> int:
         """Returns the index of a random stored solution"""
+        if not self.__history:
+            raise ValueError("The archive is empty")
+        if self.__persistence is not None:
+            self.__persistence.record_random_solution()
         return self.__random_number_generator.randint(0, len(self.__history) - 1)
 
     def get_number_of_elite(self) -> int:
@@ -482,15 +723,7 @@ class UncertainObjectivesArchiver:
 
     def get_number_of_reevaluations_of_most_uncertain_elite(self) -> int:
         """Returns the number of revaluations of the elite solution with the fewest reevaluations"""
-
-        # can speed up by using an additional sorted data structure on the size such as a red black tree 
-        # and change from O(n) to O(log n)
-        index = self.__elite_indices[0]
-        size = len(self.__history[self.__elite_indices[0]].get_repeated_evaluations())
-        for i in range(1, len(self.__elite_indices)):
-            if len(self.__history[self.__elite_indices[i]].get_repeated_evaluations()) < size:
-                size = len(self.__history[self.__elite_indices[i]].get_repeated_evaluations())
-        return size
+        return self.__most_uncertain_entry()[0]
 
     def get_elite_solutions(self) -> List[UncertainSol]:
         out = []
@@ -499,6 +732,68 @@ class UncertainObjectivesArchiver:
         return out   
     
 
+    def set_persistence(self, persistence) -> None:
+        """
+        Logs the operations from now on to the persistence (archive_persistence.ArchivePersistence), None to stop logging:
+        every insertion, update and random draw is checked, then written to its operation log before it is applied, and the whole
+        archive is snapshotted periodically. Use archive_persistence.restore_archiver to create, reload or resume a logged archive
+        """
+        self.__persistence = persistence
+
+    def get_state(self) -> dict:
+        """
+        Returns the full state of the archive as a dictionary of numpy arrays: the solutions (estimated objective vectors,
+        repeated evaluations, decision vectors and guarded lists, flattened with their lengths), the elite set in its
+        order, the elite set entries and the state of the random number generator. from_state rebuilds the same archive
+        """
+        version, internal_state, gauss_next = self.__random_number_generator.getstate()
+        history = self.__history
+        return {
+            "objectives": np.array([s.get_estimated_objective_vector() for s in history], dtype=np.float64),
+            "evaluations": np.array([e for s in history for e in s.get_repeated_evaluations()], dtype=np.float64),
+            "evaluation_lengths": np.array([s.get_number_of_repeated_evaluations() for s in history], dtype=np.int64),
+            "decision_vectors": np.array([x for s in history for x in s.get_decision_vector()], dtype=np.float64),
+            "decision_lengths": np.array([len(s.get_decision_vector()) for s in history], dtype=np.int64),
+            "guarded": np.array([i for s in history for i in s.get_guarded_indices()], dtype=np.int64),
+            "guarded_lengths": np.array([len(s.get_guarded_indices()) for s in history], dtype=np.int64),
+            "elite": self.__elite_indices.copy(),
+            "elite_entry": self.__elite_entry[:len(history)].copy(),
+            "number_of_elite_entries": np.int64(self.__number_of_elite_entries),
+            "recent_dominator_index": np.int64(self.__recent_dominator_index),
+            "random_version": np.int64(version),
+            "random_state": np.array(internal_state, dtype=np.int64),
+            "random_gauss_next": np.float64(np.nan if gauss_next is None else gauss_next),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "UncertainObjectivesArchiver":
+        """Returns the archive whose state (see get_state) is passed"""
+        archive = cls()
+        if len(state["evaluation_lengths"]):
+            evaluations = np.split(state["evaluations"], np.cumsum(state["evaluation_lengths"])[:-1])
+            decision_vectors = np.split(state["decision_vectors"], np.cumsum(state["decision_lengths"])[:-1])
+            guarded = np.split(state["guarded"], np.cumsum(state["guarded_lengths"])[:-1])
+            for objectives, solution_evaluations, decision_vector in zip(state["objectives"], evaluations, decision_vectors):
+                s = MeanPerformanceSol(objectives.tolist(), decision_vector.tolist())
+                s.set_repeated_evaluations(solution_evaluations.tolist())
+                archive.__append(s)
+            for index, to_guard in enumerate(guarded):
+                archive.__set_guarded(index, to_guard.tolist())
+            archive.__elite_entry[:len(archive.__history)] = state["elite_entry"]
+        archive.__elite_indices = state["elite"].astype(np.int64)
+        archive.__guards[archive.__elite_indices] = -1
+        archive.__number_of_elite_entries = int(state["number_of_elite_entries"])
+        archive.__recent_dominator_index = int(state["recent_dominator_index"])
+        elite = archive.__elite_indices
+        archive.__elite_evaluations = int(archive.__evaluation_counts[elite].sum())
+        archive.__uncertainty_heap = list(zip(archive.__evaluation_counts[elite].tolist(), archive.__elite_entry[elite].tolist(), elite.tolist()))
+        heapq.heapify(archive.__uncertainty_heap)
+        gauss_next = float(state["random_gauss_next"])
+        archive.__random_number_generator.setstate(
+            (int(state["random_version"]), tuple(state["random_state"].tolist()), None if np.isnan(gauss_next) else gauss_next)
+        )
+        return archive
+
     # writen by Gonçalo
     def get_archive_history(self) -> List[dict]:
         """Returns the full history of solutions stored in the archive as a list of dictionaries containing decision vectors and objective vectors."""
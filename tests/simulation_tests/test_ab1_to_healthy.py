@@ -29,6 +29,8 @@ from unittest.mock import MagicMock
 
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 from simulation_package.ab1_to_healthy import Ab1ToHealthy
+from simulation_package.state_index import StateIndex
+from simulation_package.states import STATE_DTYPE
 
 
 ######################### Fixtures -> arrange steps and data #######################################
@@ -103,6 +105,7 @@ def test_determine_healthy(single_to_healthy, mock_ab1_population, mock_event):
 
     single_to_healthy.completed_cycles = 2
     single_to_healthy.ab1_population_view = mock_ab1_population
+    single_to_healthy.state_index = StateIndex.from_states(mock_ab1_population.get(mock_event.index)["state"])
 
     # mock Ab1_rate -> everyone given a transition prob of 1
     mock_ab1_to_healthy_rate = MagicMock()
@@ -128,8 +131,8 @@ def test_determine_healthy(single_to_healthy, mock_ab1_population, mock_event):
 
     # ------------------ Assert --------------------------- Then
     # with all individuls with 1 transition prob all of them should transition ot healthy
-    expected_ab1_series = pd.Series("healthy", index=mock_event.index, name="state")
-    actual_ab1_series = mock_population_view.update.call_args_list[0][0][0]
+    expected_ab1_series = pd.Series("healthy", index=mock_event.index, name="state", dtype=STATE_DTYPE)
+    actual_ab1_series = mock_population_view.update.call_args_list[0][0][0]["state"]
     # assertion
     assert actual_ab1_series.equals(
         expected_ab1_series
@@ -0,0 +1,62 @@
+"""This module tests the optimisation loop that archives evaluations and re-evaluates the most uncertain elites"""
+
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from pymoo.algorithms.moo.nsga2 import NSGA2
+from pymoo.core.problem import ElementwiseProblem
+from simulation_package.archive_driver import ArchiveDriver
+
+
+class RecordingRunner:
+    """Elementwise runner recording the candidates dispatched in every call, as a worker pool would receive them"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, f, X):
+        self.calls.append(len(X))
+        return [f(x) for x in X]
+
+
+class NoisyTwoObjectives(ElementwiseProblem):
+    def __init__(self, **kwargs):
+        super().__init__(n_var=10, n_obj=2, xl=np.zeros(10), xu=np.ones(10), **kwargs)
+
+    def _evaluate(self, x, out, *args, **kwargs):
+        out["F"] = np.array([x.mean(), 1 - np.sqrt(x.mean())]) + np.random.normal(0, 0.05, 2)
+
+
+def test_reevaluations_share_the_runner_calls_of_the_offspring():
+    np.random.seed(0)
+    runner = RecordingRunner()
+    driver = ArchiveDriver(NoisyTwoObjectives(elementwise_runner=runner), NSGA2(pop_size=20), reevaluation_share=0.2)
+
+    archiver = driver.run(n_gen=5, seed=1)
+
+    # no elite to re-evaluate in the first generation, then 5 re-evaluations next to the 20 offspring
+    assert driver.evaluations == [(20, 0)] + [(20, 5)] * 4
+    assert runner.calls == [20] + [25] * 4
+    assert driver.algorithm.evaluator.n_eval == 120
+    # every offspring is archived, the re-evaluations go to existing solutions
+    assert archiver.get_archive_history()[-1] is not None and len(archiver.get_archive_history()) == 100
+    assert archiver.get_average_number_of_resamples_in_elite() > 1
+
+
+def test_elite_front_and_population_use_the_archived_means():
+    np.random.seed(0)
+    driver = ArchiveDriver(NoisyTwoObjectives(), NSGA2(pop_size=20), reevaluation_share=0.3)
+    driver.run(n_gen=8, seed=1)
+
+    X, F = driver.elite_front()
+    assert len(X) == len(F) == driver.archiver.get_number_of_elite()
+    for individual in driver.algorithm.pop:
+        index = individual.get("archive_index")
+        np.testing.assert_array_equal(individual.F, driver.archiver.get_estimated_objective_vector_at_index(index))
+
+    with pytest.raises(ValueError):
+        ArchiveDriver(NoisyTwoObjectives(), NSGA2(pop_size=20), reevaluation_share=1)
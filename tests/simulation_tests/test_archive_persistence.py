@@ -0,0 +1,88 @@
+"""This module tests that a logged UncertainObjectivesArchiver is rebuilt exactly from its snapshot and operation log"""
+
+import random
+import shutil
+
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.archive_persistence import LOG_NAME, SNAPSHOT_NAME, restore_archiver
+from simulation_package.uncertain_archiver import UncertainObjectivesArchiver
+
+
+def assert_same_state(archive, other):
+    state, other_state = archive.get_state(), other.get_state()
+    assert state.keys() == other_state.keys()
+    for name in state:
+        assert np.array_equal(state[name], other_state[name], equal_nan=True), name
+
+
+def run_operations(archive, rng, n):
+    for _ in range(n):
+        choice = rng.random()
+        if archive.get_number_of_elite() and choice < 0.4:
+            index = archive.get_index_of_most_uncertain_elite()
+            archive.update_solution(index, [rng.random() for _ in range(3)])
+        elif choice < 0.5:
+            archive.insert_many([[round(rng.random(), 1) for _ in range(3)] for _ in range(5)], [[rng.random()] for _ in range(5)])
+        elif archive.get_number_of_elite() and choice < 0.6:
+            archive.get_index_of_random_elite()
+        else:
+            archive.insert_new_solution([rng.random() for _ in range(3)], [rng.random()])
+
+
+def test_restore_after_a_crash(tmp_path):
+    rng = random.Random(0)
+    archive = restore_archiver(tmp_path / "archive", snapshot_every=50, fsync=False)
+    run_operations(archive, rng, 130)
+
+    # copy of the directory as a crash would leave it: a snapshot, the log tail and a record cut short
+    crashed = tmp_path / "crashed"
+    shutil.copytree(tmp_path / "archive", crashed)
+    assert (crashed / SNAPSHOT_NAME).exists() and (crashed / LOG_NAME).stat().st_size > 0
+    with open(crashed / LOG_NAME, "ab") as file:
+        file.write(b"\x83\x00\x00\x00\x00")
+
+    restored = restore_archiver(crashed, snapshot_every=50, fsync=False)
+    assert_same_state(restored, archive)
+    assert restored.sanity_check() and restored.self_guarding_check()
+
+    # both carry on identically, random draws included, and the restored one keeps logging
+    run_operations(archive, random.Random(1), 60)
+    run_operations(restored, random.Random(1), 60)
+    assert_same_state(restored, archive)
+    assert_same_state(restore_archiver(crashed, snapshot_every=50, fsync=False), archive)
+
+
+def test_failed_operations_are_not_replayed(tmp_path):
+    archive = restore_archiver(tmp_path / "archive", fsync=False)
+    archive.insert_new_solution([0.5, 0.5, 0.5], [0.1])
+    with pytest.raises(IndexError):
+        archive.update_solution(5, [0.1, 0.2, 0.3])
+    with pytest.raises(ValueError):
+        archive.insert_many([[0.1, 0.2]], [[0.3]])
+    archive.insert_many([], [])
+    assert_same_state(restore_archiver(tmp_path / "archive", fsync=False), archive)
+
+    # a log written before operations were checked holds the record of the update that failed, which is skipped
+    archive._UncertainObjectivesArchiver__persistence.record_update(5, [0.1, 0.2, 0.3])
+    archive.update_solution(0, [0.3, 0.3, 0.3])
+    with pytest.warns(UserWarning, match="operation 2 failed"):
+        restored = restore_archiver(tmp_path / "archive", fsync=False)
+    assert_same_state(restored, archive)
+
+
+def test_state_round_trip():
+    rng = random.Random(2)
+    archive = UncertainObjectivesArchiver()
+    run_operations(archive, rng, 200)
+
+    restored = UncertainObjectivesArchiver.from_state(archive.get_state())
+    assert_same_state(restored, archive)
+    assert restored.get_indices_of_most_uncertain_elites(5) == archive.get_indices_of_most_uncertain_elites(5)
+    assert restored.get_average_number_of_resamples_in_elite() == archive.get_average_number_of_resamples_in_elite()
+    assert restored.get_index_of_random_elite() == archive.get_index_of_random_elite()
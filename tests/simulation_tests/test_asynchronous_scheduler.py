@@ -0,0 +1,81 @@
+"""This module tests the steady-state evaluation of candidates and re-evaluations on a worker pool"""
+
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+
+from pymoo.algorithms.moo.nsga2 import NSGA2
+from pymoo.core.problem import ElementwiseProblem
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.asynchronous_scheduler import AsynchronousScheduler
+
+
+class SlowNoisyProblem(ElementwiseProblem):
+    """Noisy two-objective problem whose evaluations take a random time, simulated with the seeds it is given"""
+
+    def __init__(self, fail=False, **kwargs):
+        super().__init__(n_var=6, n_obj=2, xl=np.zeros(6), xu=np.ones(6), **kwargs)
+        self.n_replications = 1
+        self.seed_set = None
+        self.fail = fail
+
+    def _evaluate(self, x, out, *args, **kwargs):
+        if self.fail:
+            raise RuntimeError("simulation failed")
+        rng = np.random.default_rng(self.seed_set[0])
+        time.sleep(rng.uniform(0.005, 0.05))
+        out["F"] = np.array([x.mean(), 1 - np.sqrt(x.mean())]) + rng.normal(0, 0.05, 2)
+        out["seeds"] = np.array(self.seed_set)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        yield pool
+
+
+def test_steady_state(pool):
+    scheduler = AsynchronousScheduler(SlowNoisyProblem(), NSGA2(pop_size=12), pool, n_workers=4)
+    results = scheduler.run(n_evals=120, seed=1)
+
+    # one tell for the initial population, then one per candidate (n_gen is the number of the next iteration)
+    assert scheduler.algorithm.evaluator.n_eval == 120 and scheduler.algorithm.n_gen - 1 == 1 + 120 - 12
+    assert len(scheduler.algorithm.pop) == 12 and len(results.F)
+    # every candidate was simulated with seeds of its own
+    seeds = [individual.get("seeds")[0] for individual in scheduler.algorithm.pop]
+    assert len(set(seeds)) == len(seeds)
+
+    metrics = scheduler.metrics()
+    assert metrics["evaluations"] == 120 and metrics["reevaluations"] == 0
+    assert len(metrics["worker_utilisation"]) <= 4
+    assert 0.5 < metrics["utilisation"] <= 1
+    assert metrics["idle_time"] == pytest.approx(4 * metrics["wall_time"] - metrics["busy_time"])
+
+
+def test_reevaluations(pool):
+    scheduler = AsynchronousScheduler(SlowNoisyProblem(), NSGA2(pop_size=12), pool, n_workers=4, reevaluation_share=0.25)
+    scheduler.run(n_evals=120, seed=2)
+
+    metrics = scheduler.metrics()
+    assert metrics["evaluations"] + metrics["reevaluations"] == 120
+    assert metrics["reevaluations"] == pytest.approx(30, abs=2)
+    archiver = scheduler.archiver
+    assert archiver.sanity_check() and archiver.self_guarding_check()
+    assert archiver.get_average_number_of_resamples_in_elite() > 1
+    # the population competes on the archived means
+    for individual in scheduler.algorithm.pop:
+        mean = archiver.get_estimated_objective_vector_at_index(individual.get("archive_index"))
+        np.testing.assert_allclose(individual.F, mean)
+
+
+def test_worker_errors(pool):
+    with pytest.raises(RuntimeError):
+        AsynchronousScheduler(SlowNoisyProblem(fail=True), NSGA2(pop_size=4), pool, n_workers=4).run(n_evals=8)
+    with pytest.raises(ValueError):
+        AsynchronousScheduler(SlowNoisyProblem(), NSGA2(pop_size=4), pool, n_workers=4, reevaluation_share=1)
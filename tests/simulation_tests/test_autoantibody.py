@@ -22,6 +22,8 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 from simulation_package.autoantibody import AutoAntibody
+from simulation_package.state_index import StateIndex
+from simulation_package.states import STATE_DTYPE
 from vivarium.interface import InteractiveContext
 
 
@@ -82,6 +84,7 @@ def test_determine_autoantibody(autoantibody, mock_population, mock_event):
     # --- Given a state of the world where all simulants have 1 probability to transition to Ab1 and 0 prob to transition o mAb1 --- #
     # autoantibody = AutoAntibody()
     autoantibody.completed_cycles = 2
+    autoantibody.state_index = StateIndex.from_states(mock_population.get(mock_event.index)["state"])
     # mock population view
     mock_population_view = MagicMock()
     # mock_population_view.get = MagicMock(return_value=mock_population.loc[mock_index])
@@ -112,15 +115,15 @@ def test_determine_autoantibody(autoantibody, mock_population, mock_event):
 
     # # --- Then assert that the update() method of population_view is called with correct parameters --- #
     # 1) Ab1
-    expected_Ab1_series = pd.Series("Ab1", index=mock_event.index, name="state")
-    actual_Ab1_series = mock_population_view.update.call_args_list[0][0][0]
+    expected_Ab1_series = pd.Series("Ab1", index=mock_event.index, name="state", dtype=STATE_DTYPE)
+    actual_Ab1_series = mock_population_view.update.call_args_list[0][0][0]["state"]
     assert actual_Ab1_series.equals(
         expected_Ab1_series
     ), "Expected Ab1 series not passed as argument to update method()"
 
     # 2) mAb1
-    expected_mAb1_series = pd.Series([], name="state", dtype=object)
-    actual_mAb1_series = mock_population_view.update.call_args_list[1][0][0]
+    expected_mAb1_series = pd.Series([], name="state", dtype=STATE_DTYPE)
+    actual_mAb1_series = mock_population_view.update.call_args_list[1][0][0]["state"]
     assert actual_mAb1_series.equals(
         expected_mAb1_series
     ), "Expected mAb1 series not passed as argument to update method()"
@@ -135,37 +138,15 @@ def test_determine_ever_autoantibody(autoantibody, mock_event):
     mock_population_view = MagicMock()
     mock_population_view.get = MagicMock(return_value=mock_antibody_df)
     autoantibody.population_view = mock_population_view
+    autoantibody.state_index = StateIndex.from_states(mock_antibody_df["state"])
 
     # when determine_ever_autoantibody fires
     autoantibody.determine_ever_antibody(mock_event)
 
     # then I want to assert that update method is called with series len(5) ones
     expected_data = np.array([1, 1, 1, 1, 1])
-    expected_series = pd.Series(expected_data, index=[0, 2, 4, 6, 8], name="ever_antibody")
+    expected_series = pd.Series(expected_data, index=[0, 2, 4, 6, 8], name="ever_antibody", dtype=np.int8)
     actual_series = mock_population_view.update.call_args_list[0][0][0]
     assert actual_series.equals(
         expected_series
     ), "test_determine_ever_autoantibody update() method not called with correct data."
-
-
-def test_determine_time_in_state(autoantibody, mock_event):
-    mock_population_data = {
-        "state": ["Ab1", "healthy"] * 5,
-        "previous_state": ["healthy"] * 10,
-    }
-    mock_population_df = pd.DataFrame(mock_population_data)
-
-    mock_population_view = MagicMock()
-    mock_population_view.get = MagicMock(return_value=mock_population_df)
-    autoantibody.population_view = mock_population_view
-    autoantibody.determine_time_in_state(mock_event)
-
-    expected_data = {
-        "state": ["Ab1", "healthy"] * 5,
-        "previous_state": ["Ab1", "healthy"] * 5,
-        "time_in_state": [0.0, np.nan] * 5,
-    }
-
-    expected_df = pd.DataFrame(expected_data)
-    actual_df = mock_population_view.update.call_args_list[0][0][0]
-    pd.testing.assert_frame_equal(actual_df, expected_df)
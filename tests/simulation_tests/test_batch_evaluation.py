@@ -0,0 +1,62 @@
+"""This module tests the stacked batch evaluation of several screening vectors and replicates in one simulation"""
+
+import io
+from contextlib import redirect_stdout
+
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.batch_evaluation import run_batch
+from simulation_package.optimisation_problem_object import BatchedNoisyProblem, NoisyProblem
+from simulation_package.sharding import run_shard
+
+
+SCREENING_VECTORS = np.array([
+    [1, 0.5, 0.9, 0, 0.2, 0.8, 0, 1, 0.3, 0.7, 0, 0, 0.95, 0.1, 0.6],
+    np.ones(15),
+    np.zeros(15),
+])
+
+
+def run_unbatched(screening_vector, population_size, prune_absorbing=False):
+    return run_shard({
+        "screening_vector": screening_vector, "seed": 3, "number": 0, "start": 0, "stop": population_size,
+        "engine": "numpy", "prune_absorbing": prune_absorbing,
+    })
+
+
+@pytest.mark.parametrize("prune_absorbing", [False, True])
+def test_common_draws_match_unbatched_runs(prune_absorbing):
+    # When the vectors are stacked in one simulation, each with two replicates
+    tallies = run_batch(SCREENING_VECTORS, 1500, seed=3, replicates=2, engine="numpy", prune_absorbing=prune_absorbing)
+
+    # Then the first replicate of every vector is the unbatched run with the same seed
+    for screening_vector, vector_tallies in zip(SCREENING_VECTORS, tallies):
+        assert len(vector_tallies) == 2
+        assert vector_tallies[0] == run_unbatched(screening_vector, 1500, prune_absorbing)
+    # And the second replicate is another cohort, shared by every vector
+    assert tallies[0][1] != tallies[0][0]
+    assert tallies[1][1]["healthy"] == tallies[2][1]["healthy"]
+
+
+def test_independent_draws():
+    tallies = run_batch(SCREENING_VECTORS[[2, 2]], 1500, seed=3, common_draws=False, engine="numpy")
+
+    # copy 0 keeps the draws of the unbatched run, copy 1 is another cohort
+    assert tallies[0][0] == run_unbatched(SCREENING_VECTORS[2], 1500)
+    assert tallies[1][0] != tallies[0][0]
+
+
+def test_batched_problem_matches_the_elementwise_problem():
+    X = SCREENING_VECTORS[:2]
+    options = {"engine": "numpy", "population_size": 1000, "common_random_numbers": True, "base_seed": 3}
+
+    with redirect_stdout(io.StringIO()):
+        batched = BatchedNoisyProblem(max_batch_size=1, **options).evaluate(X)
+        elementwise = NoisyProblem(**options).evaluate(X)
+
+    np.testing.assert_allclose(batched, elementwise)
@@ -0,0 +1,127 @@
+"""This module tests the end-of-step previous_state/time_in_state bookkeeping"""
+
+import pandas as pd
+import pandas.testing as pdt
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.bookkeeping import StateBookkeeping, book_state_changes, transition_update
+from simulation_package.make_population import Population
+from simulation_package.screening import Screening
+from simulation_package.screening_intervention import ScreeningIntervention
+from simulation_package.state_index import StateIndex
+from simulation_package.states import STATE_DTYPE, state_codes
+from simulation_package.transition_kernel import transition_components
+from simulation_package.type1_diabetes_dka_splitting import Type1DiabetesDkaSplitting
+from vivarium.interface import InteractiveContext
+
+
+# time_in_state, state and previous_state codes at the end of every step, recorded with the determine_time_in_state
+# copies of the component-per-transition layout (before the bookkeeping was consolidated) by record_trajectories below
+TRAJECTORIES_FILE = Path(__file__).resolve().parent / "data" / "time_in_state_trajectories.npz"
+
+
+class TrajectoryRecorder:
+    """Records the bookkeeping columns after every other time_step listener"""
+
+    def __init__(self):
+        self.name = "trajectory_recorder"
+        self.time_in_state = []
+        self.state = []
+        self.previous_state = []
+
+    def setup(self, builder):
+        self.population_view = builder.population.get_view(["state", "previous_state", "time_in_state"])
+        builder.event.register_listener("time_step", self.record, priority=9)
+
+    def record(self, event):
+        population = self.population_view.get(event.index)
+        self.time_in_state.append(population["time_in_state"].to_numpy())
+        self.state.append(state_codes(population["state"]))
+        self.previous_state.append(state_codes(population["previous_state"]))
+
+
+def record_trajectories(layout, population_size=10_000, steps=15):
+    config = {
+        "randomness": {"key_columns": ["entrance_time", "GRS2", "fdr"], "random_seed": 11},
+        "population": {"population_size": population_size},
+        "time": {"step_size": 365},
+    }
+    recorder = TrajectoryRecorder()
+    sim = InteractiveContext(
+        components=[
+            Population(),
+            *transition_components(layout, engine="numpy"),
+            Screening(continuous_vector=np.ones(steps)),
+            ScreeningIntervention("screening_intervention", "further_t1d_splitting_rate"),
+            Type1DiabetesDkaSplitting(dka_ratio=0.58),
+            recorder,
+        ],
+        configuration=config,
+    )
+    sim.take_steps(steps)
+    return np.array(recorder.time_in_state), np.array(recorder.state), np.array(recorder.previous_state)
+
+
+@pytest.mark.parametrize("layout", ["components", "fused"])
+def test_time_in_state_trajectories_unchanged(layout):
+    # Given the trajectories recorded before the bookkeeping was consolidated
+    expected = np.load(TRAJECTORIES_FILE)
+
+    # When the same simulation runs with the single bookkeeping phase
+    time_in_state, state, previous_state = record_trajectories(layout)
+
+    # Then every simulant has the same time_in_state, state and previous_state at the end of every step
+    np.testing.assert_array_equal(state, expected["state"])
+    np.testing.assert_array_equal(previous_state, expected["previous_state"])
+    np.testing.assert_array_equal(time_in_state, expected["time_in_state"])
+
+
+def test_transition_update():
+    update = transition_update("mAb1", index=pd.Index([4, 9]))
+
+    assert update["state"].dtype == STATE_DTYPE
+    assert update["state"].tolist() == ["mAb1", "mAb1"]
+    assert update["time_in_state"].tolist() == [0, 0]
+    assert update["time_in_state"].dtype == np.int16
+
+
+def test_book_state_changes_only_touches_changed_rows():
+    # Given a population where simulants 1 and 3 changed state in this step
+    population = pd.DataFrame(
+        {
+            "state": ["Ab1", "mAb1", "healthy", "T1D_with_DKA"],
+            "previous_state": ["Ab1", "Ab1", "healthy", "type1_diabetes"],
+            "time_in_state": [3, 0, 5, 2],
+        }
+    )
+
+    # When the step is booked
+    update = book_state_changes(population)
+
+    # Then only those rows are updated
+    expected = pd.DataFrame(
+        {
+            "previous_state": pd.Series(["mAb1", "T1D_with_DKA"], index=[1, 3], dtype=STATE_DTYPE),
+            "time_in_state": pd.Series(0, index=[1, 3], dtype=np.int16),
+        },
+        index=[1, 3],
+    )
+    pdt.assert_frame_equal(update, expected)
+
+
+def test_state_bookkeeping_skips_empty_updates():
+    population = pd.DataFrame({"state": ["Ab1", "healthy"], "previous_state": ["Ab1", "healthy"], "time_in_state": [1, 2]})
+    bookkeeping = StateBookkeeping()
+    bookkeeping.population_view = MagicMock()
+    bookkeeping.population_view.get = MagicMock(return_value=population)
+    bookkeeping.state_index = StateIndex.from_states(population["state"])
+
+    bookkeeping.book_time_in_state(MagicMock(index=population.index))
+
+    bookkeeping.population_view.update.assert_not_called()
@@ -0,0 +1,89 @@
+"""This module tests that an optimisation resumed from a generation checkpoint carries on exactly as an uninterrupted run"""
+
+import numpy as np
+import pytest
+
+from pymoo.algorithms.moo.nsga2 import NSGA2
+from pymoo.core.problem import ElementwiseProblem
+from pymoo.optimize import minimize
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.checkpointing import GenerationCheckpoint, GenerationHistory, load_history, resume
+
+
+class ToyNoisyProblem(ElementwiseProblem):
+    """Noisy two-objective problem drawing a fresh seed per evaluation from the global generator, as NoisyProblem"""
+
+    def __init__(self, **kwargs):
+        super().__init__(n_var=6, n_obj=2, xl=np.zeros(6), xu=np.ones(6), **kwargs)
+
+    def _evaluate(self, x, out, *args, **kwargs):
+        seed = np.random.randint(1, 2**32 - 1)
+        noise = np.random.default_rng(seed).normal(0, 0.05, 2)
+        out["F"] = np.array([x.mean(), 1 - np.sqrt(x.mean())]) + noise
+        out["seeds"] = np.array([seed])
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashingCheckpoint(GenerationCheckpoint):
+    """Checkpoint of a run that crashes once the checkpoint of crash_generation is written"""
+
+    def __init__(self, directory, crash_generation):
+        super().__init__(directory, fsync=False)
+        self.crash_generation = crash_generation
+
+    def notify(self, algorithm):
+        super().notify(algorithm)
+        if algorithm.n_gen == self.crash_generation:
+            raise Crash
+
+
+def test_resume_after_a_crash(tmp_path):
+    np.random.seed(0)
+    uninterrupted = minimize(ToyNoisyProblem(), NSGA2(pop_size=10), ("n_gen", 12), seed=1,
+                             callback=GenerationCheckpoint(tmp_path / "uninterrupted", fsync=False))
+
+    np.random.seed(0)
+    with pytest.raises(Crash):
+        minimize(ToyNoisyProblem(), NSGA2(pop_size=10), ("n_gen", 12), seed=1,
+                 callback=CrashingCheckpoint(tmp_path / "crashed", crash_generation=6))
+    # rows of a generation written after the last checkpoint
+    GenerationHistory(tmp_path / "crashed" / "history", fsync=False).append(
+        {"generation": np.full(3, 7), "X": np.zeros((3, 6)), "F": np.zeros((3, 2)), "wall_time": np.zeros(3), "seeds": np.ones((3, 1))}
+    )
+
+    np.random.seed(123) # a new process, whose global random state the checkpoint restores
+    algorithm = resume(tmp_path / "crashed", ToyNoisyProblem())
+    algorithm.callback.crash_generation = None
+    resumed = minimize(algorithm.problem, algorithm, copy_algorithm=False)
+
+    assert resumed.algorithm.n_gen == uninterrupted.algorithm.n_gen
+    assert np.array_equal(resumed.X, uninterrupted.X) and np.array_equal(resumed.F, uninterrupted.F)
+
+    history, uninterrupted_history = load_history(tmp_path / "crashed"), load_history(tmp_path / "uninterrupted")
+    assert history.keys() == {"generation", "X", "F", "seeds", "wall_time"}
+    assert np.array_equal(np.unique(history["generation"]), np.arange(1, 13))
+    for name in ["generation", "X", "F", "seeds"]:
+        assert np.array_equal(history[name], uninterrupted_history[name]), name
+
+
+def test_history_columns(tmp_path):
+    history = GenerationHistory(tmp_path, fsync=False)
+    assert history.load() == {}
+    history.append({"generation": np.ones(2, dtype=np.int32), "X": np.arange(6.0).reshape(2, 3)})
+    history.append({"generation": np.full(1, 2, dtype=np.int32), "X": np.full((1, 3), 7.0)})
+
+    columns = history.load()
+    assert columns["generation"].ravel().tolist() == [1, 1, 2]
+    assert columns["X"].tolist() == [[0, 1, 2], [3, 4, 5], [7, 7, 7]]
+    with pytest.raises(ValueError):
+        history.append({"X": np.zeros((1, 3))})
+
+    history.truncate(2)
+    assert len(history.load()["X"]) == 2
@@ -0,0 +1,55 @@
+"""This module tests the seed sets of the common random numbers mode of NoisyProblem"""
+
+import io
+from contextlib import redirect_stdout
+
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.common_random_numbers import SeedSchedule
+from simulation_package.optimisation_problem_object import NoisyProblem
+
+
+def test_seed_sets_rotate_every_rotation_generations():
+    schedule = SeedSchedule(n_replications=2, rotation=2, base_seed=7)
+
+    seed_sets = [schedule.next_seed_set() for _ in range(5)]
+
+    assert seed_sets[0] == seed_sets[1] != seed_sets[2]
+    assert seed_sets[2] == seed_sets[3] != seed_sets[4]
+    assert len(set(seed_sets[0])) == 2
+    # reproducible from the base seed
+    assert SeedSchedule(n_replications=2, rotation=2, base_seed=7).seed_set(4) == seed_sets[4]
+
+
+def test_one_seed_set_for_the_whole_run():
+    schedule = SeedSchedule(rotation=None, base_seed=7)
+
+    assert schedule.next_seed_set() == schedule.next_seed_set() == schedule.seed_set(100)
+    with pytest.raises(ValueError):
+        SeedSchedule(rotation=0)
+
+
+def evaluate(problem, X):
+    # NoisyProblem prints the objectives of every candidate
+    with redirect_stdout(io.StringIO()):
+        return problem.evaluate(X)
+
+
+def test_candidates_of_a_generation_share_the_seed_set():
+    # Given a common random numbers problem and two copies of the same candidate
+    problem = NoisyProblem(engine="numpy", population_size=1000, common_random_numbers=True, base_seed=3)
+    X = np.vstack([np.full(15, 0.5), np.full(15, 0.5)])
+
+    # When a generation is evaluated, then both copies see the same cohort
+    F = evaluate(problem, X)
+    np.testing.assert_array_equal(F[0], F[1])
+    first_seed_set = problem.seed_set
+
+    # And the next generation gets the next seed set
+    evaluate(problem, X[:1])
+    assert problem.seed_set != first_seed_set
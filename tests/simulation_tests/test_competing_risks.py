@@ -0,0 +1,80 @@
+"""This module tests the CompetingRisksEvaluator used by AutoAntibody and FromDysglycemia"""
+
+import pandas as pd
+import pandas.testing as pdt
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.competing_risks import CompetingRisksEvaluator
+from simulation_package.from_dysglycemia import FromDysglycemia
+
+
+@pytest.fixture
+def dysglycemic_population():
+    return pd.DataFrame(
+        {
+            "state": ["dysglycemic"] * 4,
+            "time_in_state": [0, 1, 2, 5],
+            "GRS2": [8.0, 11.0, 15.0, 13.0],
+            "fdr": [0, 1, 0, 0],
+            "age": [3, 4, 5, 9],
+        },
+        index=pd.Index([3, 7, 11, 20]),
+    )
+
+
+def test_choose_destinations():
+    # Given three exits with rates 0.1, 0.2 and 0.3
+    rates = np.tile([0.1, 0.2, 0.3], (5, 1))
+    draw = np.array([0.05, 0.1, 0.29, 0.31, 0.95])
+
+    # When destinations are resolved
+    codes = CompetingRisksEvaluator.choose_destinations(rates, draw)
+
+    # Then each draw lands in its cumulative interval, the last code meaning "stay"
+    np.testing.assert_array_equal(codes, [0, 1, 1, 2, 3])
+
+
+@pytest.mark.parametrize("engine", ["lifelines", "numpy"])
+def test_evaluate_matches_individual_rate_producers(engine, dysglycemic_population):
+    # Given FromDysglycemia rates computed one by one
+    from_dysglycemia = FromDysglycemia(engine=engine)
+    mock_population_view = MagicMock()
+    mock_population_view.get = MagicMock(return_value=dysglycemic_population)
+    from_dysglycemia.dysglycemic_population_view = mock_population_view
+    index = dysglycemic_population.index
+    expected = [
+        from_dysglycemia.base_dysglycemia_to_ab1_rate(index),
+        from_dysglycemia.base_dysglycemia_to_mab1_rate(index),
+        from_dysglycemia.base_dysglycemia_to_t1d_rate(index),
+    ]
+
+    # When the three exits are evaluated in one pass
+    from_dysglycemia.competing_risks.evaluate(dysglycemic_population)
+
+    # Then the cached rates are the same and the rate producers serve them without reading the population again
+    mock_population_view.get.reset_mock()
+    actual = [
+        from_dysglycemia.base_dysglycemia_to_ab1_rate(index),
+        from_dysglycemia.base_dysglycemia_to_mab1_rate(index),
+        from_dysglycemia.base_dysglycemia_to_t1d_rate(index),
+    ]
+    mock_population_view.get.assert_not_called()
+    for actual_rate, expected_rate in zip(actual, expected):
+        pdt.assert_series_equal(actual_rate, expected_rate, check_names=False, atol=1e-10)
+
+
+def test_rate_is_none_for_other_index(dysglycemic_population):
+    evaluator = CompetingRisksEvaluator(["Ab1"], ["Hyperglycemia2sAB"])
+    assert evaluator.rate("Ab1", dysglycemic_population.index) is None
+
+    evaluator.evaluate(dysglycemic_population)
+    assert evaluator.rate("Ab1", dysglycemic_population.index[:2]) is None
+
+    evaluator.clear()
+    assert evaluator.rate("Ab1", dysglycemic_population.index) is None
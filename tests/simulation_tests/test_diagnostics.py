@@ -0,0 +1,87 @@
+"""This module tests the bounded survival-frame diagnostics of the transition components"""
+
+import pandas as pd
+import pandas.testing as pdt
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.diagnostics import SurvivalDiagnostics, make_diagnostics
+from simulation_package.mab1_to_ab1 import MultiToAutoInsideAutoantibody
+
+
+def survival_frame(step, n=4):
+    return pd.DataFrame(np.linspace(0.5, 1, n)[np.newaxis, :] - step / 100, index=[1.0], columns=pd.Index(range(step, step + n)))
+
+
+def test_off_by_default():
+    diagnostics = make_diagnostics("ab1")
+    for step in range(5):
+        diagnostics.append(survival_frame(step))
+    assert not diagnostics.enabled
+    assert len(diagnostics) == 0 and diagnostics.records == 0
+    assert diagnostics.summary().empty
+
+
+def test_ring_buffer_is_bounded():
+    diagnostics = SurvivalDiagnostics("ab1", mode="ring", capacity=3)
+    for step in range(10):
+        diagnostics.append(survival_frame(step))
+
+    # only the last three frames are kept, and they are numbered after all ten records
+    assert diagnostics.records == 10 and len(diagnostics) == 3
+    pdt.assert_frame_equal(diagnostics[-1], survival_frame(9))
+    assert diagnostics.summary()["record"].tolist() == [7, 8, 9]
+
+
+def test_summary_statistics():
+    diagnostics = make_diagnostics("ab1", "summary")
+    diagnostics.append(survival_frame(0))
+    diagnostics.append(survival_frame(0, n=0))
+
+    summary = diagnostics.summary()
+    assert summary["n"].tolist() == [4, 0]
+    assert summary.loc[0, "mean"] == pytest.approx(0.75)
+    assert summary.loc[0, "q0.5"] == pytest.approx(0.75)
+    assert summary.loc[0, "histogram"].sum() == 4
+    assert len(diagnostics.frames()) == 0
+
+
+def test_spill_to_disk(tmp_path):
+    diagnostics = make_diagnostics("ab1", {"mode": "spill", "spill_dir": str(tmp_path)})
+    for step in range(3):
+        diagnostics.append(survival_frame(step))
+
+    assert len(list(tmp_path.iterdir())) == 3
+    for step, frame in enumerate(diagnostics):
+        pdt.assert_frame_equal(frame, survival_frame(step), check_index_type=False, check_column_type=False)
+
+    # another instance of the same rate in the same process (e.g. the next simulation of a worker) keeps its own files
+    other = make_diagnostics("ab1", {"mode": "spill", "spill_dir": str(tmp_path)})
+    other.append(survival_frame(5))
+    assert len(list(tmp_path.iterdir())) == 4
+    pdt.assert_frame_equal(diagnostics[0], survival_frame(0), check_index_type=False, check_column_type=False)
+    pdt.assert_frame_equal(other[0], survival_frame(5), check_index_type=False, check_column_type=False)
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        SurvivalDiagnostics("ab1", mode="everything")
+    with pytest.raises(ValueError):
+        SurvivalDiagnostics("ab1", mode="spill")
+
+
+def test_component_captures_only_when_enabled():
+    population = pd.DataFrame(
+        {"state": ["mAb1"] * 3, "time_in_state": [0, 1, 2], "GRS2": [8.0, 11.0, 15.0], "fdr": [0, 1, 0], "age": [3, 4, 5]}
+    )
+    for diagnostics, expected_records in [(None, 0), ("summary", 1)]:
+        component = MultiToAutoInsideAutoantibody(diagnostics=diagnostics)
+        component.population_view = MagicMock()
+        component.population_view.get = MagicMock(return_value=population)
+        component.base_mab1_to_ab1_transition_rate(population.index)
+        assert component.survival_probs_mab1_to_ab1.records == expected_records
@@ -9,6 +9,8 @@ from unittest.mock import MagicMock
 
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 from simulation_package.dysglycemia import Dysglycemia
+from simulation_package.state_index import StateIndex
+from simulation_package.states import STATE_DTYPE
 
 
 @pytest.fixture
@@ -82,6 +84,7 @@ def test_determine_ab1_to_dysglycemia(dysglycemia, mock_event, mock_population):
     #------------ ARRANGE ---------------
     dysglycemia.completed_cycles = 2
     dysglycemia.ab1_population_view = mock_population
+    dysglycemia.state_index = StateIndex.from_states(mock_population.get(mock_event.index)["state"])
 
     # mock ab1_to_dysglycemia_rate -> everyone given a transition prob of 1
     mock_ab1_to_dysglycemia_rate = MagicMock()
@@ -103,15 +106,16 @@ def test_determine_ab1_to_dysglycemia(dysglycemia, mock_event, mock_population):
 
     #------------ ASSERT ----------------   
     # check that the state of the affected individuals is updated to "dysglycemic"
-    expected_series = pd.Series("dysglycemic", index=mock_event.index, name="state")
-    actual_series = mock_population_view.update.call_args_list[0][0][0]
+    expected_series = pd.Series("dysglycemic", index=mock_event.index, name="state", dtype=STATE_DTYPE)
+    actual_series = mock_population_view.update.call_args_list[0][0][0]["state"]
     #assertion
     assert actual_series.equals(expected_series), "Transition logic Ab1 to dysglycemic NOT correctly computed"
 
-def test_determine_mab1_to_dysglycemia(dysglycemia, mock_event, mock_population):
+def test_determine_mab1_to_dysglycemia(dysglycemia, mock_event, mock_population, mock_population_mAb1):
     #------------ ARRANGE ---------------
     dysglycemia.completed_cycles = 2
-    dysglycemia.mab1_population_view = mock_population
+    dysglycemia.mab1_population_view = mock_population_mAb1
+    dysglycemia.state_index = StateIndex.from_states(mock_population_mAb1.get(mock_event.index)["state"])
 
     # mock mab1_to_dysglycemia_rate -> everyone given a transition prob of 1
     mock_mab1_to_dysglycemia_rate = MagicMock()
@@ -133,42 +137,7 @@ def test_determine_mab1_to_dysglycemia(dysglycemia, mock_event, mock_population)
 
     #------------ ASSERT ----------------   
     # check that the state of the affected individuals is updated to "dysglycemic"
-    expected_series = pd.Series("dysglycemic", index=mock_event.index, name="state")
-    actual_series = mock_population_view.update.call_args_list[0][0][0]
+    expected_series = pd.Series("dysglycemic", index=mock_event.index, name="state", dtype=STATE_DTYPE)
+    actual_series = mock_population_view.update.call_args_list[0][0][0]["state"]
     #assertion
     assert actual_series.equals(expected_series), "Transition logic mAb1 to dysglycemic NOT correctly computed"
-
-def test_determine_time_in_state(dysglycemia, mock_event):
-    #------------ ARRANGE ---------------
-    mock_population_data = {
-        "state": ["dysglycemic"] * 10,
-        "previous_state": ["Ab1", "dysglycemic"] * 5,
-        "time_in_state": [1] * 10,
-    }
-    mock_population_df = pd.DataFrame(mock_population_data)
-    
-    # need a population view to update
-    mock_population_view = MagicMock()
-    mock_population_view.get = MagicMock(return_value=mock_population_df)
-    dysglycemia.population_view = mock_population_view
-
-    #------------ ACT -------------------
-    dysglycemia.determine_time_in_state(mock_event)
-    #------------ ASSERT ----------------
-
-    # assert that all individuals who transitioned have their time in state set to zero
-    expected_data = {
-        "state": ["dysglycemic", "dysglycemic"] * 5,
-        "previous_state": ["dysglycemic", "dysglycemic"] * 5,
-        "time_in_state": [0, 1] * 5,}
-    expected_df = pd.DataFrame(expected_data)
-
-    actual_df = mock_population_view.update.call_args_list[0][0][0]
-    pd.testing.assert_frame_equal(actual_df, expected_df)
-
-  
-
-   
-    
-    
-
@@ -0,0 +1,78 @@
+"""This module tests the on-disk evaluation cache of NoisyProblem simulations"""
+
+import io
+import multiprocessing
+from contextlib import redirect_stdout
+
+import numpy as np
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package import evaluation_cache as evaluation_cache_module
+from simulation_package.evaluation_cache import EvaluationCache, canonical_vector
+from simulation_package.optimisation_problem_object import NoisyProblem
+
+
+SCREENING_VECTOR = np.array([1, 0.5, 0.9, 0, 0.2, 0.8, 0, 1, 0.3, 0.7, 0, 0, 0.95, 0.1, 0.6])
+
+OPTIONS = {"engine": "numpy", "population_size": 1000}
+
+
+def fake_tallies(seed):
+    return {"simulants": 1000, "number_of_screens": int(seed), "t1d_cost": seed / 3, "T1D_with_DKA": 2, "T1D_without_DKA": 5}
+
+
+def evaluate_seeds(path_and_session):
+    path, session = path_and_session
+    cache = EvaluationCache(path, session=session)
+    return [cache.evaluate(SCREENING_VECTOR, seed, OPTIONS, lambda: fake_tallies(seed)) for seed in range(10)]
+
+
+def test_canonical_vector():
+    # percentiles whose thresholds fall between the same background GRS2 values screen the same simulants
+    vector = np.array([0.2131, 0.5017, 0.9023])
+    for grs_distribution in ["normal", "empirical"]:
+        assert np.array_equal(canonical_vector(vector, grs_distribution), canonical_vector(vector + 1e-9, grs_distribution))
+        assert not np.array_equal(canonical_vector(vector, grs_distribution), canonical_vector(vector * 0.9, grs_distribution))
+    # 1 screens everybody, and 0 nobody, as a threshold above every background GRS2 value
+    assert canonical_vector(np.ones(3)).tolist() == [0, 0, 0]
+    assert np.array_equal(canonical_vector(np.zeros(3)), canonical_vector(np.full(3, 0.9999999)))
+
+
+def test_concurrent_workers(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        results = pool.map(evaluate_seeds, [(path, "run")] * 8)
+    assert all(result == [fake_tallies(seed) for seed in range(10)] for result in results)
+
+    cache = EvaluationCache(path, session="run")
+    assert len(cache) == 10
+    statistics = cache.report()
+    assert statistics["hits"] + statistics["misses"] == 80 and statistics["misses"] >= 10
+
+
+def test_environment_change(tmp_path, monkeypatch):
+    cache = EvaluationCache(tmp_path / "cache.sqlite")
+    cache.evaluate(SCREENING_VECTOR, 3, OPTIONS, lambda: fake_tallies(3))
+    assert cache.get(cache.key(SCREENING_VECTOR, 3, OPTIONS)) is not None
+    assert cache.get(cache.key(SCREENING_VECTOR, 3, dict(OPTIONS, engine="lifelines"))) is None
+
+    # a new model file or simulation module changes the environment digest
+    monkeypatch.setattr(evaluation_cache_module, "environment_digest", lambda: "new environment")
+    assert cache.get(cache.key(SCREENING_VECTOR, 3, OPTIONS)) is None
+    assert len(cache) == 0 and cache.prune() == 1
+
+
+def test_noisy_problem_with_cache(tmp_path):
+    X = np.vstack([SCREENING_VECTOR, SCREENING_VECTOR + 1e-9 * (SCREENING_VECTOR % 1 > 0)])
+    cache = EvaluationCache(tmp_path / "cache.sqlite")
+    with redirect_stdout(io.StringIO()):
+        simulated = NoisyProblem(engine="numpy", population_size=1000, common_random_numbers=True, base_seed=3).evaluate(X[:1])
+        cached = NoisyProblem(engine="numpy", population_size=1000, common_random_numbers=True, base_seed=3, evaluation_cache=cache).evaluate(X)
+
+    # the second vector screens the same simulants with the same seed: a hit with the objectives of the first
+    assert np.array_equal(cached[0], simulated[0]) and np.array_equal(cached[1], simulated[0])
+    statistics = cache.report()
+    assert statistics["hits"] == 1 and statistics["misses"] == 1 and statistics["seconds_saved"] > 0
@@ -9,6 +9,8 @@ from unittest.mock import MagicMock
 
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 from simulation_package.from_dysglycemia import FromDysglycemia
+from simulation_package.state_index import StateIndex
+from simulation_package.states import STATE_DTYPE
 
 @pytest.fixture
 def from_dysglycemia():
@@ -78,6 +80,7 @@ def test_determine_from_dysglycemia(from_dysglycemia, mock_event, mock_populatio
     # ----------- arrange --------------
     from_dysglycemia.completed_cycles = 2
     from_dysglycemia.dysglycemic_population_view = mock_population
+    from_dysglycemia.state_index = StateIndex.from_states(mock_population.get(mock_event.index)["state"])
 
     # mock dysglycemia_to_ab1_rate
     mock_dysglycemia_to_ab1_rate = MagicMock()
@@ -108,20 +111,18 @@ def test_determine_from_dysglycemia(from_dysglycemia, mock_event, mock_populatio
 
 
     # --------------- assert --------------
-    expected_ab1_series = pd.Series([], name="state", dtype=object)
-    actual_series = mock_population_view.update.call_args_list[0][0][0]
+    expected_ab1_series = pd.Series([], name="state", dtype=STATE_DTYPE)
+    actual_series = mock_population_view.update.call_args_list[0][0][0]["state"]
     # assertion 
     assert actual_series.equals(expected_ab1_series), "Transition logic from dysglycemia to Ab1 NOT correctly computed"
 
         # --------------- assert --------------
-    expected_mab1_series = pd.Series([], name="state", dtype=object)
-    actual_series = mock_population_view.update.call_args_list[1][0][0]
+    expected_mab1_series = pd.Series([], name="state", dtype=STATE_DTYPE)
+    actual_series = mock_population_view.update.call_args_list[1][0][0]["state"]
     # assertion 
     assert actual_series.equals(expected_mab1_series), "Transition logic from dysglycemia to mAb1 NOT correctly computed"
 
-    expected_t1d_series = pd.Series("type1_diabetes", index=mock_event.index, name="state")
-    actual_series = mock_population_view.update.call_args_list[2][0][0]
+    expected_t1d_series = pd.Series("type1_diabetes", index=mock_event.index, name="state", dtype=STATE_DTYPE)
+    actual_series = mock_population_view.update.call_args_list[2][0][0]["state"]
     # assertion 
     assert actual_series.equals(expected_t1d_series), "Transition logic from dysglycemia to type1_diabetes NOT correctly computed"
-
-
@@ -0,0 +1,78 @@
+"""This module tests the background GRS2 sampler and the screening thresholds read on it"""
+
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import norm
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.grs_sampler import BACKGROUND_GRS_FILE, GRSSampler, get_grs_sampler, grs_cache_path
+from simulation_package.screening import Screening
+
+
+@pytest.fixture
+def background_csv(tmp_path):
+    path = tmp_path / "background_population_grs.csv"
+    shutil.copy(BACKGROUND_GRS_FILE, path)
+    return str(path)
+
+
+def test_sample_matches_the_background_list():
+    # Given the background list simulants used to be sampled from, value by value
+    background = pd.read_csv(BACKGROUND_GRS_FILE)
+    background_list = background[background["t1d_status"] == 0]["GRS2"].tolist()
+    draws = pd.Series(np.random.default_rng(0).random(10_000))
+
+    # When the draws are mapped with the sampler
+    grs2_values = get_grs_sampler().sample(draws)
+
+    # Then every simulant gets the same value as before
+    expected = [background_list[idx] for idx in (draws * len(background_list)).astype(int)]
+    np.testing.assert_array_equal(grs2_values, expected)
+
+
+def test_cache_is_written_next_to_the_csv_and_reused(background_csv):
+    # When the CSV is read for the first time, its values are cached next to it
+    sampler = GRSSampler.from_csv(background_csv)
+    cache_path = Path(grs_cache_path(background_csv))
+    assert cache_path.parent == Path(background_csv).parent and cache_path.exists()
+
+    # Then the next load reads the cache
+    np.save(cache_path, sampler.values[:3])
+    assert len(GRSSampler.from_csv(background_csv)) == 3
+
+    # And an edited CSV is parsed again
+    with open(background_csv, "a") as csv_file:
+        csv_file.write('"15730",0,11.5\n')
+    assert grs_cache_path(background_csv) != str(cache_path)
+    assert GRSSampler.from_csv(background_csv).values[-1] == 11.5
+
+
+def test_quantile_is_the_empirical_inverse_cdf():
+    sampler = GRSSampler([3.0, 1.0, 2.0, 4.0])
+
+    np.testing.assert_array_equal(sampler.quantile([0.1, 0.25, 0.26, 0.5, 1.0]), [1.0, 1.0, 2.0, 2.0, 4.0])
+    np.testing.assert_array_equal(sampler.support(), [1.0, 2.0, 3.0, 4.0])
+
+
+def test_screening_thresholds():
+    percentiles = [0, 0.3, 0.9, 1]
+
+    normal = Screening(continuous_vector=percentiles).threshold_vector
+    empirical = Screening(continuous_vector=percentiles, grs_distribution="empirical").threshold_vector
+
+    # 0 screens nobody and 1 screens everybody in both modes
+    assert normal[0] == empirical[0] == float("inf")
+    assert normal[-1] == empirical[-1] == float("-inf")
+    assert normal[1:3] == [norm.ppf(0.3, loc=10, scale=2.375), norm.ppf(0.9, loc=10, scale=2.375)]
+    # the empirical 90th percentile leaves at most 10% of the background above the threshold
+    background = get_grs_sampler().values
+    assert 0.09 < (background > empirical[2]).mean() <= 0.1
+
+    with pytest.raises(ValueError):
+        Screening(continuous_vector=percentiles, grs_distribution="uniform")
@@ -0,0 +1,79 @@
+"""This module tests the closed-form ParametricAFTModel against the lifelines fitters it replaces"""
+
+import glob
+import os
+import pickle
+
+import pandas as pd
+import pandas.testing as pdt
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.hazard_engine import ParametricAFTModel, transition_model
+from simulation_package.autoantibody import AutoAntibody
+from simulation_package.lean_models import BINARY_FILES_DIR
+
+
+MODEL_FILES = sorted(glob.glob(os.path.join(BINARY_FILES_DIR, "*.bin")))
+
+
+@pytest.fixture
+def population_df():
+    rng = np.random.default_rng(0)
+    n = 500
+    return pd.DataFrame(
+        {
+            "GRS2": rng.uniform(4, 18, n),
+            "fdr": rng.integers(0, 2, n),
+            "age": rng.integers(0, 16, n),
+            "time_in_state": rng.integers(0, 16, n),
+        },
+        index=pd.Index(rng.permutation(10 * n)[:n]),
+    )
+
+
+@pytest.mark.parametrize("model_file", MODEL_FILES)
+def test_closed_form_matches_lifelines(model_file, population_df):
+    # Given a fitted lifelines model and its closed-form counterpart
+    with open(model_file, "rb") as binary_model:
+        fitter = pickle.load(binary_model)
+    closed_form_model = ParametricAFTModel.from_fitter(fitter)
+
+    # When both predict the one-step conditional survival
+    expected = fitter.predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
+    actual = closed_form_model.predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
+
+    # Then they agree within floating point tolerance, with the same layout
+    pdt.assert_frame_equal(actual, expected, check_names=False, atol=1e-10, rtol=1e-8)
+
+
+def test_transition_model_switch():
+    with open(MODEL_FILES[0], "rb") as binary_model:
+        fitter = pickle.load(binary_model)
+
+    assert transition_model(fitter, "lifelines") is fitter
+    assert isinstance(transition_model(fitter, "numpy"), ParametricAFTModel)
+    # closed-form models are built once per fitter
+    assert transition_model(fitter, "numpy") is transition_model(fitter, "numpy")
+    with pytest.raises(ValueError):
+        transition_model(fitter, "unknown")
+
+
+def test_base_ab1_transition_rate_numpy_engine():
+    autoantibody = AutoAntibody(engine="numpy")
+    mock_population_view = MagicMock()
+    mock_population_df = pd.DataFrame(
+        {"state": ["healthy"] * 10, "time_in_state": [2] * 10, "GRS2": [15] * 10, "fdr": [0] * 10}
+    )
+    mock_population_view.get = MagicMock(return_value=mock_population_df)
+    autoantibody.population_view = mock_population_view
+
+    rate = autoantibody.base_ab1_transition_rate(pd.Index(range(10)))
+
+    expected_rate = pd.Series([0.009616] * 10)
+    pdt.assert_series_equal(rate, expected_rate, check_names=False, atol=1e-6, rtol=1e-5)
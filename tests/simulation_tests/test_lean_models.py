@@ -0,0 +1,73 @@
+"""This module tests the lean (memory-mapped .npy) transition model format"""
+
+import os
+import glob
+import pickle
+
+import pandas as pd
+import pandas.testing as pdt
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.hazard_engine import ParametricAFTModel
+from simulation_package.lean_models import (
+    BINARY_FILES_DIR,
+    LEAN_FILES_DIR,
+    export_fitter,
+    load_lean_model,
+    load_transition_model,
+)
+
+
+MODEL_STEMS = sorted(os.path.splitext(os.path.basename(path))[0] for path in glob.glob(os.path.join(BINARY_FILES_DIR, "*.bin")))
+
+
+@pytest.fixture
+def population_df():
+    rng = np.random.default_rng(1)
+    n = 200
+    return pd.DataFrame(
+        {
+            "GRS2": rng.uniform(4, 18, n),
+            "fdr": rng.integers(0, 2, n),
+            "age": rng.integers(0, 16, n),
+            "time_in_state": rng.integers(0, 16, n),
+        }
+    )
+
+
+@pytest.mark.parametrize("stem", MODEL_STEMS)
+def test_lean_files_match_binary_files(stem, population_df):
+    # Given the pickled fitter and the checked-in lean file
+    fitter = load_transition_model(stem, "pickle")
+    lean_model = load_transition_model(stem, "lean")
+
+    # Then they predict the same one-step survival
+    expected = fitter.predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
+    actual = lean_model.predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
+    pdt.assert_frame_equal(actual, expected, check_names=False, atol=1e-10, rtol=1e-8)
+
+
+def test_export_round_trip(tmp_path):
+    with open(os.path.join(BINARY_FILES_DIR, "sAB2mAB.bin"), "rb") as binary_file:
+        fitter = pickle.load(binary_file)
+    path = str(tmp_path / "sAB2mAB.npy")
+
+    export_fitter(fitter, path)
+    lean_model = load_lean_model(path)
+    closed_form_model = ParametricAFTModel.from_fitter(fitter)
+
+    assert lean_model.distribution == closed_form_model.distribution
+    assert lean_model.primary_covariates == closed_form_model.primary_covariates
+    assert lean_model.ancillary_covariates == closed_form_model.ancillary_covariates
+    np.testing.assert_array_equal(lean_model.primary_coefficients, closed_form_model.primary_coefficients)
+    np.testing.assert_array_equal(lean_model.ancillary_coefficients, closed_form_model.ancillary_coefficients)
+
+
+def test_load_transition_model_unknown_format():
+    with pytest.raises(ValueError):
+        load_transition_model("sAB2mAB", "parquet")
@@ -0,0 +1,88 @@
+"""This module tests the precomputed transition-probability lookup tables (engine="lookup")"""
+
+import os
+import warnings
+
+import pandas as pd
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.hazard_engine import transition_model
+from simulation_package.lean_models import model_path
+from simulation_package.lookup_tables import TransitionLookupTable, load_or_build_lookup_table
+from simulation_package.model_registry import TRANSITION_MODELS, TransitionModelRegistry, registry
+
+
+GRS_VALUES = [8.0, 9.5, 11.0, 12.25, 13.0, 15.0]
+HORIZON = 6
+
+
+@pytest.fixture
+def population_df():
+    # the last three simulants fall outside of the table: GRS2 not in the support, age beyond and time beyond the horizon
+    return pd.DataFrame(
+        {
+            "GRS2": [8.0, 11.0, 15.0, 13.0, 12.25, 10.0, 9.5, 13.0],
+            "fdr": [0, 1, 0, 0, 1, 0, 1, 0],
+            "age": [0, 3, 4, 6, 5, 3, 9, 2],
+            "time_in_state": [0, 1, 2, 5, 3, 1, 2, 8],
+        },
+        index=pd.Index([2, 5, 8, 13, 21, 34, 55, 89]),
+    )
+
+
+@pytest.mark.parametrize("stem", TRANSITION_MODELS)
+def test_lookup_table_matches_closed_form(stem, population_df):
+    # Given a closed-form model and its table
+    model = transition_model(registry.get(stem), "numpy")
+    lookup_table = TransitionLookupTable.build(model, GRS_VALUES, HORIZON)
+
+    # When both predict the same population, including out-of-table profiles
+    expected = model.transition_probability(population_df, population_df["time_in_state"])
+    actual = lookup_table.transition_probability(population_df, population_df["time_in_state"])
+
+    # Then the probabilities are the same
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-15)
+    assert lookup_table.table.shape[0] == len(GRS_VALUES)
+    assert lookup_table.covariates == model.covariates
+
+
+def test_lookup_table_disk_cache(tmp_path):
+    stem = "healthy2sAB"
+    model = transition_model(registry.get(stem), "numpy")
+
+    # the first call builds and saves the table, the second one memory-maps it
+    built = load_or_build_lookup_table(stem, model, model_path(stem), GRS_VALUES, HORIZON, str(tmp_path))
+    cached_files = os.listdir(tmp_path)
+    loaded = load_or_build_lookup_table(stem, model, model_path(stem), GRS_VALUES, HORIZON, str(tmp_path))
+    assert len(cached_files) == 1 and cached_files[0].startswith(stem)
+    assert isinstance(loaded.table, np.memmap)
+    np.testing.assert_array_equal(loaded.table, built.table)
+
+    # a different horizon is stored under a different key
+    load_or_build_lookup_table(stem, model, model_path(stem), GRS_VALUES, HORIZON + 1, str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_registry_lookup_engine(population_df):
+    test_registry = TransitionModelRegistry()
+
+    # without tables the lookup engine uses the closed-form model, and warns once per stem
+    with pytest.warns(UserWarning, match="sAB2mAB"):
+        closed_form = test_registry.transition_model("sAB2mAB", "lookup")
+    assert closed_form is transition_model(test_registry.get("sAB2mAB"), "numpy")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        test_registry.transition_model("sAB2mAB", "lookup")
+
+    test_registry.build_lookup_tables(GRS_VALUES, HORIZON, stems=["sAB2mAB"], cache_dir=None)
+    lookup_table = test_registry.transition_model("sAB2mAB", "lookup")
+    assert isinstance(lookup_table, TransitionLookupTable)
+
+    survival_prob = lookup_table.predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
+    expected = closed_form.predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
+    pd.testing.assert_frame_equal(survival_prob, expected, atol=1e-15)
@@ -10,6 +10,8 @@ from unittest.mock import MagicMock
 
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 from simulation_package.mab1_to_ab1 import MultiToAutoInsideAutoantibody
+from simulation_package.state_index import StateIndex
+from simulation_package.states import STATE_DTYPE
 
 
 
@@ -57,7 +59,7 @@ def test_base_mab1_to_ab1_transition_rate(mab1_to_ab1, mock_event, mock_populati
 def test_determine_ab1_to_mab1(mab1_to_ab1, mock_event, mock_population):
     #------------ ARRANGE ---------------
     mab1_to_ab1.completed_cycles = 2
-    mab1_to_ab1.ab1_population_view = mock_population
+    mab1_to_ab1.state_index = StateIndex.from_states(mock_population.get(mock_event.index)["state"])
   
     # mock mAb1_rate -> everyone given a transition prob of 1
     mock_mab1_to_ab1_rate = MagicMock()
@@ -80,39 +82,7 @@ def test_determine_ab1_to_mab1(mab1_to_ab1, mock_event, mock_population):
 
     # ------------ ASSERT --------------
     # all individuals have trans prob = 1 therefore should all transition 
-    expected_series = pd.Series("Ab1", index=mock_event.index, name="state")
-    actual_series = mock_population_view.update.call_args_list[0][0][0]
+    expected_series = pd.Series("Ab1", index=mock_event.index, name="state", dtype=STATE_DTYPE)
+    actual_series = mock_population_view.update.call_args_list[0][0][0]["state"]
     # assertion
     assert actual_series.equals(expected_series), "Transition logic mAb1 to Ab1 NOT correctly computed"
-
-def test_determine_time_in_state(mab1_to_ab1, mock_population, mock_event):
-    #### ARRANGE #####
-    mock_population_data = {
-        "state": ["mAb1"] * 10,
-        "previous_state": ["Ab1", "mAb1"] * 5,
-        "time_in_state": [1] * 10
-    }
-    mock_population_df = pd.DataFrame(mock_population_data)
-
-
-
-    # we need a population view to be updated
-    mock_population_view = MagicMock()
-    mock_population_view.get = MagicMock(return_value=mock_population_df)
-    mab1_to_ab1.population_view = mock_population_view
-    
-
-    #### ACT ######
-    mab1_to_ab1.determine_time_in_state(mock_event)
-
-    #### ASSERT #######
-    # assert that all individuals who transitioned have their time in state set to zero
-    expected_data = {
-        "state": ["mAb1", "mAb1"] * 5,
-        "previous_state": ["mAb1", "mAb1"] * 5,
-        "time_in_state": [0, 1] * 5,}
-    expected_df = pd.DataFrame(expected_data)
-
-    actual_df = mock_population_view.update.call_args_list[0][0][0]
-    pd.testing.assert_frame_equal(actual_df, expected_df)
-
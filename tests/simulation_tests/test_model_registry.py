@@ -0,0 +1,63 @@
+"""This module tests the lazy TransitionModelRegistry"""
+
+import pandas as pd
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.model_registry import TransitionModelRegistry, TRANSITION_MODELS
+
+
+@pytest.fixture
+def registry():
+    return TransitionModelRegistry(model_format="lean")
+
+
+def test_models_are_loaded_on_first_use(registry):
+    assert not registry.is_loaded("sAB2mAB")
+
+    model = registry.get("sAB2mAB")
+
+    assert registry.is_loaded("sAB2mAB")
+    assert registry.get("sAB2mAB") is model, "registry should cache models per process"
+    assert list(registry.report()) == ["sAB2mAB"]
+
+
+def test_warm_loads_every_model_and_reports_stats(registry):
+    registry.warm()
+
+    report = registry.report()
+    assert set(report) == set(TRANSITION_MODELS)
+    for stats in report.values():
+        assert stats["load_time"] >= 0
+        assert stats["memory"] >= 0
+
+
+def test_models_load_outside_repository_root(registry, tmp_path, monkeypatch):
+    # Given a working directory that is not the repository root
+    monkeypatch.chdir(tmp_path)
+
+    # Then models are still found
+    pickled_registry = TransitionModelRegistry(model_format="pickle")
+    assert pickled_registry.get("sAB2Healthy") is not None
+    assert registry.get("sAB2Healthy") is not None
+
+
+def test_clear(registry):
+    registry.warm(["mAB2sAB"])
+    registry.clear()
+    assert not registry.is_loaded("mAB2sAB")
+    assert registry.report() == {}
+
+
+def test_lifelines_model_accepts_empty_population():
+    # an empty at-risk population (small populations, shards) gets an empty survival frame instead of a lifelines error
+    model = TransitionModelRegistry(model_format="pickle").transition_model("sAB2mAB", "lifelines")
+    population_df = pd.DataFrame({"GRS2": [], "fdr": [], "age": [], "time_in_state": []}, index=pd.Index([], dtype="int64"))
+
+    survival_prob = model.predict_survival_function(population_df, times=1, conditional_after=population_df["time_in_state"])
+
+    assert survival_prob.shape == (1, 0)
+    assert (1 - survival_prob.iloc[0]).empty
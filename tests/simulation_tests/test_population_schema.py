@@ -0,0 +1,90 @@
+"""This module tests the compact column schema of the Population state table"""
+
+import pandas as pd
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.make_population import Population
+from simulation_package.population_schema import COLUMN_DTYPES, bytes_per_simulant, cast_columns, column_series
+from simulation_package.screening import Screening
+from simulation_package.screening_intervention import ScreeningIntervention
+from simulation_package.transition_kernel import transition_components
+from simulation_package.type1_diabetes_dka_splitting import Type1DiabetesDkaSplitting
+from vivarium.framework.population import PopulationError
+from vivarium.interface import InteractiveContext
+
+
+def make_simulation(layout="components", population_size=2000):
+    config = {
+        "randomness": {"key_columns": ["entrance_time", "GRS2", "fdr"], "random_seed": 7},
+        "population": {"population_size": population_size},
+        "time": {"step_size": 365},
+    }
+    return InteractiveContext(
+        components=[
+            Population(),
+            *transition_components(layout, engine="numpy"),
+            Screening(continuous_vector=np.ones(15)),
+            ScreeningIntervention("screening_intervention", "further_t1d_splitting_rate"),
+            Type1DiabetesDkaSplitting(dka_ratio=0.58),
+        ],
+        configuration=config,
+    )
+
+
+@pytest.mark.parametrize("layout", ["components", "fused"])
+def test_every_component_keeps_the_schema(layout):
+    # Given a simulation in which every column is written at least once
+    sim = make_simulation(layout)
+
+    # When it runs (any upcasting update would raise a PopulationError)
+    sim.take_steps(15)
+    state_table = sim.get_population()
+
+    # Then every column still has its compact dtype
+    for column, dtype in COLUMN_DTYPES.items():
+        assert state_table[column].dtype == dtype, column
+    assert state_table["number_of_screens"].max() > 0 and state_table["t1d_cost"].max() > 0
+    assert bytes_per_simulant(state_table) < 64
+
+
+class ScreenedInPastWriter:
+    """Writes screened_in_past once with an int64 Series and once through the schema"""
+
+    def __init__(self):
+        self.name = "screened_in_past_writer"
+        self.error = None
+
+    def setup(self, builder):
+        self.population_view = builder.population.get_view(["screened_in_past"])
+        builder.event.register_listener("time_step", self.write)
+
+    def write(self, event):
+        try:
+            self.population_view.update(pd.Series(1, index=event.index[:2], name="screened_in_past"))
+        except PopulationError as error:
+            self.error = error
+        self.population_view.update(column_series(1, index=event.index[:2], name="screened_in_past"))
+
+
+def test_upcasting_update_is_refused():
+    writer = ScreenedInPastWriter()
+    sim = InteractiveContext(components=[Population(), writer], configuration={"population": {"population_size": 10}})
+
+    sim.step()
+
+    assert isinstance(writer.error, PopulationError)
+    assert sim.get_population()["screened_in_past"].tolist() == [1, 1] + [0] * 8
+
+
+def test_cast_columns():
+    frame = pd.DataFrame({"age": [1, 2], "state": ["Ab1", "healthy"], "other": [1.5, 2.5]})
+    cast = cast_columns(frame)
+
+    assert cast["age"].dtype == np.int16
+    assert cast["state"].dtype == COLUMN_DTYPES["state"]
+    assert cast["other"].dtype == np.float64
@@ -0,0 +1,74 @@
+"""This module tests the sharded runner and the merge of the outcome tallies"""
+
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.objective_function_costs import ObjectiveFunctionCosts
+from simulation_package.objective_function_dka import ObjectiveFunctionDKA
+from simulation_package.outcomes import merge_tallies
+from simulation_package.sharding import model_components, run_sharded, shard_bounds
+from vivarium.interface import InteractiveContext
+
+
+SCREENING_VECTOR = np.array([1, 0.5, 0.9, 0, 0.2, 0.8, 0, 1, 0.3, 0.7, 0, 0, 0.95, 0.1, 0.6])
+
+
+def run_unsharded(population_size, seed):
+    config = {
+        "randomness": {"key_columns": ["entrance_time", "GRS2", "fdr"], "random_seed": seed},
+        "population": {"population_size": population_size},
+        "time": {"step_size": 365},
+    }
+    sim = InteractiveContext(
+        components=[*model_components(SCREENING_VECTOR, engine="numpy"), ObjectiveFunctionCosts(), ObjectiveFunctionDKA()],
+        configuration=config,
+    )
+    sim.take_steps(len(SCREENING_VECTOR))
+    sim.finalize()
+    return sim.get_component("objective_function_costs"), sim.get_component("objective_function_dka")
+
+
+def test_shard_bounds():
+    assert shard_bounds(10, 3) == [(0, 3), (3, 6), (6, 10)]
+    assert shard_bounds(5, 1) == [(0, 5)]
+    with pytest.raises(ValueError):
+        shard_bounds(5, 6)
+
+
+def test_merge_tallies():
+    merged = merge_tallies([{"simulants": 2, "t1d_cost": 1.5, "Ab1": 1}, {"simulants": 3, "t1d_cost": 2.0, "Ab1": 0}])
+    assert merged == {"simulants": 5, "t1d_cost": 3.5, "Ab1": 1}
+
+
+def test_sharded_run_matches_unsharded_run():
+    # Given an unsharded run
+    costs, dka = run_unsharded(population_size=4000, seed=3)
+
+    # When the same cohort runs in 3 shards
+    tallies = run_sharded(SCREENING_VECTOR, population_size=4000, n_shards=3, seed=3, processes=1, engine="numpy")
+
+    # Then the merged tallies, hence both objectives, are exactly those of the unsharded run
+    assert tallies == costs.tallies
+    assert ObjectiveFunctionCosts().costs_from_tallies(tallies) == costs.total_costs
+    assert ObjectiveFunctionDKA().dka_ratio_from_tallies(tallies) == dka.dka_ratio
+
+
+def test_shards_run_in_worker_processes():
+    in_process = run_sharded(SCREENING_VECTOR, population_size=1000, n_shards=2, seed=5, processes=1, engine="numpy")
+    in_workers = run_sharded(SCREENING_VECTOR, population_size=1000, n_shards=2, seed=5, processes=2, engine="numpy")
+
+    assert in_workers == in_process
+    assert in_workers["simulants"] == 1000
+
+
+def test_per_shard_streams_are_reproducible():
+    tallies_1 = run_sharded(SCREENING_VECTOR, population_size=1000, n_shards=2, seed=5, processes=1, streams="per_shard", engine="numpy")
+    tallies_2 = run_sharded(SCREENING_VECTOR, population_size=1000, n_shards=2, seed=5, processes=1, streams="per_shard", engine="numpy")
+
+    assert tallies_1 == tallies_2
+    with pytest.raises(ValueError):
+        run_sharded(SCREENING_VECTOR, population_size=1000, n_shards=2, seed=5, streams="shared")
@@ -0,0 +1,169 @@
+"""This module tests the incrementally maintained per-state simulant index"""
+
+import pandas as pd
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.make_population import Population
+from simulation_package.screening import Screening
+from simulation_package.screening_intervention import ScreeningIntervention
+from simulation_package.sharding import run_shard
+from simulation_package.state_index import StateIndex, get_state_index
+from simulation_package.states import STATE_DTYPE, STATES
+from simulation_package.transition_kernel import transition_components
+from simulation_package.type1_diabetes_dka_splitting import Type1DiabetesDkaSplitting
+from vivarium.interface import InteractiveContext
+
+
+class StateIndexChecker:
+    """Compares the per-state index with the state column after every other time_step listener"""
+
+    def __init__(self):
+        self.name = "state_index_checker"
+        self.mismatches = []
+
+    def setup(self, builder):
+        self.population_view = builder.population.get_view(["state"])
+        self.state_index = get_state_index(builder)
+        builder.event.register_listener("time_step", self.check, priority=9)
+
+    def check(self, event):
+        population = self.population_view.get(event.index)
+        for state in STATES:
+            expected = population.index[(population["state"] == state).to_numpy()]
+            if not self.state_index.get(state).equals(expected) or self.state_index.count(state) != len(expected):
+                self.mismatches.append((event.time, state))
+
+
+@pytest.fixture
+def state_index():
+    states = pd.Series(["healthy", "Ab1", "healthy", "mAb1", "healthy", "dysglycemic"])
+    return StateIndex.from_states(states)
+
+
+def test_seeded_from_states(state_index):
+    assert state_index.get("healthy").tolist() == [0, 2, 4]
+    assert state_index.get("Ab1", "mAb1").tolist() == [1, 3]
+    assert state_index.count("dysglycemic") == 1
+    assert state_index.get("type1_diabetes").empty
+
+
+def test_move(state_index):
+    # Given simulants 0 and 4 leave healthy, and simulant 1 goes Ab1 -> healthy
+    state_index.move(pd.Index([4, 0]), "Ab1")
+    state_index.move(pd.Index([1]), "healthy")
+
+    # Then every state holds its current simulants, sorted
+    assert state_index.get("healthy").tolist() == [1, 2]
+    assert state_index.get("Ab1").tolist() == [0, 4]
+    assert state_index.count("healthy") == 2 and state_index.count("Ab1") == 2
+
+
+def test_move_back_within_a_step(state_index):
+    # a simulant that leaves and comes back before the state is read again is listed once
+    state_index.move(pd.Index([2]), "Ab1")
+    state_index.move(pd.Index([2]), "healthy")
+
+    assert state_index.get("healthy").tolist() == [0, 2, 4]
+    assert state_index.get("Ab1").tolist() == [1]
+    assert state_index.count("healthy") == 3
+
+
+def test_move_one_state_per_simulant(state_index):
+    index = pd.Index([5, 1])
+    state_index.move(index, pd.Series(["type1_diabetes", "mAb1"], index=index, dtype=STATE_DTYPE))
+
+    assert state_index.get("type1_diabetes").tolist() == [5]
+    assert state_index.get("mAb1").tolist() == [1, 3]
+    assert state_index.states(pd.Index([1, 5])).tolist() == ["mAb1", "type1_diabetes"]
+    np.testing.assert_array_equal(state_index.codes(pd.Index([0, 5])), [STATES.index("healthy"), STATES.index("type1_diabetes")])
+
+
+@pytest.mark.parametrize("layout", ["components", "fused"])
+def test_index_follows_the_state_table(layout):
+    # Given a simulation where simulants cross every edge of the transition graph
+    config = {
+        "randomness": {"key_columns": ["entrance_time", "GRS2", "fdr"], "random_seed": 7},
+        "population": {"population_size": 2000},
+        "time": {"step_size": 365},
+    }
+    checker = StateIndexChecker()
+    sim = InteractiveContext(
+        components=[
+            Population(),
+            *transition_components(layout, engine="numpy"),
+            Screening(continuous_vector=np.ones(15)),
+            ScreeningIntervention("screening_intervention", "further_t1d_splitting_rate"),
+            Type1DiabetesDkaSplitting(dka_ratio=0.58),
+            checker,
+        ],
+        configuration=config,
+    )
+
+    # When it runs
+    sim.take_steps(15)
+
+    # Then at the end of every step the index lists exactly the simulants of each state
+    assert checker.mismatches == []
+    assert (sim.get_population()["state"] != "healthy").any()
+
+
+def test_prune_absorbing_states(state_index):
+    state_index.move(pd.Index([1, 3]), pd.Series(["T1D_with_DKA", "type1_diabetes"], index=[1, 3], dtype=STATE_DTYPE))
+
+    # pruning is off by default: every simulant stays active
+    assert state_index.prune().empty
+    assert state_index.active_count() == 6
+
+    state_index.prune_absorbing = True
+    assert state_index.prune().tolist() == [1]
+    assert state_index.active().tolist() == [0, 2, 3, 4, 5]
+    # pruned simulants are still counted in their state
+    assert state_index.get("T1D_with_DKA").tolist() == [1]
+    assert state_index.prune().empty
+
+
+def run_pruned_simulation(prune_absorbing, population_size=2000, steps=15):
+    config = {
+        "randomness": {"key_columns": ["entrance_time", "GRS2", "fdr"], "random_seed": 7},
+        "population": {"population_size": population_size, "prune_absorbing": prune_absorbing},
+        "time": {"step_size": 365},
+    }
+    population = Population()
+    sim = InteractiveContext(
+        components=[
+            population,
+            *transition_components("components", engine="numpy"),
+            Screening(continuous_vector=np.ones(steps)),
+            ScreeningIntervention("screening_intervention", "further_t1d_splitting_rate"),
+            Type1DiabetesDkaSplitting(dka_ratio=0.58),
+        ],
+        configuration=config,
+    )
+    sim.take_steps(steps)
+    return population, population.settle_pruned_simulants(sim.get_population())
+
+
+def test_pruned_simulants_are_settled():
+    # Given the same simulation with and without pruning of absorbing states
+    _, expected = run_pruned_simulation(prune_absorbing=False)
+    population, state_table = run_pruned_simulation(prune_absorbing=True)
+
+    # Then the active counter only falls by the simulants that reached an absorbing state
+    absorbed = state_table["state"].isin(["T1D_with_DKA", "T1D_without_DKA"]).sum()
+    assert population.active_simulants[0] == 2000 and absorbed > 0
+    assert population.active_simulants[-1] >= 2000 - absorbed
+    assert (np.diff(population.active_simulants) <= 0).all()
+
+    # And once settled, the state table is the one of the unpruned run, screening columns included
+    pd.testing.assert_frame_equal(state_table, expected)
+
+
+@pytest.mark.parametrize("screening_vector", [np.ones(15), np.linspace(0.05, 0.95, 15)])
+def test_pruning_keeps_the_outcome_tallies(screening_vector):
+    shard = {"screening_vector": screening_vector, "seed": 3, "number": 0, "start": 0, "stop": 2000, "engine": "numpy"}
+    assert run_shard(dict(shard, prune_absorbing=True)) == run_shard(dict(shard, prune_absorbing=False))
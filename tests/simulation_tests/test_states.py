@@ -0,0 +1,57 @@
+"""This module tests the categorical encoding of the state, previous_state and screen_status columns"""
+
+import pandas as pd
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.make_population import Population
+from simulation_package.states import SCREEN_STATUS_DTYPE, STATE_DTYPE, STATES, state_codes, state_series, string_view
+from vivarium.interface import InteractiveContext
+
+
+def test_population_columns_are_categorical():
+    # Given a new population
+    sim = InteractiveContext(components=[Population()], configuration={"population": {"population_size": 100}})
+    state_table = sim.get_population()
+
+    # Then the state columns are stored as categoricals, and still compare against plain strings
+    assert state_table["state"].dtype == STATE_DTYPE
+    assert state_table["previous_state"].dtype == STATE_DTYPE
+    assert state_table["screen_status"].dtype == SCREEN_STATUS_DTYPE
+    assert (state_table["state"] == "healthy").all()
+    assert (state_table["state"] == state_table["previous_state"]).all()
+
+
+def test_state_codes():
+    states = ["healthy", "T1D_without_DKA", "Ab1", "dysglycemic"]
+    expected = np.array([STATES.index(state) for state in states], dtype=np.int8)
+
+    np.testing.assert_array_equal(state_codes(pd.Series(states)), expected)
+    np.testing.assert_array_equal(state_codes(state_series(states, index=pd.RangeIndex(4))), expected)
+    assert state_codes(pd.Series(["unknown"]))[0] == -1
+
+
+def test_state_series_unknown_values():
+    # values outside of the categories become missing, and only categorical columns can be built
+    assert state_series(["Ab2"], index=pd.RangeIndex(1)).isna().all()
+    with pytest.raises(KeyError):
+        state_series("Ab1", index=pd.RangeIndex(1), name="GRS2")
+
+
+def test_string_view():
+    population = pd.DataFrame(
+        {
+            "state": state_series(["Ab1", "mAb1"], index=pd.RangeIndex(2)),
+            "screen_status": state_series(["not_screened", "mAb1"], index=pd.RangeIndex(2), name="screen_status"),
+            "age": [3, 4],
+        }
+    )
+    strings = string_view(population)
+
+    assert strings["state"].dtype == object and strings["screen_status"].dtype == object
+    assert strings["state"].tolist() == ["Ab1", "mAb1"]
+    assert population["state"].dtype == STATE_DTYPE
@@ -0,0 +1,96 @@
+"""This module tests the surrogate pre-screening of the offspring sent to the simulator"""
+
+import numpy as np
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from pymoo.algorithms.moo.nsga2 import NSGA2
+from pymoo.core.problem import Problem
+from pymoo.optimize import minimize
+from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
+from simulation_package.surrogate import ObjectiveSurrogate, SurrogatePreScreening, non_zero_objective
+
+
+class ScreeningLikeProblem(Problem):
+    """Cheap stand-in for NoisyProblem: screening effort, a DKA-like ratio and the non-zero count"""
+
+    def __init__(self):
+        super().__init__(n_var=15, n_obj=3, xl=np.zeros(15), xu=np.ones(15))
+
+    def _evaluate(self, X, out, *args, **kwargs):
+        effort = (1 - X).sum(axis=1)
+        out["F"] = np.column_stack([effort, 1 / (1 + effort), non_zero_objective(X)])
+
+
+def objectives(X):
+    out = {}
+    ScreeningLikeProblem()._evaluate(X, out)
+    return out["F"]
+
+
+def test_surrogate_learns_the_objectives():
+    rng = np.random.default_rng(0)
+    X = rng.random((200, 15))
+    surrogate = ObjectiveSurrogate()
+    surrogate.observe(X[:150], objectives(X[:150]))
+
+    mean, std = surrogate.predict(X[150:])
+
+    assert len(surrogate) == 150 and mean.shape == std.shape == (50, 2)
+    # predictions rank unseen vectors like the true objectives
+    assert np.corrcoef(mean[:, 0], objectives(X[150:])[:, 0])[0, 1] > 0.7
+    assert (std >= 0).all()
+
+
+def test_selection_keeps_the_predicted_best_and_a_random_fraction():
+    rng = np.random.default_rng(1)
+    X = rng.random((200, 15))
+    pre_screening = SurrogatePreScreening(mating=None, simulated_fraction=0.25)
+    pre_screening.surrogate.observe(X, objectives(X))
+
+    candidates = rng.random((40, 15))
+    selected = pre_screening.select(candidates, 8, F_population=objectives(X[:20]), random_state=rng)
+
+    assert len(selected) == len(set(selected)) == 8
+    # 2 candidates at random, then the candidates whose predictions rank best among the population (the random ones
+    # are not ranked)
+    ranked = np.setdiff1d(np.arange(40), selected[:2])
+    mean, _ = pre_screening.surrogate.predict(candidates[ranked])
+    predicted = np.column_stack([mean, non_zero_objective(candidates[ranked])])
+    _, rank = NonDominatedSorting().do(np.vstack([predicted, objectives(X[:20])]), return_rank=True)
+    kept = np.isin(ranked, selected)
+    assert rank[:len(ranked)][kept].max() <= rank[:len(ranked)][~kept].min()
+
+
+def test_nsga2_with_pre_screening():
+    algorithm = NSGA2(pop_size=20)
+    algorithm.mating = SurrogatePreScreening(algorithm.mating, candidate_factor=4, min_samples=20)
+
+    result = minimize(ScreeningLikeProblem(), algorithm, ("n_gen", 5), seed=1)
+
+    # the simulator still gets pop_size offspring per generation, chosen among 4 times more candidates
+    assert result.algorithm.evaluator.n_eval == 100
+    # minimize runs a copy of the algorithm
+    pre_screening = result.algorithm.mating
+    assert pre_screening.history[-1] == (80, 20)
+    assert len(pre_screening.surrogate) == 80
+
+
+def test_seeded_runs_are_reproducible():
+    X = np.random.default_rng(2).random((60, 15))
+    predictions = []
+    for _ in range(2):
+        surrogate = ObjectiveSurrogate(random_state=4)
+        surrogate.observe(X[:50], objectives(X[:50]))
+        predictions.append(surrogate.predict(X[50:]))
+    np.testing.assert_array_equal(predictions[0][0], predictions[1][0])
+
+    # the forests of a pre-screened run are seeded from the algorithm's random generator
+    results = []
+    for _ in range(2):
+        algorithm = NSGA2(pop_size=20)
+        algorithm.mating = SurrogatePreScreening(algorithm.mating, candidate_factor=4, min_samples=20)
+        results.append(minimize(ScreeningLikeProblem(), algorithm, ("n_gen", 5), seed=1))
+    np.testing.assert_array_equal(results[0].X, results[1].X)
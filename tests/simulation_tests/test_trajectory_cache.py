@@ -0,0 +1,72 @@
+"""This module tests the replay of screening vectors on cached natural-history trajectories"""
+
+import io
+from contextlib import redirect_stdout
+
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.optimisation_problem_object import NoisyProblem
+from simulation_package.sharding import run_shard
+from simulation_package.trajectory_cache import NaturalHistory
+
+
+SCREENING_VECTORS = [
+    np.array([1, 0.5, 0.9, 0, 0.2, 0.8, 0, 1, 0.3, 0.7, 0, 0, 0.95, 0.1, 0.6]),
+    np.ones(15),
+    np.zeros(15),
+]
+
+
+@pytest.fixture(scope="module")
+def natural_history():
+    return NaturalHistory.simulate(seed=3, population_size=2000, cycles=15, engine="numpy")
+
+
+def run_full(screening_vector, prune_absorbing, grs_distribution):
+    # a single shard over the whole cohort is the full Vivarium simulation
+    return run_shard({
+        "screening_vector": screening_vector, "seed": 3, "number": 0, "start": 0, "stop": 2000, "engine": "numpy",
+        "prune_absorbing": prune_absorbing, "grs_distribution": grs_distribution,
+    })
+
+
+@pytest.mark.parametrize("prune_absorbing", [False, True])
+@pytest.mark.parametrize("vector_number", range(len(SCREENING_VECTORS)))
+def test_replay_matches_the_full_simulation(natural_history, vector_number, prune_absorbing):
+    screening_vector = SCREENING_VECTORS[vector_number]
+
+    assert natural_history.replay(screening_vector) == run_full(screening_vector, prune_absorbing, "normal")
+
+
+def test_replay_with_empirical_thresholds(natural_history):
+    screening_vector = SCREENING_VECTORS[0]
+
+    assert natural_history.replay(screening_vector, grs_distribution="empirical") == run_full(screening_vector, False, "empirical")
+
+
+def test_save_and_load(natural_history, tmp_path):
+    path = tmp_path / "natural_history.npz"
+    natural_history.save(path)
+
+    loaded = NaturalHistory.load(path)
+
+    assert loaded.replay(SCREENING_VECTORS[0]) == natural_history.replay(SCREENING_VECTORS[0])
+    with pytest.raises(ValueError):
+        loaded.replay(SCREENING_VECTORS[0][:10])
+
+
+def test_noisy_problem_replay():
+    # replay gives the objectives of the full simulation with the same seeds
+    X = np.vstack(SCREENING_VECTORS[:2])
+    with redirect_stdout(io.StringIO()):
+        replayed = NoisyProblem(engine="numpy", population_size=1000, common_random_numbers=True, base_seed=3, replay=True).evaluate(X)
+        simulated = NoisyProblem(engine="numpy", population_size=1000, common_random_numbers=True, base_seed=3).evaluate(X)
+    np.testing.assert_allclose(replayed, simulated)
+
+    with pytest.raises(ValueError):
+        NoisyProblem(replay=True, n_shards=2)
@@ -0,0 +1,65 @@
+"""This module tests the fused TransitionKernel against the component-per-transition layout"""
+
+import pandas as pd
+import pandas.testing as pdt
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.bookkeeping import StateBookkeeping
+from simulation_package.make_population import Population
+from simulation_package.transition_kernel import STATES, TRANSITION_STAGES, TransitionKernel, transition_components
+from simulation_package.screening import Screening
+from simulation_package.screening_intervention import ScreeningIntervention
+from simulation_package.type1_diabetes_dka_splitting import Type1DiabetesDkaSplitting
+from vivarium.interface import InteractiveContext
+
+
+def run_simulation(layout, population_size=2000, steps=15):
+    config = {
+        "randomness": {"key_columns": ["entrance_time", "GRS2", "fdr"], "random_seed": 7},
+        "population": {"population_size": population_size},
+        "time": {"step_size": 365},
+    }
+    screening_vector = np.array([1, 0.5, 0.9, 0, 0.2, 0.8, 0, 1, 0.3, 0.7, 0, 0, 0.95, 0.1, 0.6])
+    sim = InteractiveContext(
+        components=[
+            Population(),
+            *transition_components(layout, engine="numpy"),
+            Screening(continuous_vector=screening_vector),
+            ScreeningIntervention("screening_intervention", "further_t1d_splitting_rate"),
+            Type1DiabetesDkaSplitting(dka_ratio=0.58),
+        ],
+        configuration=config,
+    )
+    sim.take_steps(steps)
+    return sim.get_population()
+
+
+def test_fused_layout_matches_components():
+    # Given the same seed and configuration
+    components_population = run_simulation("components")
+    fused_population = run_simulation("fused")
+
+    # Then both layouts leave every simulant in the same state, with the same bookkeeping
+    columns = ["state", "previous_state", "time_in_state", "ever_antibody", "screen_status", "number_of_screens", "t1d_cost"]
+    pdt.assert_frame_equal(fused_population[columns], components_population[columns], check_dtype=False)
+    assert (components_population["state"] != "healthy").any()
+
+
+def test_transition_graph_states():
+    for stage in TRANSITION_STAGES:
+        assert stage["source"] in STATES
+        assert set(stage["destinations"]) <= set(STATES)
+        assert len(stage["destinations"]) == len(stage["models"]) == len(stage["rates"])
+
+
+def test_transition_components():
+    assert isinstance(transition_components("fused")[0], TransitionKernel)
+    components = transition_components("components", engine="numpy")
+    assert len(components) == 7 and isinstance(components[-1], StateBookkeeping)
+    with pytest.raises(ValueError):
+        transition_components("unknown")
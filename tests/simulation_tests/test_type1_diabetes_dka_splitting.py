@@ -10,6 +10,8 @@ from unittest.mock import MagicMock
 
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 from simulation_package.type1_diabetes_dka_splitting import Type1DiabetesDkaSplitting
+from simulation_package.state_index import StateIndex
+from simulation_package.states import STATE_DTYPE
 
 
 @pytest.fixture
@@ -51,7 +53,7 @@ def test_base_further_t1d_splitting_rate(type1_diabetes_dka_splitting, mock_even
 def test_determine_t1d(type1_diabetes_dka_splitting, mock_event, mock_population):
     # ----------- arrange --------------
     type1_diabetes_dka_splitting.completed_cycles = 2
-    type1_diabetes_dka_splitting.t1d_population_view = mock_population
+    type1_diabetes_dka_splitting.state_index = StateIndex.from_states(mock_population.get(mock_event.index)["state"])
 
     mock_further_t1d_splitting_rate = MagicMock()
     mock_further_t1d_splitting_rate.return_value = pd.Series([1] * 10, index=mock_event.index)
@@ -70,7 +72,7 @@ def test_determine_t1d(type1_diabetes_dka_splitting, mock_event, mock_population
     type1_diabetes_dka_splitting.determine_t1d(mock_event)
 
     # --------------- assert --------------
-    expected_t1d_series = pd.Series(["T1D_with_DKA"] * 10, name="state", dtype=object)
+    expected_t1d_series = pd.Series(["T1D_with_DKA"] * 10, name="state", dtype=STATE_DTYPE)
     actual_series = mock_population_view.update.call_args_list[0][0][0]
     
     assert actual_series.equals(expected_t1d_series), "Transition logic from type1_diabetes to DKA/No_DKA NOT correctly computed"
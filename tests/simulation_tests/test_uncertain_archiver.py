@@ -0,0 +1,128 @@
+"""This module tests the elite set maintained by the UncertainObjectivesArchiver under insertions and re-evaluations"""
+
+import random
+
+import numpy as np
+import pytest
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from simulation_package.uncertain_archiver import UncertainObjectivesArchiver
+
+
+def noisy_objectives(d, rng):
+    below = sum(value < 0.5 for value in d) / len(d)
+    return [below + rng.uniform(-0.05, 0.05), 1 - below + rng.uniform(-0.05, 0.05), rng.random()]
+
+
+def non_dominated(archive, size):
+    F = np.array([archive.get_estimated_objective_vector_at_index(i) for i in range(size)])
+    return {i for i in range(size) if not any((F[k] <= F[i]).all() and (F[k] < F[i]).any() for k in range(size))}
+
+
+def guarded_tree(archive):
+    # every solution is reachable exactly once from the elite set through the guarded lists
+    elites = archive.get_elite_solutions()
+    seen = []
+    stack = [solution for solution in elites]
+    while stack:
+        solution = stack.pop()
+        seen.append(id(solution))
+        stack.extend(archive._UncertainObjectivesArchiver__history[i] for i in solution.get_guarded_indices())
+    return seen
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_elite_set_is_the_non_dominated_set_of_the_means(seed):
+    rng = random.Random(seed)
+    archive = UncertainObjectivesArchiver()
+
+    for _ in range(300):
+        decision_vector = [rng.random() for _ in range(20)]
+        archive.insert_new_solution(noisy_objectives(decision_vector, rng), decision_vector)
+        index = archive.get_index_of_most_uncertain_elite()
+        archive.update_solution(index, noisy_objectives(archive.get_decision_vector_at_index(index), rng))
+
+    elite_indices = set(archive._UncertainObjectivesArchiver__elite_indices)
+    assert elite_indices == non_dominated(archive, 300)
+    assert archive.sanity_check() and archive.self_guarding_check()
+    seen = guarded_tree(archive)
+    assert len(seen) == len(set(seen)) == 300
+
+
+def test_update_of_a_displaced_elite():
+    archive = UncertainObjectivesArchiver()
+    first = archive.insert_new_solution([1.0, 1.0], [0.0])
+    archive.insert_new_solution([2.0, 2.0], [1.0])
+    # the first elite is displaced by a later insertion, then its pending re-evaluation comes in
+    archive.insert_new_solution([0.5, 0.5], [2.0])
+    archive.update_solution(first, [-1.0, 0.0])
+
+    # its mean now dominates the solution that displaced it
+    assert archive.get_estimated_objective_vector_at_index(first) == [0.0, 0.5]
+    assert archive.get_elite_solutions()[0].get_decision_vector() == [0.0] and archive.get_number_of_elite() == 1
+    assert archive.sanity_check() and len(guarded_tree(archive)) == 3
+
+
+def test_most_uncertain_elites():
+    archive = UncertainObjectivesArchiver()
+    for i in range(4):
+        archive.insert_new_solution([float(i), float(3 - i)], [float(i)])
+    archive.update_solution(0, [0.0, 3.0])
+    archive.update_solution(2, [2.0, 1.0])
+
+    assert archive.get_indices_of_most_uncertain_elites(3) == [1, 3, 0]
+    assert archive.get_indices_of_most_uncertain_elites(1) == [archive.get_index_of_most_uncertain_elite()]
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_batch_insertion_and_reevaluation(seed):
+    rng = np.random.default_rng(seed)
+    archive = UncertainObjectivesArchiver()
+    sequential = UncertainObjectivesArchiver()
+
+    # 12 generations of 100 go past the initial capacity of the objective matrix
+    for _ in range(12):
+        F = rng.random((100, 3)).round(1).tolist()
+        X = rng.random((100, 2)).tolist()
+        size = len(archive.get_estimated_objective_matrix())
+        assert archive.insert_many(F, X) == list(range(size, size + 100))
+        for f, x in zip(F, X):
+            sequential.insert_new_solution(f, x)
+        reevaluated = rng.choice(size + 100, 10, replace=False).tolist()
+        reevaluations = rng.random((10, 3)).round(1).tolist()
+        archive.update_many(reevaluated, reevaluations)
+        for index, reevaluation in zip(reevaluated, reevaluations):
+            sequential.update_solution(index, reevaluation)
+
+    M = archive.get_estimated_objective_matrix()
+    assert M.shape == (1200, 3)
+    assert np.allclose(M, [archive.get_estimated_objective_vector_at_index(i) for i in range(1200)])
+    # equal mean vectors keep a single elite, so the elite sets are compared by their objective vectors
+    elite_vectors = {tuple(M[i]) for i in archive._UncertainObjectivesArchiver__elite_indices}
+    assert elite_vectors == {tuple(M[i]) for i in non_dominated(archive, 1200)}
+    assert elite_vectors == {tuple(s.get_estimated_objective_vector()) for s in sequential.get_elite_solutions()}
+    assert archive.sanity_check() and archive.self_guarding_check()
+    seen = guarded_tree(archive)
+    assert len(seen) == len(set(seen)) == 1200
+
+
+def test_most_uncertain_elite_follows_the_elite_set():
+    rng = random.Random(3)
+    archive = UncertainObjectivesArchiver()
+
+    for _ in range(400):
+        decision_vector = [rng.random() for _ in range(20)]
+        archive.insert_new_solution(noisy_objectives(decision_vector, rng), decision_vector)
+        index = archive.get_index_of_random_elite() if rng.random() < 0.5 else archive.get_index_of_most_uncertain_elite()
+        archive.update_solution(index, noisy_objectives(archive.get_decision_vector_at_index(index), rng))
+
+        # the heap gives what a scan of the elite set gives: fewest evaluations, then first in the elite set
+        elite = archive._UncertainObjectivesArchiver__elite_indices.tolist()
+        evaluations = [len(archive.get_repeated_evaluations_at_index(i)) for i in elite]
+        assert archive.get_index_of_most_uncertain_elite() == elite[evaluations.index(min(evaluations))]
+        assert archive.get_number_of_reevaluations_of_most_uncertain_elite() == min(evaluations)
+        assert archive.get_average_number_of_resamples_in_elite() == pytest.approx(np.mean(evaluations))
+        assert archive.get_indices_of_most_uncertain_elites(5) == [elite[i] for i in np.argsort(evaluations, kind="stable")[:5]]